@@ -32,6 +32,11 @@ def pytest_addoption(parser):
         action=RFAction,
         help="run all regression tests, this will take a while. Implies --regression",
     )
+    parser.addoption(
+        "--run-benchmarks",
+        action="store_true",
+        help="run the timing benchmarks, which only report their timings",
+    )
 
 
 @pytest.fixture(scope="session")
@@ -40,6 +45,12 @@ def regression_test(request):
         pytest.skip("Test requires --regression-full option to run.")
 
 
+@pytest.fixture(scope="session")
+def run_benchmarks(request):
+    if not request.config.getoption("--run-benchmarks"):
+        pytest.skip("Test requires --run-benchmarks option to run.")
+
+
 @pytest.fixture(scope="session")
 def ccp4():
     """
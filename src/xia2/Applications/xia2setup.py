@@ -6,9 +6,12 @@
 from __future__ import annotations
 
 import collections
+import concurrent.futures
+import json
 import logging
 import os
 import sys
+import time
 import traceback
 
 import h5py
@@ -16,7 +19,7 @@ import h5py
 from libtbx import easy_mp
 
 from xia2.Applications.xia2setup_helpers import get_sweep
-from xia2.Experts.FindImages import image2template_directory
+from xia2.Experts.FindImages import group_by_template, image2template_directory
 from xia2.Handlers.CommandLine import CommandLine
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Schema import imageset_cache
@@ -74,6 +77,14 @@ latest_sequence = None
 
 target_template = None
 
+# the version of the directory scan cache format, to be incremented whenever
+# the cached contents or the way in which files are recognised change
+scan_cache_version = 1
+
+# directories modified more recently than this (in seconds) are not cached,
+# since more files may arrive within the resolution of the modification time
+scan_cache_min_age = 5
+
 
 def is_sequence_name(file):
     if os.path.isfile(file):
@@ -85,39 +96,46 @@ def is_sequence_name(file):
 
 def is_image_name(filename):
     if os.path.isfile(filename):
+        return _is_image_filename(filename)
+
+    return False
 
-        if os.path.split(filename)[-1] in XDSFiles:
-            return False
 
-        for xds_file in "ABSORP", "DECAY", "MODPIX":
-            if os.path.join("scale", xds_file) in filename:
-                return False
+def _is_image_filename(filename):
+    """As is_image_name, for the name of a file which is known to exist."""
 
-        for exten in known_image_extensions:
-            if filename.endswith(exten):
-                return True
+    if os.path.split(filename)[-1] in XDSFiles:
+        return False
 
-        end = filename.split(".")[-1]
-        try:
-            if ".log." not in filename and len(end) > 1:
-                return True
-        except Exception:
-            pass
+    for xds_file in "ABSORP", "DECAY", "MODPIX":
+        if os.path.join("scale", xds_file) in filename:
+            return False
 
-        if is_hdf5_name(filename):
+    for exten in known_image_extensions:
+        if filename.endswith(exten):
             return True
 
-    return False
+    end = filename.split(".")[-1]
+    try:
+        if ".log." not in filename and len(end) > 1:
+            return True
+    except Exception:
+        pass
+
+    return _is_hdf5_filename(filename)
 
 
 def is_hdf5_name(filename):
     if os.path.isfile(filename):
-        if os.path.splitext(filename)[-1] in known_hdf5_extensions:
-            return True
+        return _is_hdf5_filename(filename)
 
     return False
 
 
+def _is_hdf5_filename(filename):
+    return os.path.splitext(filename)[-1] in known_hdf5_extensions
+
+
 def is_xds_file(f):
     filename = os.path.split(f)[1]
 
@@ -190,42 +208,168 @@ def parse_sequence(sequence_file):
 
 
 def visit(directory, files):
-    files.sort()
+    files = [f for f in files if os.path.isfile(os.path.join(directory, f))]
+    contents = _scan_files(directory, files)
 
-    templates = set()
+    hdf5_files = [os.path.join(directory, f) for f in contents["hdf5"]]
+    templates = set(_hdf5_image_files(hdf5_files))
+    templates.update(_templates_in_directory(directory, contents["templates"]))
+    for f in contents["sequences"]:
+        parse_sequence(os.path.join(directory, f))
+
+    return templates
+
+
+def _scan_files(directory, files):
+    """
+    Sort the files in a directory into HDF5 files, image templates and
+    sequence files, using only the file names.
 
-    for f in files:
+    Args:
+        directory:  The directory containing the files.
+        files:  The names of the regular files in the directory.
+
+    Returns:
+        A dictionary of the names of the HDF5 files ("hdf5"), the image file
+        templates ("templates") and the names of the sequence files
+        ("sequences").
+    """
+    hdf5_files = []
+    images = []
+    sequence_files = []
+
+    for f in sorted(files):
         full_path = os.path.join(directory, f)
 
-        if is_hdf5_name(full_path):
-            from dxtbx.format import Registry
+        if _is_hdf5_filename(full_path):
+            hdf5_files.append(f)
 
-            format_class = Registry.get_format_class_for_file(full_path)
-            if format_class is None:
-                logger.debug(
-                    "Ignoring %s (Registry can not find format class)" % full_path
-                )
-                continue
-            elif format_class.is_abstract():
-                continue
-            templates.add(full_path)
+        elif _is_image_filename(full_path):
+            if not is_xds_file(full_path):
+                images.append(f)
 
-        elif is_image_name(full_path):
-            try:
-                template = get_template(full_path)
-            except Exception as e:
-                logger.debug("Exception B: %s" % str(e))
-                logger.debug(traceback.format_exc())
-                continue
-            if template is not None:
-                templates.add(template)
+        elif f.split(".")[-1] in known_sequence_extensions:
+            sequence_files.append(f)
+
+    groups, unrecognised = group_by_template(images)
+    for f in unrecognised:
+        logger.debug("template not recognised for %s" % os.path.join(directory, f))
+    for template_images in groups.values():
+        if not os.access(os.path.join(directory, template_images[0]), os.R_OK):
+            logger.debug(
+                "No read permission for %s"
+                % os.path.join(directory, template_images[0])
+            )
+
+    return {
+        "hdf5": hdf5_files,
+        "templates": sorted(groups),
+        "sequences": sequence_files,
+    }
 
-        elif is_sequence_name(full_path):
-            parse_sequence(full_path)
 
+def _templates_in_directory(directory, templates):
+    templates = [os.path.join(os.path.abspath(directory), t) for t in templates]
+    if target_template:
+        templates = [t for t in templates if t in target_template]
     return templates
 
 
+def _map_files(func, filenames):
+    """
+    Apply a function to each of a list of files, in parallel processes if
+    nproc > 1.  h5py serialises access to HDF5 files within a process, so
+    separate processes are required to probe many HDF5 files at once.
+    """
+    if len(filenames) > 1:
+        nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+        if nproc > 1:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=min(nproc, len(filenames))
+            ) as pool:
+                return list(pool.map(func, filenames))
+    return [func(f) for f in filenames]
+
+
+def _is_image_format(filename):
+    """
+    Whether dxtbx recognises an (HDF5) file as a file of images, or None if
+    dxtbx can not find a format class for the file.
+    """
+    from dxtbx.format import Registry
+
+    format_class = Registry.get_format_class_for_file(filename)
+    if format_class is None:
+        return None
+    return not format_class.is_abstract()
+
+
+def _hdf5_image_files(hdf5_files):
+    """Select the HDF5 files which dxtbx recognises as files of images."""
+    image_files = []
+    for filename, is_image_format in zip(
+        hdf5_files, _map_files(_is_image_format, hdf5_files)
+    ):
+        if is_image_format is None:
+            logger.debug("Ignoring %s (Registry can not find format class)" % filename)
+        elif is_image_format:
+            image_files.append(filename)
+    return image_files
+
+
+def _scan_directory(directory):
+    """
+    List the contents of a directory with a single scandir pass, which avoids
+    a stat of each file on most file systems.
+
+    Returns:
+        The contents of the directory as for _scan_files, with the names of
+        the subdirectories ("subdirectories").
+    """
+    files = []
+    subdirectories = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    # follow symbolic links, as os.walk(followlinks=True)
+                    if entry.is_dir():
+                        subdirectories.append(entry.name)
+                    elif entry.is_file():
+                        files.append(entry.name)
+                except OSError:
+                    continue
+    except OSError as e:
+        logger.debug("Unable to scan %s: %s" % (directory, e))
+
+    contents = _scan_files(directory, files)
+    contents["subdirectories"] = sorted(subdirectories)
+    return contents
+
+
+def _load_scan_cache(cache_file):
+    try:
+        with open(cache_file) as fh:
+            cache = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != scan_cache_version:
+        return {}
+    return cache["directories"]
+
+
+def _save_scan_cache(cache_file, directories):
+    # write to a temporary file first, so that concurrent or interrupted runs
+    # never see a partial cache
+    tmp_file = "%s.%d.tmp" % (cache_file, os.getpid())
+    try:
+        with open(tmp_file, "w") as fh:
+            json.dump({"version": scan_cache_version, "directories": directories}, fh)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.debug("Unable to write directory scan cache %s: %s" % (cache_file, e))
+
+
 def _linked_hdf5_data_files(h5_file):
     data_path = "/entry/data"
     with h5py.File(h5_file) as f:
@@ -289,8 +433,14 @@ def _filter_aliased_hdf5_sweeps(sweeps: list[str]) -> set[str]:
     deduplicated = set()
     hdf5_sweeps: dict[frozenset[str], str] = {}
 
+    # open the HDF5 files in parallel, as this can be slow on network file systems
+    hdf5_files = [s for s in sweeps if is_hdf5_name(s)]
+    linked_data_files = dict(
+        zip(hdf5_files, _map_files(_linked_hdf5_data_files, hdf5_files))
+    )
+
     for s in sweeps:
-        if not is_hdf5_name(s) or not (filenames := _linked_hdf5_data_files(s)):
+        if not (filenames := linked_data_files.get(s)):
             deduplicated.add(s)
         elif filenames in hdf5_sweeps:
             # Bias in favour of using _master.h5 in place of .nxs, because of XDS
@@ -618,18 +768,65 @@ def _get_sweeps(templates):
     return known_sweeps
 
 
-def _rummage(directories):
-    """Walk through the directories looking for sweeps."""
-    templates = set()
+def _rummage(directories, cache_file=None):
+    """
+    Walk through the directories looking for sweeps.
+
+    If a cache file is given, the contents found in each directory are cached
+    there, keyed on the modification time of the directory, so that a rerun
+    over the same directories need not scan them again.
+    """
+    cache = _load_scan_cache(cache_file) if cache_file else {}
+    scan_time = time.time()
+    found = []
+    unprobed = []
     visited = set()
     for path in directories:
-        for root, dirs, files in os.walk(path, followlinks=True):
+        roots = [path]
+        while roots:
+            root = roots.pop()
             realpath = os.path.realpath(root)
             if realpath in visited:
                 # safety-check to avoid recursively symbolic links
                 continue
             visited.add(realpath)
-            templates.update(visit(root, files))
+            try:
+                mtime_ns = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+            contents = cache.get(realpath)
+            if contents is None or contents["mtime_ns"] != mtime_ns:
+                contents = _scan_directory(root)
+                contents["mtime_ns"] = mtime_ns
+                unprobed.append((root, contents))
+                if scan_time - mtime_ns / 1e9 > scan_cache_min_age:
+                    cache[realpath] = contents
+                else:
+                    cache.pop(realpath, None)
+            found.append((root, contents))
+            roots.extend(
+                os.path.join(root, d) for d in reversed(contents["subdirectories"])
+            )
+
+    # check the HDF5 files found in all directories at once
+    hdf5_files = [
+        os.path.join(root, f) for root, contents in unprobed for f in contents["hdf5"]
+    ]
+    image_files = set(_hdf5_image_files(hdf5_files))
+    for root, contents in unprobed:
+        contents["hdf5"] = [
+            f for f in contents["hdf5"] if os.path.join(root, f) in image_files
+        ]
+
+    if cache_file and unprobed:
+        _save_scan_cache(cache_file, cache)
+
+    templates = set()
+    for root, contents in found:
+        templates.update(os.path.join(root, f) for f in contents["hdf5"])
+        templates.update(_templates_in_directory(root, contents["templates"]))
+        for f in contents["sequences"]:
+            parse_sequence(os.path.join(root, f))
 
     return _get_sweeps(templates)
 
@@ -667,7 +864,9 @@ def write_xinfo(filename, directories, template=None, hdf5_master_files=None):
         sweeps = _get_sweeps(hdf5_master_files)
     else:
         # xia2 $(dials.data get -q x4wide)
-        sweeps = _rummage(directories)
+        sweeps = _rummage(
+            directories, cache_file=os.path.join(directory, "directory_scan.json")
+        )
 
     with open(filename, "w") as fout:
         _write_sweeps(sweeps, fout)
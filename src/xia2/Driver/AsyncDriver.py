@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import asyncio
+import codecs
+import io
+import locale
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from xia2.Driver.SimpleDriver import SimpleDriver
+
+# the size of the blocks in which the output of the child programs is read
+_CHUNK_SIZE = 65536
+
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+
+def _event_loop():
+    """Get the event loop which runs the child processes of all AsyncDrivers
+    in this process, in a background thread."""
+
+    global _loop, _loop_pid
+
+    with _loop_lock:
+        # a forked process needs a new loop, as the thread is not inherited
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(
+                target=_loop.run_forever, name="xia2-async-driver", daemon=True
+            ).start()
+        return _loop
+
+
+class AsyncDriver(SimpleDriver):
+    """A driver which runs the child program with asyncio in a background
+    thread. The standard output of the program is read continuously in large
+    chunks, so that several programs may be started and run concurrently
+    before waiting for them to finish, and is written to the log file a
+    chunk at a time when the program is waited for."""
+
+    def __init__(self):
+        super().__init__()
+
+        self._process = None
+        self._process_status = None
+        self._output_chunks = queue.Queue()
+        self._output_lines = deque()
+        self._output_finished = False
+
+    def start(self):
+        if self._executable is None:
+            raise RuntimeError("no executable is set.")
+
+        command_line, environment = self._command_line_and_environment()
+
+        self._runtime_log["process start"] = time.time()
+        self._process_status = None
+        self._output_chunks = queue.Queue()
+        self._output_lines = deque()
+        self._output_finished = False
+        future = asyncio.run_coroutine_threadsafe(
+            self._spawn(command_line, environment), _event_loop()
+        )
+        self._process = future.result()
+
+    async def _spawn(self, command_line, environment):
+        if os.name == "nt":
+            process = await asyncio.create_subprocess_exec(
+                *command_line,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                cwd=self._working_directory,
+                env=environment,
+            )
+        else:
+            process = await asyncio.create_subprocess_shell(
+                command_line,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                cwd=self._working_directory,
+                env=environment,
+            )
+        asyncio.ensure_future(self._read_output(process))
+        return process
+
+    async def _read_output(self, process):
+        """Read the output of the process in chunks until it finishes, passing
+        the complete lines of each chunk to the output queue."""
+
+        # decode as for subprocess.Popen(..., universal_newlines=True)
+        decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder(locale.getpreferredencoding(False))(
+                errors="replace"
+            ),
+            translate=True,
+        )
+        partial = ""
+        try:
+            while True:
+                data = await process.stdout.read(_CHUNK_SIZE)
+                text = decoder.decode(data, final=not data)
+                lines = (partial + text).split("\n")
+                partial = lines.pop()
+                if lines:
+                    self._output_chunks.put([line + "\n" for line in lines])
+                if not data:
+                    break
+            if partial:
+                self._output_chunks.put([partial])
+            await process.wait()
+        finally:
+            self._output_chunks.put(None)
+
+    def _next_output_chunk(self):
+        """Wait for the next chunk of output lines, or return an empty list
+        once the output has finished."""
+
+        if self._output_finished:
+            return []
+        chunk = self._output_chunks.get()
+        if chunk is None:
+            self._output_finished = True
+            return []
+        return chunk
+
+    def _input(self, record):
+        if not self.check():
+            raise RuntimeError("child process has termimated")
+
+        if self._process.returncode is not None:
+            raise RuntimeError("child process has termimated")
+
+        _event_loop().call_soon_threadsafe(
+            self._write_stdin,
+            self._process,
+            record.encode(locale.getpreferredencoding(False)),
+        )
+
+    @staticmethod
+    def _write_stdin(process, data):
+        # called in the event loop - a program need not read all its input
+        try:
+            if data is None:
+                process.stdin.close()
+            else:
+                process.stdin.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _output(self):
+        if not self._output_lines:
+            self._output_lines.extend(self._next_output_chunk())
+        if self._output_lines:
+            return self._output_lines.popleft()
+        return ""
+
+    def _read_remaining_output(self):
+        # handle the output a chunk at a time, rather than line by line
+        chunk = list(self._output_lines)
+        self._output_lines.clear()
+        while True:
+            if not chunk:
+                chunk = self._next_output_chunk()
+                if not chunk:
+                    break
+            self._standard_output_records.extend(chunk)
+            if self._log_file is not None:
+                self._log_file.write("".join(chunk))
+                self._log_file.flush()
+            chunk = []
+        self._finished = True
+
+    def _status(self):
+        # get the return status of the process
+
+        if self._process_status is not None:
+            return self._process_status
+
+        if self._process:
+            return self._process.returncode
+
+        return 0
+
+    def close(self):
+        if not self.check():
+            raise RuntimeError("child process has termimated")
+
+        _event_loop().call_soon_threadsafe(self._write_stdin, self._process, None)
+
+    def cleanup(self):
+        self._process_status = self._process.returncode
+        self._process = None
+
+    def kill(self):
+        self._process.kill()
@@ -74,6 +74,7 @@ class DefaultDriver:
         self._cpu_threads = 1
 
         self._runtime_log = {"object initialization": time.time()}
+        self._children_resource_usage = xia2.Driver.timing.resource_usage(children=True)
 
     def __del__(self):
         # the destructor - close the log file etc.
@@ -392,6 +393,15 @@ class DefaultDriver:
 
         raise NotImplementedError("Do not use the DefaultDriver class directly")
 
+    def _read_remaining_output(self):
+        """Read the standard output until the program has finished."""
+
+        while True:
+            line = self.output()
+
+            if not line:
+                break
+
     def close_wait(self):
         """Close the standard input channel and wait for the standard
         output to stop. Note that the results can still be obtained through
@@ -399,11 +409,7 @@ class DefaultDriver:
 
         self.close()
 
-        while True:
-            line = self.output()
-
-            if not line:
-                break
+        self._read_remaining_output()
 
         endtime = time.time()
         if self._log_file:
@@ -441,18 +447,23 @@ class DefaultDriver:
                     )
             else:
                 command_line = "(unknown)"
+        self.cleanup()
+
         if self._runtime_log:
+            # the child process has been waited for by cleanup(), so that its
+            # resource usage is included in that of the finished children
             xia2.Driver.timing.record(
                 {
                     "command": command_line.strip(),
                     "time_end": endtime,
                     "time_start": min(self._runtime_log.values()),
                     "details": self._runtime_log,
+                    "resources": xia2.Driver.timing.resource_usage_since(
+                        self._children_resource_usage, children=True
+                    ),
                 }
             )
 
-        self.cleanup()
-
     def kill(self):
         """Kill the child process."""
 
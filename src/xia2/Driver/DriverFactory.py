@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import os
 
+from xia2.Driver.AsyncDriver import AsyncDriver
 from xia2.Driver.InteractiveDriver import InteractiveDriver
 from xia2.Driver.QSubDriver import QSubDriver
 from xia2.Driver.ScriptDriver import ScriptDriver
@@ -17,6 +18,7 @@ class _DriverFactory:
             "script",
             "interactive",
             "qsub",
+            "async",
         ]
 
         # should probably write a message or something explaining
@@ -47,6 +49,7 @@ class _DriverFactory:
             "script": ScriptDriver,
             "interactive": InteractiveDriver,
             "qsub": QSubDriver,
+            "async": AsyncDriver,
         }.get(driver_type)
         if driver_class:
             return driver_class()
@@ -16,9 +16,8 @@ class SimpleDriver(DefaultDriver):
         self._popen = None
         self._popen_status = None
 
-    def start(self):
-        if self._executable is None:
-            raise RuntimeError("no executable is set.")
+    def _command_line_and_environment(self):
+        """Get the command line to run and the environment to run it in."""
 
         if os.name == "nt":
             # pass in CL as a list of tokens
@@ -47,6 +46,14 @@ class SimpleDriver(DefaultDriver):
             else:
                 environment[name] = added
 
+        return command_line, environment
+
+    def start(self):
+        if self._executable is None:
+            raise RuntimeError("no executable is set.")
+
+        command_line, environment = self._command_line_and_environment()
+
         self._runtime_log["process start"] = time.time()
         self._popen = subprocess.Popen(
             command_line,
@@ -98,7 +105,8 @@ class SimpleDriver(DefaultDriver):
         self._popen.stdin.close()
 
     def cleanup(self):
-        self._popen_status = self._popen.poll()
+        # the standard output has closed, so the process is about to exit
+        self._popen_status = self._popen.wait()
         self._popen = None
 
     def kill(self):
@@ -1,10 +1,75 @@
 from __future__ import annotations
 
 import contextlib
+import itertools
+import json
+import os
+import sys
+import threading
 import time
 
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
 _timing_db = []
 
+# unique identifiers for the timing records, and the stack of currently open
+# steps in each thread, so that records can be arranged hierarchically
+_record_ids = itertools.count(1)
+_open_steps = threading.local()
+
+
+def _current_step():
+    stack = getattr(_open_steps, "stack", None)
+    return stack[-1] if stack else None
+
+
+def _peak_rss(who):
+    """Peak resident set size in bytes (ru_maxrss is in kilobytes on Linux)"""
+    maxrss = resource.getrusage(who).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def resource_usage(children=False):
+    """
+    Get the cumulative resource usage of this process, or of all of its
+    child processes which have finished and been waited for.
+
+    :param children: report the usage of the child processes
+    :return: a dictionary of the CPU time (in seconds), the peak resident set
+             size and the number of bytes read and written from the block
+             devices, or an empty dictionary if this is not available
+    """
+    if resource is None:
+        return {}
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    usage = resource.getrusage(who)
+    return {
+        "cpu_time": usage.ru_utime + usage.ru_stime,
+        "peak_rss": _peak_rss(who),
+        "read_bytes": usage.ru_inblock * 512,
+        "write_bytes": usage.ru_oublock * 512,
+    }
+
+
+def resource_usage_since(start, children=False):
+    """
+    Get the resource usage since an earlier call to resource_usage().
+
+    The peak resident set size is a high water mark over the lifetime of the
+    process (or of the largest child process), so is only included if it
+    increased during the interval.
+    """
+    end = resource_usage(children=children)
+    if not start or not end:
+        return {}
+    usage = {k: end[k] - start[k] for k in ("cpu_time", "read_bytes", "write_bytes")}
+    if end["peak_rss"] > start["peak_rss"]:
+        usage["peak_rss"] = end["peak_rss"]
+    return usage
+
 
 def record(timing_information):
     """
@@ -14,7 +79,11 @@ def record(timing_information):
        {"command": "command line string",
         "time_start": unix epoch timestamp,
         "time_end": unix epoch timestamp}
+       and optionally "resources", a dictionary of the resource usage as
+       returned by resource_usage_since()
     """
+    timing_information.setdefault("id", next(_record_ids))
+    timing_information.setdefault("parent", _current_step())
     _timing_db.append(timing_information)
 
 
@@ -28,14 +97,30 @@ def record_step(name):
     with record_step("my_program argument argument"):
         do_stuff()
 
+    Any records added within the context, including those of nested steps,
+    are recorded as children of this step. The resources used by this
+    process and by any child processes which finish within the context are
+    recorded alongside the timing.
+
     :param name: section name for timing purposes, will usually be
                  shortened to the first word.
     """
-    timing = {"command": name, "time_start": time.time()}
+    timing = {"command": name, "id": next(_record_ids), "parent": _current_step()}
+    if not hasattr(_open_steps, "stack"):
+        _open_steps.stack = []
+    _open_steps.stack.append(timing["id"])
+    usage = resource_usage()
+    children_usage = resource_usage(children=True)
+    timing["time_start"] = time.time()
     try:
         yield
     finally:
         timing["time_end"] = time.time()
+        _open_steps.stack.pop()
+        timing["resources"] = resource_usage_since(usage)
+        children = resource_usage_since(children_usage, children=True)
+        if children:
+            timing["resources"]["children"] = children
         record(timing)
 
 
@@ -56,6 +141,70 @@ def reset():
     _timing_db = []
 
 
+def chrome_trace(timing_db):
+    """
+    Convert a list of timing records to the Chrome trace event format, which
+    can be viewed with e.g. https://ui.perfetto.dev or chrome://tracing.
+
+    Each record becomes a complete ("X") event. Nested records share a track
+    with their parent, while records which overlap without being nested, such
+    as concurrently running programs, are placed on separate tracks.
+
+    :param timing_db: A list of timing records, as passed to record()
+    :return: A dictionary in the Chrome trace event format
+    """
+    if not timing_db:
+        return {"traceEvents": [], "displayTimeUnit": "ms"}
+
+    relative_start_time = min(t["time_start"] for t in timing_db)
+    events = []
+    tracks = []  # for each track, the end times of the currently open events
+    for t in sorted(timing_db, key=lambda t: (t["time_start"], -t["time_end"])):
+        for track, open_events in enumerate(tracks):
+            while open_events and open_events[-1] <= t["time_start"]:
+                open_events.pop()
+            if not open_events or t["time_end"] <= open_events[-1]:
+                open_events.append(t["time_end"])
+                break
+        else:
+            tracks.append([t["time_end"]])
+            track = len(tracks) - 1
+
+        args = {"command": t["command"]}
+        for key in ("id", "parent"):
+            if t.get(key) is not None:
+                args[key] = t[key]
+        args.update(t.get("resources", {}))
+        events.append(
+            {
+                "name": t["command"].split(" ")[0],
+                "cat": "program" if "details" in t else "step",
+                "ph": "X",
+                "ts": round((t["time_start"] - relative_start_time) * 1e6),
+                "dur": round((t["time_end"] - t["time_start"]) * 1e6),
+                "pid": os.getpid(),
+                "tid": track,
+                "args": args,
+            }
+        )
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"time_start": relative_start_time},
+    }
+
+
+def write_chrome_trace(filename):
+    """
+    Write all recorded steps and program executions to a file in the Chrome
+    trace event format.
+
+    :param filename: The name of the JSON file to write
+    """
+    with open(filename, "w") as fh:
+        json.dump(chrome_trace(_timing_db), fh, indent=1)
+
+
 def visualise_db(timing_db):
     """
     Visualises program execution in a flow diagram given a list of timestamps.
@@ -8,6 +8,7 @@
 
 from __future__ import annotations
 
+import itertools
 import logging
 import math
 import os
@@ -28,6 +29,18 @@ joiners = [".", "_", ""]
 
 compiled_patterns = [re.compile(pattern) for pattern in patterns]
 
+# all of the patterns in one, tried in the same order as by template_regex:
+# the index of the last group of the matching pattern identifies it
+combined_pattern = re.compile("|".join("(?:%s)" % pattern for pattern in patterns))
+combined_pattern_joiners = {
+    last_group: (cp.groups, joiner)
+    for last_group, cp, joiner in zip(
+        itertools.accumulate(cp.groups for cp in compiled_patterns),
+        compiled_patterns,
+        joiners,
+    )
+}
+
 
 def template_regex(filename):
     """Try a bunch of templates to work out the most sensible. N.B. assumes
@@ -64,6 +77,38 @@ def template_regex(filename):
     return template, int(digits)
 
 
+def group_by_template(filenames):
+    """Group image file names by their templates, in a single regular
+    expression match per file name. Equivalent to calling template_regex for
+    each file name, but much faster for large numbers of files.
+
+    :param filenames: A list of file names (without directories)
+    :return: A dictionary of template: list of file names, and a list of the
+             file names for which no template was recognised
+    """
+
+    groups = {}
+    unrecognised = []
+    for filename in filenames:
+        match = combined_pattern.match(filename[::-1])
+        if not match:
+            unrecognised.append(filename)
+            continue
+        ngroups, joiner = combined_pattern_joiners[match.lastindex]
+        found = match.groups()[match.lastindex - ngroups : match.lastindex]
+        if ngroups == 3:
+            exten = "." + found[0][::-1]
+            digits = found[1][::-1]
+            prefix = found[2][::-1] + joiner
+        else:
+            exten = ""
+            digits = found[0][::-1]
+            prefix = found[1][::-1] + joiner
+        groups.setdefault(prefix + ("#" * len(digits)) + exten, []).append(filename)
+
+    return groups, unrecognised
+
+
 def work_template_regex():
     questions_answers = {
         "foo_bar_001.img": "foo_bar_###.img",
@@ -55,6 +55,15 @@ xtriage_analysis = True
   .type = bool
 include_radiation_damage = True
   .type = bool
+nproc = None
+  .type = int(value_min=1)
+  .help = "The number of processes used to compute the sections of the report"
+          "concurrently. By default, xia2.settings.multiprocessing.nproc."
+time_budget = None
+  .type = float(value_min=0)
+  .help = "Time in seconds after which the optional report sections (the"
+          "xtriage analysis and the multiplicity plots) are skipped if they"
+          "have not finished"
 %s
 """
     % (dose_phil_str, batch_phil_scope)
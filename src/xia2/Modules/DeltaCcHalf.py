@@ -3,7 +3,10 @@ from __future__ import annotations
 import logging
 import math
 
+import numpy as np
+
 import iotbx.phil
+from cctbx import miller
 from cctbx.array_family import flex
 from libtbx.utils import frange
 
@@ -81,8 +84,37 @@ class DeltaCcHalf:
                 self._group_to_dataset_id.append(test_k)
 
     def _compute_omit_stats(self):
-        ccs = flex.double()
-        completeness = flex.double()
+        omit_stats = OmitOneGroupStatistics(
+            self.intensities, self._group_observations(), self.binner
+        )
+        completeness = omit_stats.completeness(multiplier=100)
+        if self._cc_one_half_method == "sigma_tau":
+            ccs = omit_stats.cc_half_sigma_tau()
+        else:
+            # The half-dataset method relies on a random split of the
+            # observations, which can't be built up from summed statistics
+            ccs = flex.double(
+                self._compute_mean_weighted_cc_half(unmerged_i)
+                for unmerged_i in self._omit_one_group_arrays()
+            )
+        for (group_start, group_end), cc in zip(self._group_to_batches, ccs):
+            logger.debug(f"CC½ excluding batches {group_start}-{group_end}: {cc:.3f}")
+        return ccs, completeness
+
+    def _group_observations(self):
+        """Return the processing group of every observation, one array per dataset."""
+        group_ids = [np.zeros(ma.size(), dtype=np.int64) for ma in self.intensities]
+        for i_group, ((group_start, group_end), test_k) in enumerate(
+            zip(self._group_to_batches, self._group_to_dataset_id)
+        ):
+            batches = self.batches[test_k].data().as_numpy_array()
+            group_ids[test_k][
+                (batches >= group_start) & (batches <= group_end)
+            ] = i_group
+        return group_ids
+
+    def _omit_one_group_arrays(self):
+        """Generate the combined unmerged intensities with each group omitted."""
         for (group_start, group_end), test_k in zip(
             self._group_to_batches, self._group_to_dataset_id
         ):
@@ -98,19 +130,10 @@ class DeltaCcHalf:
                 data_i.extend(unmerged.data())
                 sigmas_i.extend(unmerged.sigmas())
 
-            unmerged_i = self.intensities[0].customized_copy(
+            yield self.intensities[0].customized_copy(
                 indices=indices_i, data=data_i, sigmas=sigmas_i
             )
 
-            ccs.append(self._compute_mean_weighted_cc_half(unmerged_i))
-            completeness.append(
-                unmerged_i.merge_equivalents().array().completeness(multiplier=100)
-            )
-            logger.debug(
-                f"CC½ excluding batches {group_start}-{group_end}: {ccs[-1]:.3f}"
-            )
-        return ccs, completeness
-
     def _compute_mean_weighted_cc_half(self, intensities):
         intensities.use_binning(self.binner)
         if self._cc_one_half_method == "sigma_tau":
@@ -229,3 +252,173 @@ class DeltaCcHalf:
         plt.xlabel("Group")
         plt.ylabel(r"$\sigma$")
         plt.savefig(filename)
+
+
+def _sigma_tau_terms(n, sum_i, sum_i_sq):
+    """Per-reflection contributions to the sigma-tau CC½ of a resolution bin.
+
+    Mirrors cctbx.miller.array.cc_one_half_sigma_tau: observations are given
+    unit sigmas, so the merged intensity is the plain mean and its variance is
+    max(s²/n, 1/n), where s² is the sample variance of the observations. Only
+    reflections with more than one observation contribute.
+    """
+    included = n > 1
+    n_safe = np.where(included, n, 2)
+    mean = sum_i / n_safe
+    sample_variance = (sum_i_sq - sum_i * mean) / (n_safe - 1)
+    variance = np.maximum(sample_variance, 1) / n_safe
+    return np.stack(
+        [
+            included.astype(np.float64),
+            np.where(included, mean, 0),
+            np.where(included, mean**2, 0),
+            np.where(included, variance, 0),
+        ]
+    )
+
+
+class OmitOneGroupStatistics:
+    """Omit-one-group CC½ and completeness from accumulated sufficient statistics.
+
+    The sums of I, I² and the observation counts are accumulated once for each
+    (group, unique Miller index) pair. The statistics with a group omitted are
+    then obtained by subtracting that group's contribution from the totals, so
+    the cost scales with the number of observations rather than with the number
+    of groups times the number of observations.
+    """
+
+    def __init__(self, intensities, group_ids, binning):
+        indices = flex.miller_index()
+        data = flex.double()
+        for ma in intensities:
+            indices.extend(ma.indices())
+            data.extend(ma.data())
+        unmerged = (
+            intensities[0]
+            .customized_copy(indices=indices, data=data, sigmas=None)
+            .map_to_asu()
+        )
+        unmerged.use_binning(binning)
+        group_ids = np.concatenate(group_ids)
+        self._n_groups = int(group_ids.max()) + 1 if group_ids.size else 0
+
+        hkl = unmerged.indices().as_vec3_double().as_numpy_array().astype(np.int64)
+        _, first, unique_ids = np.unique(
+            hkl, axis=0, return_index=True, return_inverse=True
+        )
+        unique_ids = unique_ids.reshape(-1)
+        self._n_unique = first.size
+        self._unique_d = unmerged.d_spacings().data().as_numpy_array()[first]
+        bin_ids = np.array(unmerged.binner().bin_indices(), dtype=np.int64)
+        self._unique_bin = bin_ids[first]
+        self._n_bins = int(bin_ids.max()) + 1 if bin_ids.size else 0
+
+        data = unmerged.data().as_numpy_array()
+        self._n_obs_per_bin = np.bincount(bin_ids, minlength=self._n_bins)
+        self._n_obs_per_group_bin = np.bincount(
+            group_ids * self._n_bins + bin_ids,
+            minlength=self._n_groups * self._n_bins,
+        ).reshape(self._n_groups, self._n_bins)
+
+        # Per-reflection totals
+        self._n = np.bincount(unique_ids, minlength=self._n_unique)
+        self._sum_i = np.bincount(unique_ids, weights=data, minlength=self._n_unique)
+        self._sum_i_sq = np.bincount(
+            unique_ids, weights=data**2, minlength=self._n_unique
+        )
+
+        # Per-(group, reflection) sums, stored sparsely
+        keys, inverse = np.unique(
+            group_ids * self._n_unique + unique_ids, return_inverse=True
+        )
+        inverse = inverse.reshape(-1)
+        self._group_of_sum = keys // self._n_unique
+        self._unique_of_sum = keys % self._n_unique
+        self._group_n = np.bincount(inverse)
+        self._group_sum_i = np.bincount(inverse, weights=data)
+        self._group_sum_i_sq = np.bincount(inverse, weights=data**2)
+
+        self._unmerged = unmerged
+
+    def cc_half_sigma_tau(self):
+        """The mean CC½ (weighted by reflections per bin) with each group omitted."""
+        u = self._unique_of_sum
+        full_terms = _sigma_tau_terms(self._n, self._sum_i, self._sum_i_sq)
+        bin_totals = np.stack(
+            [
+                np.bincount(self._unique_bin, weights=t, minlength=self._n_bins)
+                for t in full_terms
+            ]
+        )
+        # Replace the contribution of every reflection touched by a group with
+        # its contribution once that group's observations are removed
+        delta = (
+            _sigma_tau_terms(
+                self._n[u] - self._group_n,
+                self._sum_i[u] - self._group_sum_i,
+                self._sum_i_sq[u] - self._group_sum_i_sq,
+            )
+            - full_terms[:, u]
+        )
+        group_bin = self._group_of_sum * self._n_bins + self._unique_bin[u]
+        k, sum_mean, sum_mean_sq, sum_variance = (
+            bin_totals[i][np.newaxis, :]
+            + np.bincount(
+                group_bin, weights=d, minlength=self._n_groups * self._n_bins
+            ).reshape(self._n_groups, self._n_bins)
+            for i, d in enumerate(delta)
+        )
+        k = np.rint(k)
+
+        valid = k > 1
+        k_safe = np.where(valid, k, 2)
+        var_y = (sum_mean_sq - sum_mean**2 / k_safe) / (k_safe - 1)
+        var_e = 2 * sum_variance / k_safe
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cc = (var_y - 0.5 * var_e) / (var_y + 0.5 * var_e)
+        cc = np.where(valid, cc, 0)
+
+        # Empty bins are excluded from the weighted mean
+        k = np.where(self._n_obs_per_bin - self._n_obs_per_group_bin > 0, k, 0)
+        return flex.double((cc * k).sum(axis=1) / k.sum(axis=1))
+
+    def completeness(self, multiplier=1):
+        """The completeness of the merged data with each group omitted.
+
+        As for cctbx.miller.set.completeness, the complete set extends to the
+        d_min of the remaining data, which may change if the omitted group
+        holds the only observations of the highest resolution reflections.
+        """
+        # A reflection disappears if all of its observations come from one group
+        only_group = np.full(self._n_unique, -1, dtype=np.int64)
+        sole = self._group_n == self._n[self._unique_of_sum]
+        only_group[self._unique_of_sum[sole]] = self._group_of_sum[sole]
+        n_unique = self._n_unique - np.bincount(
+            self._group_of_sum[sole], minlength=self._n_groups
+        )
+
+        complete_d = np.sort(
+            self._unmerged.complete_set().d_spacings().data().as_numpy_array()
+        )
+        order = np.argsort(self._unique_d, kind="stable")
+        d_sorted = self._unique_d[order]
+        only_group_sorted = only_group[order]
+        # The highest resolution reflection that doesn't belong solely to the
+        # same group as the overall highest resolution reflection
+        differs = np.flatnonzero(only_group_sorted != only_group_sorted[0])
+        d_min_if_first_omitted = d_sorted[differs[0]] if differs.size else None
+
+        result = flex.double()
+        for i_group in range(self._n_groups):
+            if only_group_sorted[0] != i_group:
+                d_min = d_sorted[0]
+            elif d_min_if_first_omitted is not None:
+                d_min = d_min_if_first_omitted
+            else:
+                result.append(0)
+                continue
+            n_complete = complete_d.size - np.searchsorted(
+                complete_d, d_min * (1 - miller.fp_eps_double)
+            )
+            result.append(min(n_unique[i_group] / max(1, n_complete), 1.0) * multiplier)
+        return result
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import iotbx.merging_statistics
+
+
+class MergingStatistics:
+    """
+    Merging statistics of a set of scaled, unmerged intensities.
+
+    The intensities are read once, and shared between the statistics for any
+    combination of resolution range, number of resolution bins and normal or
+    anomalous merging. Systematic absences are eliminated once, rather than
+    for each set of statistics.
+    """
+
+    def __init__(
+        self,
+        i_obs,
+        use_internal_variance=False,
+        eliminate_sys_absent=False,
+        assert_is_not_unique_set_under_symmetry=True,
+    ):
+        if eliminate_sys_absent:
+            i_obs = i_obs.eliminate_sys_absent().set_info(i_obs.info())
+        self.i_obs = i_obs
+        self._use_internal_variance = use_internal_variance
+        self._assert_is_not_unique_set_under_symmetry = (
+            assert_is_not_unique_set_under_symmetry
+        )
+        self._results = {}
+
+    @classmethod
+    def from_file(
+        cls,
+        scaled_unmerged_mtz,
+        data_labels=None,
+        anomalous_flag=False,
+        space_group_info=None,
+        **kwargs,
+    ):
+        i_obs = iotbx.merging_statistics.select_data(
+            str(scaled_unmerged_mtz), data_labels=data_labels
+        )
+        i_obs = i_obs.customized_copy(anomalous_flag=anomalous_flag, info=i_obs.info())
+        if space_group_info is not None:
+            i_obs = i_obs.customized_copy(
+                space_group_info=space_group_info, info=i_obs.info()
+            )
+        return cls(i_obs, **kwargs)
+
+    def dataset_statistics(self, anomalous=False, d_min=None, d_max=None, n_bins=20):
+        """The iotbx.merging_statistics.dataset_statistics of the intensities."""
+        key = (anomalous, d_min, d_max, n_bins)
+        if key not in self._results:
+            self._results[key] = iotbx.merging_statistics.dataset_statistics(
+                i_obs=self.i_obs,
+                d_min=d_min,
+                d_max=d_max,
+                n_bins=n_bins,
+                anomalous=anomalous,
+                use_internal_variance=self._use_internal_variance,
+                eliminate_sys_absent=False,
+                assert_is_not_unique_set_under_symmetry=self._assert_is_not_unique_set_under_symmetry,
+            )
+        return self._results[key]
+
+    def band_statistics(self, bands, n_bins=20, min_n_bins=6):
+        """
+        The dataset_statistics for each of a list of (anomalous, d_min, d_max)
+        bands, all with the same number of resolution bins.
+
+        If there are too few reflections for the number of bins in any band,
+        the number of bins is reduced by three and the statistics of every
+        band are computed again, down to a minimum of min_n_bins.
+        """
+        while True:
+            try:
+                return [
+                    self.dataset_statistics(anomalous, d_min, d_max, n_bins)
+                    for anomalous, d_min, d_max in bands
+                ]
+            except iotbx.merging_statistics.StatisticsError:
+                # Too few reflections for too many bins.
+                n_bins -= 3
+                if n_bins < min_n_bins:
+                    raise
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import concurrent.futures
 import copy
 import logging
 import os
@@ -19,7 +20,10 @@ from scitbx.math import five_number_summary
 from xia2.Handlers.Phil import PhilIndex
 from xia2.lib.bits import auto_logfiler
 from xia2.Modules import Report
-from xia2.Modules.MultiCrystal.data_manager import DataManager
+from xia2.Modules.MultiCrystal.data_manager import (
+    DataManager,
+    reflection_counts_by_identifier,
+)
 from xia2.Modules.MultiCrystalAnalysis import MultiCrystalAnalysis
 from xia2.Modules.Scaler.DialsScaler import (
     convert_merged_mtz_to_sca,
@@ -323,19 +327,15 @@ class MultiCrystalScale:
 
         if params.remove_profile_fitting_failures:
             reflections = self._data_manager.reflections
-            profile_fitted_mask = reflections.get_flags(
-                reflections.flags.integrated_prf
+            counts = reflection_counts_by_identifier(
+                reflections,
+                reflections.get_flags(reflections.flags.integrated_prf),
             )
-            keep_expts = []
-            for i, expt in enumerate(self._data_manager.experiments):
-                refl_used = reflections.select(profile_fitted_mask)
-                if (
-                    expt.identifier in refl_used.experiment_identifiers().values()
-                    and refl_used.select_on_experiment_identifiers(
-                        [expt.identifier]
-                    ).size()
-                ):
-                    keep_expts.append(expt.identifier)
+            keep_expts = [
+                expt.identifier
+                for expt in self._data_manager.experiments
+                if counts.get(expt.identifier)
+            ]
             if len(keep_expts):
                 logger.info(
                     "Selecting %i experiments with profile-fitted reflections"
@@ -344,16 +344,12 @@ class MultiCrystalScale:
                 self._data_manager.select(keep_expts)
 
         reflections = self._data_manager.reflections
-        used_in_refinement_mask = reflections.get_flags(
-            reflections.flags.used_in_refinement
+        counts = reflection_counts_by_identifier(
+            reflections, reflections.get_flags(reflections.flags.used_in_refinement)
         )
         keep_expts = []
-        for i, expt in enumerate(self._data_manager.experiments):
-            refl_used = reflections.select(used_in_refinement_mask)
-            if (
-                expt.identifier in refl_used.experiment_identifiers().values()
-                and refl_used.select_on_experiment_identifiers([expt.identifier]).size()
-            ):
+        for expt in self._data_manager.experiments:
+            if counts.get(expt.identifier):
                 keep_expts.append(expt.identifier)
             else:
                 logger.info(
@@ -471,6 +467,7 @@ class MultiCrystalScale:
             self._data_manager_original = self._data_manager
             cwd = os.path.abspath(os.getcwd())
             n_processed = 0
+            cluster_tasks = []
             for cluster in reversed(clusters):
                 if max_clusters is not None and n_processed == max_clusters:
                     break
@@ -490,73 +487,20 @@ class MultiCrystalScale:
 
                 logger.info("Scaling cluster %i:" % cluster.cluster_id)
                 logger.info(cluster)
-                cluster_dir = "cluster_%i" % cluster.cluster_id
+                cluster_dir = os.path.join(cwd, "cluster_%i" % cluster.cluster_id)
                 if not os.path.exists(cluster_dir):
                     os.mkdir(cluster_dir)
-                os.chdir(cluster_dir)
-                data_manager = copy.deepcopy(self._data_manager_original)
                 cluster_identifiers = [
                     self._data_manager.ids_to_identifiers_map[l] for l in cluster.labels
                 ]
-                data_manager.select(cluster_identifiers)
-                scaled = Scale(data_manager, self._params)
-                data_manager.export_experiments("scaled.expt")
-                data_manager.export_reflections("scaled.refl", d_min=scaled.d_min)
-
-                # if we didn't have an external reference for the free_flags set, we need to make
-                # and record one here.
-                data_manager.export_merged_mtz(
-                    "scaled.mtz",
-                    d_min=scaled.d_min,
-                    r_free_params=self._params.r_free_flags,
-                    wavelength_tolerance=self._params.wavelength_tolerance,
-                )
-                if (not free_flags_in_full_set) and (
-                    self._params.r_free_flags.extend is True
-                ):
-                    self._params.r_free_flags.reference = os.path.join(
-                        os.getcwd(), "scaled.mtz"
-                    )
-                    free_flags_in_full_set = True
-
-                if len(self.wavelengths) > 1:
-                    data_manager.split_by_wavelength(self._params.wavelength_tolerance)
-                    for wl in self.wavelengths:
-                        name = data_manager.export_unmerged_wave_mtz(
-                            wl,
-                            "scaled_unmerged",
-                            d_min=scaled.d_min,
-                            wavelength_tolerance=self._params.wavelength_tolerance,
-                        )
-                        if name:
-                            convert_unmerged_mtz_to_sca(name)
-                    # now export merged of each
-                    for wl in self.wavelengths:
-                        name = data_manager.export_merged_wave_mtz(
-                            wl,
-                            "scaled",
-                            d_min=scaled.d_min,
-                            r_free_params=self._params.r_free_flags,
-                            wavelength_tolerance=self._params.wavelength_tolerance,
-                        )
-                        if name:
-                            convert_merged_mtz_to_sca(name)
-                else:
-                    data_manager.export_unmerged_mtz(
-                        "scaled_unmerged.mtz",
-                        d_min=scaled.d_min,
-                        wavelength_tolerance=self._params.wavelength_tolerance,
-                    )
-                    convert_merged_mtz_to_sca("scaled.mtz")
-                    convert_unmerged_mtz_to_sca("scaled_unmerged.mtz")
+                cluster_tasks.append((cluster_dir, cluster_identifiers))
 
-                self._record_individual_report(
-                    data_manager, scaled.report(), cluster_dir.replace("_", " ")
-                )
-                os.chdir(cwd)
+            free_flags_in_full_set = self._scale_clusters(
+                cluster_tasks, free_flags_in_full_set
+            )
         if self._params.filtering.method:
             # Final round of scaling, this time filtering out any bad datasets
-            data_manager = copy.deepcopy(self._data_manager)
+            data_manager = self._data_manager.view()
             params = copy.deepcopy(self._params)
             params.unit_cell.refine = []
             params.resolution.d_min = self._params.resolution.d_min
@@ -617,8 +561,76 @@ class MultiCrystalScale:
 
         self.report()
 
+    def _scale_clusters(self, cluster_tasks, free_flags_in_full_set):
+        """
+        Scale and export each cluster in its own working directory, running
+        the clusters in parallel over at most nproc processes, then record the
+        cluster reports in order.
+        """
+        results = [None] * len(cluster_tasks)
+        tasks = list(enumerate(cluster_tasks))
+
+        # if we didn't have an external reference for the free_flags set, the
+        # first cluster makes one, which must be used for the other clusters.
+        # It is scaled with all the processors before the others are started.
+        if (
+            tasks
+            and (not free_flags_in_full_set)
+            and (self._params.r_free_flags.extend is True)
+        ):
+            i, (cluster_dir, cluster_identifiers) = tasks.pop(0)
+            results[i] = _scale_cluster(
+                self._data_manager_original.view(cluster_identifiers),
+                self._params,
+                cluster_dir,
+                len(self.wavelengths),
+                self._params.nproc,
+            )
+            self._params.r_free_flags.reference = os.path.join(
+                cluster_dir, "scaled.mtz"
+            )
+            free_flags_in_full_set = True
+
+        n_workers = min(self._params.nproc, len(tasks))
+        if n_workers > 1:
+            # share out all the processors, the first clusters of each round
+            # of n_workers clusters having any which are left over
+            nproc_per_cluster, n_extra = divmod(self._params.nproc, n_workers)
+            with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as pool:
+                futures = {
+                    pool.submit(
+                        _scale_cluster,
+                        self._data_manager_original.view(cluster_identifiers),
+                        self._params,
+                        cluster_dir,
+                        len(self.wavelengths),
+                        nproc_per_cluster + (k % n_workers < n_extra),
+                    ): i
+                    for k, (i, (cluster_dir, cluster_identifiers)) in enumerate(tasks)
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    results[futures[future]] = future.result()
+        else:
+            for i, (cluster_dir, cluster_identifiers) in tasks:
+                results[i] = _scale_cluster(
+                    self._data_manager_original.view(cluster_identifiers),
+                    self._params,
+                    cluster_dir,
+                    len(self.wavelengths),
+                    self._params.nproc,
+                )
+
+        for (cluster_dir, _), summary in zip(cluster_tasks, results):
+            self._record_report_summary(
+                summary, os.path.basename(cluster_dir).replace("_", " ")
+            )
+        return free_flags_in_full_set
+
     def _record_individual_report(self, data_manager, report, cluster_name):
-        d = self._report_as_dict(report)
+        self._record_report_summary(_report_summary(report), cluster_name)
+
+    def _record_report_summary(self, summary, cluster_name):
+        d, overall_stats = summary
 
         self._individual_report_dicts[cluster_name] = self._individual_report_dict(
             d, cluster_name
@@ -656,13 +668,11 @@ class MultiCrystalScale:
             ("completeness", "Completeness"),
             ("i_over_sigma_mean", "I/σ(I)"),
         ):
-            self._comparison_graphs["radar"]["data"][-1]["r"].append(
-                getattr(report.merging_stats.overall, k)
-            )
+            self._comparison_graphs["radar"]["data"][-1]["r"].append(overall_stats[k])
             self._comparison_graphs["radar"]["data"][-1]["theta"].append(text)
 
         self._comparison_graphs["radar"]["data"][-1]["r"].append(
-            uctbx.d_as_d_star_sq(report.merging_stats.overall.d_min)
+            uctbx.d_as_d_star_sq(overall_stats["d_min"])
         )
         self._comparison_graphs["radar"]["data"][-1]["theta"].append("Resolution")
 
@@ -711,7 +721,7 @@ class MultiCrystalScale:
         )
 
     @staticmethod
-    def _report_as_dict(report):
+    def _report_as_dict(report, dest_path=None):
         (
             overall_stats_table,
             merging_stats_table,
@@ -726,9 +736,9 @@ class MultiCrystalScale:
         }
 
         d.update(stats_plots)
-        d.update(report.batch_dependent_plots())
+        d.update(report.batch_dependent_plots(max_points=500))
         d.update(report.intensity_stats_plots())
-        d.update(report.pychef_plots())
+        d.update(report.pychef_plots(max_points=500))
 
         xtriage_success, xtriage_warnings, xtriage_danger = report.xtriage_report()
         d["xtriage"] = {
@@ -739,25 +749,7 @@ class MultiCrystalScale:
         d["merging_stats"] = report.merging_stats.as_dict()
         d["merging_stats_anom"] = report.merging_stats.as_dict()
 
-        max_points = 500
-        for g in (
-            "scale_rmerge_vs_batch",
-            "completeness_vs_dose",
-            "rcp_vs_dose",
-            "scp_vs_dose",
-            "rd_vs_batch_difference",
-        ):
-            for i, data in enumerate(d[g]["data"]):
-                n = len(data["x"])
-                if n > max_points:
-                    step = n // max_points
-                    sel = (flex.int_range(n) % step) == 0
-                    data["x"] = list(flex.int(data["x"]).select(sel))
-                    data["y"] = list(flex.double(data["y"]).select(sel))
-                    if "text" in data:
-                        data["text"] = list(flex.std_string(data["text"]).select(sel))
-
-        d.update(report.multiplicity_plots())
+        d.update(report.multiplicity_plots(dest_path=dest_path))
         return d
 
     @staticmethod
@@ -1017,14 +1009,112 @@ class MultiCrystalScale:
         self._cc_clusters = mca.cc_clusters
 
 
+def _report_summary(report, dest_path=None):
+    """
+    The report dictionary and overall merging statistics of a scaled dataset,
+    as needed to record an individual report.
+    """
+    overall = report.merging_stats.overall
+    overall_stats = {
+        k: getattr(overall, k)
+        for k in (
+            "cc_one_half",
+            "mean_redundancy",
+            "completeness",
+            "i_over_sigma_mean",
+            "d_min",
+        )
+    }
+    return MultiCrystalScale._report_as_dict(report, dest_path), overall_stats
+
+
+def _scale_cluster(data_manager, params, working_directory, n_wavelengths, nproc):
+    """
+    Scale a cluster of datasets, given as a view of the selected data, and
+    export the results in the working directory. This does not change the
+    current working directory, so that clusters may be scaled in parallel
+    processes.
+
+    The programs are run with nproc processors, and the global setting of
+    the number of processors is restored afterwards.
+
+    Returns:
+        The report summary of the scaled cluster, as for _report_summary.
+    """
+    multiprocessing_params = PhilIndex.params.xia2.settings.multiprocessing
+    global_nproc = multiprocessing_params.nproc
+    multiprocessing_params.nproc = nproc
+    try:
+        return _scale_and_export_cluster(
+            data_manager, params, working_directory, n_wavelengths
+        )
+    finally:
+        multiprocessing_params.nproc = global_nproc
+
+
+def _scale_and_export_cluster(data_manager, params, working_directory, n_wavelengths):
+    params = copy.deepcopy(params)
+    scaled = Scale(data_manager, params, working_directory=working_directory)
+
+    def path(filename):
+        return os.path.join(working_directory, filename)
+
+    data_manager.export_experiments(path("scaled.expt"))
+    data_manager.export_reflections(path("scaled.refl"), d_min=scaled.d_min)
+    data_manager.export_merged_mtz(
+        path("scaled.mtz"),
+        d_min=scaled.d_min,
+        r_free_params=params.r_free_flags,
+        wavelength_tolerance=params.wavelength_tolerance,
+    )
+
+    if n_wavelengths > 1:
+        data_manager.split_by_wavelength(params.wavelength_tolerance)
+        for wl in data_manager.wavelengths:
+            name = data_manager.export_unmerged_wave_mtz(
+                wl,
+                path("scaled_unmerged"),
+                d_min=scaled.d_min,
+                wavelength_tolerance=params.wavelength_tolerance,
+            )
+            if name:
+                convert_unmerged_mtz_to_sca(name)
+        # now export merged of each
+        for wl in data_manager.wavelengths:
+            name = data_manager.export_merged_wave_mtz(
+                wl,
+                path("scaled"),
+                d_min=scaled.d_min,
+                r_free_params=params.r_free_flags,
+                wavelength_tolerance=params.wavelength_tolerance,
+            )
+            if name:
+                convert_merged_mtz_to_sca(name)
+    else:
+        data_manager.export_unmerged_mtz(
+            path("scaled_unmerged.mtz"),
+            d_min=scaled.d_min,
+            wavelength_tolerance=params.wavelength_tolerance,
+        )
+        convert_merged_mtz_to_sca(path("scaled.mtz"))
+        convert_unmerged_mtz_to_sca(path("scaled_unmerged.mtz"))
+
+    return _report_summary(scaled.report(), dest_path=working_directory)
+
+
 class Scale:
-    def __init__(self, data_manager, params, filtering=False):
+    def __init__(self, data_manager, params, filtering=False, working_directory=None):
         self._data_manager = data_manager
         self._params = params
         self._filtering = filtering
+        self._working_directory = working_directory or os.getcwd()
 
-        self._experiments_filename = "models.expt"
-        self._reflections_filename = "observations.refl"
+        self._experiments_filename = os.path.join(
+            self._working_directory, "models.expt"
+        )
+        self._reflections_filename = os.path.join(
+            self._working_directory, "observations.refl"
+        )
         self._data_manager.export_experiments(self._experiments_filename)
         self._data_manager.export_reflections(self._reflections_filename)
 
@@ -1044,7 +1134,9 @@ class Scale:
     def refine(self):
         # refine in correct bravais setting
         self._experiments_filename, self._reflections_filename = self._dials_refine(
-            self._experiments_filename, self._reflections_filename
+            self._experiments_filename,
+            self._reflections_filename,
+            working_directory=self._working_directory,
         )
         self._data_manager.experiments = load.experiment_list(
             self._experiments_filename, check_format=False
@@ -1059,6 +1151,7 @@ class Scale:
             self._experiments_filename,
             self._reflections_filename,
             combine_crystal_models=self._params.two_theta_refine.combine_crystal_models,
+            working_directory=self._working_directory,
         )
         self._data_manager.experiments = load.experiment_list(
             self._experiments_filename, check_format=False
@@ -1069,8 +1162,12 @@ class Scale:
         return self._data_manager
 
     @staticmethod
-    def _dials_refine(experiments_filename, reflections_filename):
+    def _dials_refine(
+        experiments_filename, reflections_filename, working_directory=None
+    ):
         refiner = Refine()
+        if working_directory:
+            refiner.set_working_directory(working_directory)
         auto_logfiler(refiner)
         refiner.set_experiments_filename(experiments_filename)
         refiner.set_indexed_filename(reflections_filename)
@@ -1082,9 +1179,14 @@ class Scale:
 
     @staticmethod
     def _dials_two_theta_refine(
-        experiments_filename, reflections_filename, combine_crystal_models=True
+        experiments_filename,
+        reflections_filename,
+        combine_crystal_models=True,
+        working_directory=None,
     ):
         tt_refiner = TwoThetaRefine()
+        if working_directory:
+            tt_refiner.set_working_directory(working_directory)
         auto_logfiler(tt_refiner)
         tt_refiner.set_experiments([experiments_filename])
         tt_refiner.set_reflection_files([reflections_filename])
@@ -1095,6 +1197,7 @@ class Scale:
     def scale(self, d_min=None, d_max=None):
         logger.debug("Scaling with dials.scale")
         scaler = DialsScale()
+        scaler.set_working_directory(self._working_directory)
         auto_logfiler(scaler)
         scaler.add_experiments_json(self._experiments_filename)
         scaler.add_reflections_file(self._reflections_filename)
@@ -1183,6 +1286,7 @@ class Scale:
         # see also xia2/Modules/Scaler/CommonScaler.py: CommonScaler._estimate_resolution_limit()
         params = self._params.resolution
         m = EstimateResolution()
+        m.set_working_directory(self._working_directory)
         auto_logfiler(m)
         # use the scaled .refl and .expt file
         if self._experiments_filename and self._reflections_filename:
@@ -9,6 +9,7 @@ import numpy as np
 from scipy.cluster import hierarchy
 
 import iotbx.phil
+from cctbx.miller import fp_eps_double
 from dials.util import tabulate
 from scitbx.array_family import flex
 
@@ -66,12 +67,112 @@ class ClusterInfo:
         return "\n".join(lines)
 
 
+# number of bits set in each possible byte
+_popcount = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+class ClusterStatistics:
+    """
+    Multiplicity, completeness and average unit cell of the merged intensities
+    of each cluster in a dendrogram of datasets.
+
+    Rather than merging the intensities of every cluster afresh, the statistics
+    of each cluster are combined from those of its two children: the number of
+    observations, the set of unique asu indices (as a bit set over the unique
+    indices of all datasets), the highest resolution and the sum of the unit
+    cell parameters. The statistics of the datasets are computed once, and
+    shared between dendrograms.
+    """
+
+    def __init__(self, intensities_all, labels_all, unit_cells):
+        asu = intensities_all.map_to_asu()
+        # pack each index into a single integer key
+        hkl = asu.indices().as_vec3_double().as_numpy_array().astype(np.int64)
+        keys = ((hkl[:, 0] + 2**20) << 42) | ((hkl[:, 1] + 2**20) << 21)
+        keys |= hkl[:, 2] + 2**20
+        unique, inverse = np.unique(keys, return_inverse=True)
+        d_spacings = np.empty(len(unique))
+        d_spacings[inverse] = asu.d_spacings().data().as_numpy_array()
+
+        # the d spacings of the complete set at the highest resolution, from
+        # which that of any cluster is counted as for miller.set.completeness
+        complete_set = asu.complete_set()
+        self._complete_d_spacings = np.sort(
+            complete_set.d_spacings().data().as_numpy_array()
+        )
+
+        labels_all = labels_all.as_numpy_array()
+        by_dataset = np.split(
+            inverse[np.argsort(labels_all, kind="stable")],
+            np.cumsum(np.bincount(labels_all, minlength=len(unit_cells)))[:-1],
+        )
+        self._datasets = []
+        for selection, unit_cell in zip(by_dataset, unit_cells):
+            present = np.zeros(len(unique), dtype=bool)
+            present[selection] = True
+            self._datasets.append(
+                (
+                    len(selection),
+                    np.packbits(present),
+                    d_spacings[selection].min() if len(selection) else np.inf,
+                    np.array(unit_cell.parameters()),
+                    1,
+                )
+            )
+
+    def _n_complete(self, d_min):
+        """The size of the complete set to d_min."""
+        d_min *= 1 - fp_eps_double
+        return len(self._complete_d_spacings) - np.searchsorted(
+            self._complete_d_spacings, d_min, side="left"
+        )
+
+    def for_clusters(self, cluster_dict):
+        """
+        The (multiplicity, completeness, average unit cell) of each cluster of a
+        dictionary as from linkage_matrix_to_dict, where each cluster is
+        formed from clusters with lower ids and individual datasets.
+        """
+        # the node currently containing each dataset, or the dataset itself
+        nodes = {i + 1: self._datasets[i] for i in range(len(self._datasets))}
+        owner = {i + 1: i + 1 for i in range(len(self._datasets))}
+        results = {}
+        for cluster_id in sorted(cluster_dict):
+            datasets = cluster_dict[cluster_id]["datasets"]
+            children = list(dict.fromkeys(owner[j] for j in datasets))
+            n_obs, present, d_min, uc_sum, n_datasets = nodes.pop(children[0])
+            for child in children[1:]:
+                c_obs, c_present, c_d_min, c_uc_sum, c_datasets = nodes.pop(child)
+                n_obs += c_obs
+                present = present | c_present
+                d_min = min(d_min, c_d_min)
+                uc_sum = uc_sum + c_uc_sum
+                n_datasets += c_datasets
+            key = ("cluster", cluster_id)
+            nodes[key] = (n_obs, present, d_min, uc_sum, n_datasets)
+            for j in datasets:
+                owner[j] = key
+
+            n_unique = int(_popcount[present].sum())
+            multiplicity = n_obs / n_unique if n_unique else 0
+            completeness = 0.0
+            if n_unique:
+                completeness = min(n_unique / max(1, self._n_complete(d_min)), 1.0)
+            results[cluster_id] = (
+                multiplicity,
+                completeness,
+                list(uc_sum / n_datasets),
+            )
+        return results
+
+
 class multi_crystal_analysis:
     def __init__(self, unmerged_intensities, labels=None, prefix=None):
 
         self.unmerged_intensities = unmerged_intensities
         self._intensities_all = None
         self._labels_all = flex.size_t()
+        self._cluster_statistics = None
         if prefix is None:
             prefix = ""
         self._prefix = prefix
@@ -142,28 +243,24 @@ class multi_crystal_analysis:
         )
 
     def cluster_info(self, cluster_dict):
+        if self._cluster_statistics is None:
+            self._cluster_statistics = ClusterStatistics(
+                self._intensities_all,
+                self._labels_all,
+                [i.unit_cell() for i in self.intensities],
+            )
+        statistics = self._cluster_statistics.for_clusters(cluster_dict)
         info = []
         for cluster_id, cluster in cluster_dict.items():
-            sel_cluster = flex.bool(self._labels_all.size(), False)
-            uc_params = [flex.double() for i in range(6)]
-            for j in cluster["datasets"]:
-                sel_cluster |= self._labels_all == j
-                uc_j = self.intensities[j - 1].unit_cell().parameters()
-                for i in range(6):
-                    uc_params[i].append(uc_j[i])
-            average_uc = [flex.mean(uc_params[i]) for i in range(6)]
-            intensities_cluster = self._intensities_all.select(sel_cluster)
-            merging = intensities_cluster.merge_equivalents()
-            merged_intensities = merging.array()
-            multiplicities = merging.redundancies()
+            multiplicity, completeness, average_uc = statistics[cluster_id]
             dataset_ids = cluster["datasets"]
             labels = [self.labels[i - 1] for i in dataset_ids]
             info.append(
                 ClusterInfo(
                     cluster_id,
                     labels,
-                    flex.mean(multiplicities.data().as_double()),
-                    merged_intensities.completeness(),
+                    multiplicity,
+                    completeness,
                     unit_cell=average_uc,
                     height=cluster.get("height"),
                 )
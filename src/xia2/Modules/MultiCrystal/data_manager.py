@@ -4,10 +4,12 @@ import copy
 import logging
 import math
 
+import numpy as np
+
 from cctbx import miller
 from dials.array_family import flex
 from dials.command_line import export, merge
-from dials.command_line.slice_sequence import slice_experiments, slice_reflections
+from dials.command_line.slice_sequence import slice_experiments
 from dials.report.analysis import scaled_data_as_miller_array
 from dials.util.batch_handling import (
     assign_batches_to_reflections,
@@ -18,6 +20,96 @@ from dxtbx.model import ExperimentList
 logger = logging.getLogger(__name__)
 
 
+def reflection_counts_by_identifier(reflections, selection=None):
+    """
+    The number of reflections of each experiment in the table, optionally
+    counting only the reflections in a selection (e.g. a flag mask), as a
+    dictionary of experiment identifier to count. Every identifier in the
+    table's experiment_identifiers() map is included, with a count of zero
+    if it has no (selected) reflections.
+    """
+    ids = reflections["id"].as_numpy_array()
+    if selection is not None:
+        ids = ids[selection.as_numpy_array()]
+    id_map = reflections.experiment_identifiers()
+    n_ids = max([0] + [k + 1 for k in id_map.keys()])
+    counts = np.bincount(ids[ids >= 0], minlength=n_ids)
+    return {v: int(counts[k]) for k, v in id_map}
+
+
+class ReflectionsById:
+    """
+    The rows of a reflection table grouped by experiment id.
+
+    The table is sorted on id once, with a stable sort, so that the rows
+    of each experiment are a contiguous range of the sort order. This
+    avoids a full-table selection for each experiment.
+    """
+
+    def __init__(self, reflections, n_ids=0):
+        self._reflections = reflections
+        self._ids = reflections["id"].as_numpy_array()
+        self._order = np.argsort(self._ids, kind="stable")
+        # unassigned reflections (id -1) sort to the start
+        counts = np.bincount(self._ids[self._ids >= 0], minlength=n_ids)
+        ends = (self._ids.size - counts.sum()) + np.cumsum(counts)
+        self.ranges = list(zip((ends - counts).tolist(), ends.tolist()))
+
+    def indices(self, id_):
+        """The row indices of an experiment id, as a view of the sort order."""
+        start, end = self.ranges[id_]
+        return self._order[start:end]
+
+    def table(self, id_):
+        return self._reflections.select(flex.size_t(self.indices(id_)))
+
+    def tables(self):
+        """One reflection table for each experiment id, in order of id."""
+        return [self.table(id_) for id_ in range(len(self.ranges))]
+
+    def selection(self, ids):
+        """A selection of the rows of any of the experiment ids."""
+        ids = list(ids)
+        keep = np.zeros(max([len(self.ranges)] + [i + 1 for i in ids]) + 1, bool)
+        keep[ids] = True
+        # id -1 looks up the final element, which is never set
+        return flex.bool(keep[self._ids])
+
+    def select_on_experiment_identifiers(self, identifiers):
+        """As reflection_table.select_on_experiment_identifiers."""
+        id_map = self._reflections.experiment_identifiers()
+        ids = [k for k, v in id_map if v in identifiers]
+        if len(ids) != len(identifiers):
+            raise KeyError(
+                "Not all requested identifiers found in the table's map, has the "
+                "experiment_identifiers() map been created?"
+            )
+        selected = self._reflections.select(self.selection(ids))
+        for id_ in list(selected.experiment_identifiers().keys()):
+            if id_ not in ids:
+                del selected.experiment_identifiers()[id_]
+        return selected
+
+    def slice_images(self, image_ranges):
+        """
+        As dials slice_reflections, select the reflections of each experiment
+        within an image range, where reflections on image n have z in the
+        range [n-1, n).
+        """
+        z = self._reflections["xyzobs.px.value"].parts()[2].as_numpy_array()
+        keep = []
+        for id_, image_range in enumerate(image_ranges):
+            if image_range is None:
+                continue
+            isel = self.indices(id_)
+            frames = z[isel]
+            keep.append(
+                isel[(frames >= image_range[0] - 1) & (frames < image_range[1])]
+            )
+        keep = np.concatenate(keep) if keep else np.zeros(0, dtype=self._order.dtype)
+        return self._reflections.select(flex.size_t(keep))
+
+
 class DataManager:
     def __init__(self, experiments, reflections):
         self._input_experiments = experiments
@@ -79,9 +171,9 @@ class DataManager:
                 if expt.identifier in experiment_identifiers
             ]
         )
-        self.reflections = self.reflections.select_on_experiment_identifiers(
-            experiment_identifiers
-        )
+        self.reflections = ReflectionsById(
+            self.reflections
+        ).select_on_experiment_identifiers(experiment_identifiers)
         self.reflections.reset_ids()
         self.reflections.assert_experiment_identifiers_are_consistent(self.experiments)
 
@@ -111,7 +203,9 @@ class DataManager:
         n_refl_before = self._reflections.size()
         self._experiments = slice_experiments(self._experiments, image_range)
         flex.min_max_mean_double(self._reflections["xyzobs.px.value"].parts()[2]).show()
-        self._reflections = slice_reflections(self._reflections, image_range)
+        self._reflections = ReflectionsById(
+            self._reflections, len(self._experiments)
+        ).slice_images(image_range)
         flex.min_max_mean_double(self._reflections["xyzobs.px.value"].parts()[2]).show()
         logger.info(
             "%i reflections out of %i remaining after filtering for dose"
@@ -120,11 +214,9 @@ class DataManager:
 
     def reflections_as_miller_arrays(self, combined=False):
 
-        reflection_tables = []
-        for id_ in set(self._reflections["id"]).difference({-1}):
-            reflection_tables.append(
-                self._reflections.select(self._reflections["id"] == id_)
-            )
+        reflection_tables = ReflectionsById(
+            self._reflections, len(self._experiments)
+        ).tables()
 
         reflection_tables = assign_batches_to_reflections(
             reflection_tables, self.batch_offset_list
@@ -161,12 +253,21 @@ class DataManager:
                 scale_arrays.append(miller.array(scaled_arrays[-1], data=scales))
             return scaled_arrays, batch_arrays, scale_arrays
 
+    def view(self, experiment_identifiers=None, d_min=None):
+        """
+        A copy-on-write view of a selection of the data, which only copies
+        the data from this DataManager when needed.
+        """
+        return DataManagerView(self, experiment_identifiers, d_min=d_min)
+
     def reindex(self, cb_op, space_group=None):
         logger.info("Reindexing: %s" % cb_op)
         self._reflections["miller_index"] = cb_op.apply(
             self._reflections["miller_index"]
         )
+        self._reindex_experiments(cb_op, space_group)
 
+    def _reindex_experiments(self, cb_op, space_group=None):
         for expt in self._experiments:
             cryst_reindexed = expt.crystal.change_basis(cb_op)
             if space_group is not None:
@@ -183,10 +284,14 @@ class DataManager:
 
         self.data_split_by_wl = {}  # do want to update this based on current data
 
+        reflections_by_id = ReflectionsById(self.reflections, len(self.experiments))
         for wl in sorted(self.wavelengths.keys()):
-            new_exps = copy.deepcopy(self.experiments)
-            new_exps.select_on_experiment_identifiers(self.wavelengths[wl].identifiers)
-            new_refls = self.reflections.select_on_experiment_identifiers(
+            # the experiments are only copied when exported
+            identifiers = set(self.wavelengths[wl].identifiers)
+            new_exps = ExperimentList(
+                [expt for expt in self.experiments if expt.identifier in identifiers]
+            )
+            new_refls = reflections_by_id.select_on_experiment_identifiers(
                 new_exps.identifiers()
             )
             self.data_split_by_wl[wl] = {"expt": new_exps, "refl": new_refls}
@@ -261,3 +366,141 @@ class DataManager:
             params, self._experiments, [self._reflections]
         )
         mtz_obj.write(filename)
+
+
+class DataManagerView(DataManager):
+    """
+    A copy-on-write view of the data of a DataManager.
+
+    The view records a selection of experiment identifiers, any reindexing
+    operations and a resolution limit. The experiments and reflections are
+    only copied from the parent DataManager, with these applied, when they
+    are first accessed. Exporting the reflections before then writes them
+    without keeping a copy, so that e.g. scaling a view, which replaces the
+    reflections with the scaled reflections, never copies the full table.
+    The parent must not be modified while the view is in use.
+    """
+
+    def __init__(self, parent, experiment_identifiers=None, d_min=None):
+        self._parent = parent
+        parent_identifiers = list(parent.experiments.identifiers())
+        if experiment_identifiers is None:
+            experiment_identifiers = parent_identifiers
+        selected = set(experiment_identifiers)
+        missing = selected.difference(parent_identifiers)
+        if missing:
+            raise KeyError(
+                "Experiment identifiers not found: %s" % ", ".join(sorted(missing))
+            )
+        self._identifiers = [i for i in parent_identifiers if i in selected]
+        self._cb_ops = []
+        self._d_min = d_min
+        self._view_experiments = None
+        self._view_reflections = None
+
+        self._input_experiments = parent._input_experiments
+        self._input_reflections = parent._input_reflections
+        self.ids_to_identifiers_map = dict(parent.ids_to_identifiers_map)
+        self.identifiers_to_ids_map = dict(parent.identifiers_to_ids_map)
+        self.wavelengths = dict(parent.wavelengths)
+        self.all_stills = parent.all_stills
+        keep = set(self._identifiers)
+        self.batch_offset_list = [
+            i
+            for (i, expt) in zip(parent.batch_offset_list, parent.experiments)
+            if expt.identifier in keep
+        ]
+
+    @property
+    def _experiments(self):
+        if self._view_experiments is None:
+            keep = set(self._identifiers)
+            # copy the experiments together, to preserve any shared models
+            self._view_experiments = ExperimentList(
+                copy.deepcopy(
+                    [e for e in self._parent.experiments if e.identifier in keep]
+                )
+            )
+        return self._view_experiments
+
+    @_experiments.setter
+    def _experiments(self, experiments):
+        self._view_experiments = experiments
+
+    @property
+    def _reflections(self):
+        if self._view_reflections is None:
+            self._view_reflections = self._selected_reflections(writable=True)
+        return self._view_reflections
+
+    @_reflections.setter
+    def _reflections(self, reflections):
+        self._view_reflections = reflections
+
+    def _selected_reflections(self, writable):
+        """
+        The reflections of the view, which are only a copy of the parent's
+        reflections if they are writable or differ from the parent's.
+        """
+        reflections = self._parent.reflections
+        if len(self._identifiers) != len(self._parent.experiments):
+            reflections = ReflectionsById(reflections).select_on_experiment_identifiers(
+                self._identifiers
+            )
+            reflections.reset_ids()
+        elif writable or self._cb_ops:
+            reflections = copy.deepcopy(reflections)
+        for cb_op in self._cb_ops:
+            reflections["miller_index"] = cb_op.apply(reflections["miller_index"])
+        if self._d_min:
+            reflections = reflections.select(reflections["d"] >= self._d_min)
+        return reflections
+
+    def select(self, experiment_identifiers):
+        if self._view_reflections is not None:
+            super().select(experiment_identifiers)
+            return
+        missing = set(experiment_identifiers).difference(self._identifiers)
+        if missing:
+            raise KeyError(
+                "Experiment identifiers not found: %s" % ", ".join(sorted(missing))
+            )
+        keep = set(experiment_identifiers)
+        self.batch_offset_list = [
+            i
+            for (i, identifier) in zip(self.batch_offset_list, self._identifiers)
+            if identifier in keep
+        ]
+        self._identifiers = [i for i in self._identifiers if i in keep]
+        if self._view_experiments is not None:
+            self._view_experiments = ExperimentList(
+                [e for e in self._view_experiments if e.identifier in keep]
+            )
+
+    def reindex(self, cb_op, space_group=None):
+        if self._view_reflections is not None:
+            super().reindex(cb_op, space_group)
+            return
+        logger.info("Reindexing: %s" % cb_op)
+        self._cb_ops.append(cb_op)
+        self._reindex_experiments(cb_op, space_group)
+
+    def export_reflections(self, filename, d_min=None):
+        if self._view_reflections is not None:
+            return super().export_reflections(filename, d_min=d_min)
+        reflections = self._selected_reflections(writable=False)
+        if d_min:
+            reflections = reflections.select(reflections["d"] >= d_min)
+        reflections.as_file(filename)
+        return filename
+
+    def __getstate__(self):
+        # pickle only the data of the view, without the parent
+        state = dict(self.__dict__)
+        state["_view_experiments"] = self._experiments
+        if self._view_reflections is None:
+            state["_view_reflections"] = self._selected_reflections(writable=False)
+        state["_parent"] = None
+        state["_input_experiments"] = None
+        state["_input_reflections"] = None
+        return state
@@ -2,11 +2,9 @@ from __future__ import annotations
 
 import json
 import logging
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from itertools import combinations
 
-import pandas as pd
-
 from dials.algorithms.clustering.unit_cell import cluster_unit_cells
 from dials.algorithms.scaling.scale_and_filter import make_scaling_filtering_plots
 from dials.algorithms.symmetry.cosym import SymmetryAnalysis
@@ -207,86 +205,55 @@ relatively isomorphous.
     @staticmethod
     def interesting_cluster_identification(clusters, params):
 
-        cluster_numbers = []
-        heights = []
-        labels = []
-        number_of_datasets = []
-        for cluster in clusters:
-
-            # Because analysing each possible pair of clusters, to cut down computation time do initial filtering here
-
-            if len(cluster.labels) >= params.min_cluster_size:
-                cluster_numbers.append("cluster_" + str(cluster.cluster_id))
-                heights.append(cluster.height)
-                labels.append(cluster.labels)
-                number_of_datasets.append(len(cluster.labels))
-
-        c_data = {
-            "Cluster Number": cluster_numbers,
-            "Height": heights,
-            "Datasets": labels,
-            "Length": number_of_datasets,
-        }
-
-        cluster_data = pd.DataFrame(c_data)
+        clusters = [c for c in clusters if len(c.labels) >= params.min_cluster_size]
 
-        clusters_to_compare_unfiltered = []
-        clusters_to_compare_height_compared = []
         clusters_for_analysis = []
+        final_clusters_to_compare = []
+
+        if clusters:
 
-        if len(cluster_data["Cluster Number"]) > 0:
-
-            # Find all combinations of pairs
-
-            cluster_pairs = list(combinations(cluster_data["Cluster Number"], 2))
-
-            # Add together length, and see if there are any common datasets
-
-            for pair in cluster_pairs:
-                length_1 = cluster_data.loc[
-                    cluster_data["Cluster Number"] == pair[0], "Length"
-                ].iloc[0]
-                length_2 = cluster_data.loc[
-                    cluster_data["Cluster Number"] == pair[1], "Length"
-                ].iloc[0]
-                datasets_1 = cluster_data.loc[
-                    cluster_data["Cluster Number"] == pair[0], "Datasets"
-                ].iloc[0]
-                datasets_2 = cluster_data.loc[
-                    cluster_data["Cluster Number"] == pair[1], "Datasets"
-                ].iloc[0]
-                c1 = set(datasets_1)
-                c2 = set(datasets_2)
-                duplicates = c1.intersection(c2)
-
-                # If no common datasets, see if length AND combined dataset list match a real cluster
-
-                if len(duplicates) == 0:
-                    total_number_of_datasets = length_1 + length_2
-                    datasets_to_look_for = sorted(datasets_1 + datasets_2)
-                    try:
-                        test = cluster_data.loc[
-                            (cluster_data["Length"] == total_number_of_datasets)
-                        ]
-                    except ValueError:
-                        print("Not a real cluster")
-                    else:
-                        for item in test["Datasets"]:
-                            if sorted(item) == datasets_to_look_for:
-                                clusters_to_compare_unfiltered.append(pair)
+            # Rebuild the dendrogram from the datasets in each cluster: the
+            # parent of a cluster is the next larger cluster containing its
+            # first dataset
+
+            by_size = sorted(
+                range(len(clusters)), key=lambda i: len(clusters[i].labels)
+            )
+            containing = defaultdict(list)
+            position = {}
+            for i in by_size:
+                for label in clusters[i].labels:
+                    containing[label].append(i)
+                first = clusters[i].labels[0]
+                position[i] = len(containing[first]) - 1
+            children = defaultdict(list)
+            for i in range(len(clusters)):
+                chain = containing[clusters[i].labels[0]]
+                if position[i] + 1 < len(chain):
+                    children[chain[position[i] + 1]].append(i)
+
+            # Pairs of sibling clusters with no common datasets, which together
+            # make up their parent cluster
+
+            cluster_pairs = []
+            for parent, siblings in children.items():
+                datasets = sorted(clusters[parent].labels)
+                for i, j in combinations(sorted(siblings), 2):
+                    if not set(clusters[i].labels).intersection(clusters[j].labels):
+                        if sorted(clusters[i].labels + clusters[j].labels) == datasets:
+                            cluster_pairs.append((i, j))
 
             # Compare against maximum allowed height difference
 
-            for pair in clusters_to_compare_unfiltered:
-                height_1 = cluster_data.loc[
-                    cluster_data["Cluster Number"] == pair[0], "Height"
-                ].iloc[0]
-                height_2 = cluster_data.loc[
-                    cluster_data["Cluster Number"] == pair[1], "Height"
-                ].iloc[0]
-                difference = abs(height_1 - height_2)
-                if difference < params.max_cluster_height_difference:
-                    clusters_to_compare_height_compared.append(pair)
+            clusters_to_compare_height_compared = [
+                (
+                    "cluster_%s" % clusters[i].cluster_id,
+                    "cluster_%s" % clusters[j].cluster_id,
+                )
+                for i, j in sorted(cluster_pairs)
+                if abs(clusters[i].height - clusters[j].height)
+                < params.max_cluster_height_difference
+            ]
 
             # Finally filter by maximum number allowed to output
 
@@ -312,8 +279,6 @@ relatively isomorphous.
                 + str(params.min_cluster_size)
                 + " excludes all clusters. Please re-run using a smaller minimum size."
             )
-            clusters_for_analysis = []
-            final_clusters_to_compare = []
 
         file_data = [
             "Compare each pair of clusters below",
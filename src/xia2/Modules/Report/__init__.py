@@ -4,7 +4,9 @@ import codecs
 import copy
 import io
 import logging
+import multiprocessing
 import os
+import time
 from collections import OrderedDict
 
 import dials.pychef
@@ -27,6 +29,7 @@ from mmtbx.scaling import printed_output
 from mmtbx.scaling.xtriage import master_params as xtriage_master_params
 from mmtbx.scaling.xtriage import xtriage_analyses
 
+import xia2.Driver.timing
 import xia2.Handlers.Environment
 import xia2.Handlers.Files
 from xia2.cli.plot_multiplicity import master_phil, plot_multiplicity
@@ -35,6 +38,65 @@ from xia2.Modules.Analysis import batch_phil_scope, phil_scope, separate_unmerge
 
 logger = logging.getLogger("xia2.Modules.Report")
 
+# The report sections which are skipped, rather than waited for, once the
+# time budget of a report is spent.
+optional_sections = ("xtriage_report", "multiplicity_plots")
+
+# The attributes of a report which are set by computing a section, and which
+# are returned from a worker process with the result of the section.
+_section_attributes = {
+    "resolution_plots_and_stats": ("merging_stats", "merging_stats_anom"),
+    "xtriage_report": ("_xanalysis",),
+}
+
+# The report sections which use the attributes set by another section, and
+# which are computed after that section (if it is one of the sections).
+_section_dependencies = {"intensity_stats_plots": "xtriage_report"}
+
+_worker_report = None
+
+
+def report_nproc(nproc=None):
+    """
+    The number of processes for a report, which is the xia2 multiprocessing
+    nproc unless the report's own nproc is given.
+    """
+    if nproc is None:
+        nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+    return nproc if isinstance(nproc, int) else 1
+
+
+def _init_section_worker(report):
+    global _worker_report
+    _worker_report = report
+
+
+def _compute_section(method, kwargs, report=None, attributes=None):
+    report = report or _worker_report
+    if attributes:
+        report.__dict__.update(attributes)
+    time_start = time.time()
+    result = getattr(report, method)(**kwargs)
+    attributes = {
+        name: getattr(report, name) for name in _section_attributes.get(method, ())
+    }
+    return result, attributes, time_start, time.time()
+
+
+def _decimate_plot(plot, max_points):
+    """
+    Reduce each series of a plot with more than max_points points, by keeping
+    every (n // max_points)th point of the n points of the series.
+    """
+    for data in plot["data"]:
+        n = len(data["x"])
+        if n > max_points:
+            step = n // max_points
+            data["x"] = list(flex.int(data["x"][::step]))
+            data["y"] = list(flex.double(data["y"][::step]))
+            if "text" in data:
+                data["text"] = data["text"][::step]
+
 
 class _xtriage_output(printed_output):
     def __init__(self, out):
@@ -132,6 +194,9 @@ class Report:
             if self.batches is not None:
                 self.batches = self.batches.as_anomalous_array()
 
+        # The merged intensities are shared by the xtriage and dano sections.
+        # The merging statistics, intensity statistics and pychef sections
+        # take the unmerged intensities, and bin and merge them themselves.
         self.intensities.setup_binner(n_bins=self.n_bins)
         self.merged_intensities = self.intensities.merge_equivalents().array()
 
@@ -146,6 +211,8 @@ class Report:
 
         rd = dest_path or self.report_dir or "."
 
+        # the data are merged for the first slice only
+        multiplicity_scene = None
         for settings.slice_axis in ("h", "k", "l"):
             settings.plot.filename = os.path.join(
                 rd,
@@ -158,7 +225,9 @@ class Report:
                 % (settings.slice_axis, settings.slice_index),
             )
             # settings.slice_axis = axis
-            plot_multiplicity(self.intensities, settings)
+            multiplicity_scene = plot_multiplicity(
+                self.intensities, settings, input_scene=multiplicity_scene
+            )
             mult_json_files[settings.slice_axis] = settings.json.filename
             with open(settings.plot.filename, "rb") as fh:
                 data = codecs.encode(fh.read(), encoding="base64").decode("ascii")
@@ -199,9 +268,7 @@ class Report:
         if self.report_dir is not None:
             with open(os.path.join(self.report_dir, "xtriage.log"), "w") as f:
                 f.write(s.getvalue())
-            xia2.Handlers.Files.FileHandler.record_log_file(
-                "Xtriage", os.path.join(self.report_dir, "xtriage.log")
-            )
+            self._record_xtriage_log()
         xs = io.StringIO()
         xout = _xtriage_output(xs)
         xanalysis.show(out=xout)
@@ -222,7 +289,12 @@ class Report:
         self._xanalysis = xanalysis
         return xtriage_success, xtriage_warnings, xtriage_danger
 
-    def batch_dependent_plots(self):
+    def _record_xtriage_log(self):
+        xia2.Handlers.Files.FileHandler.record_log_file(
+            "Xtriage", os.path.join(self.report_dir, "xtriage.log")
+        )
+
+    def batch_dependent_plots(self, max_points=None):
         binned_batches, rmerge, isigi, scalesvsbatch = batch_dependent_properties(
             self.batches, self.intensities, self.scales
         )
@@ -233,6 +305,8 @@ class Report:
         d = {}
         d.update(i_over_sig_i_vs_batch_plot(bm, isigi))
         d.update(scale_rmerge_vs_batch_plot(bm, rmerge, scalesvsbatch))
+        if max_points:
+            _decimate_plot(d["scale_rmerge_vs_batch"], max_points)
         if self.experiments is not None:
             d["image_range_table"] = make_image_range_table(self.experiments, bm)
         return d
@@ -284,7 +358,7 @@ class Report:
         d.update(plotter.generate_miscellanous_plots())
         return d
 
-    def pychef_plots(self, n_bins=8):
+    def pychef_plots(self, n_bins=8, max_points=None):
 
         intensities = self.intensities
         batches = self.batches
@@ -311,13 +385,149 @@ class Report:
             dose = dose.data()
         pychef_stats = dials.pychef.Statistics(intensities, dose, n_bins=n_bins)
 
-        return pychef_stats.to_dict()
+        d = pychef_stats.to_dict()
+        if max_points:
+            for k in (
+                "completeness_vs_dose",
+                "rcp_vs_dose",
+                "scp_vs_dose",
+                "rd_vs_batch_difference",
+            ):
+                _decimate_plot(d[k], max_points)
+        return d
 
     def dano_plots(self):
         anom_data = {self.intensities.info().wavelength: self.merged_intensities}
         data = make_dano_plots(anom_data)
         return {"dano": data["dF"]["dano"]}
 
+    def compute_sections(self, sections, nproc=None, time_budget=None):
+        """
+        Compute sections of the report, concurrently in a pool of up to nproc
+        processes (by default, the xia2 multiprocessing nproc).
+
+        The sections are given as a dictionary of section name to a tuple of
+        the name of the Report method which computes the section and the
+        keyword arguments of the method, and the results are returned as a
+        dictionary of section name to the value returned by the method. The
+        time taken by each section is recorded in the timing database.
+
+        An optional section (the xtriage analysis or the multiplicity plots)
+        which fails, or which has not finished within the time budget (in
+        seconds) if one is given, is skipped and is absent from the results.
+        The intensity statistics plots use the xtriage analysis, if it is one
+        of the sections, and are computed once it has finished or is skipped.
+        """
+        nproc = report_nproc(nproc)
+        deadline = None if time_budget is None else time.time() + time_budget
+        names = list(sections)
+        # with a time budget, compute (or wait for) the required sections first
+        if deadline is not None:
+            names.sort(key=lambda name: sections[name][0] in optional_sections)
+        # a section which depends on another is computed immediately after it
+        section_names = {method: name for name, (method, _) in sections.items()}
+        dependencies = {}
+        order = []
+        for name in names:
+            dependency = section_names.get(_section_dependencies.get(sections[name][0]))
+            if dependency is not None:
+                dependencies[name] = dependency
+                if dependency not in order:
+                    order.append(dependency)
+            if name not in order:
+                order.append(name)
+        results = {}
+
+        if nproc > 1 and len(sections) > 1:
+            with multiprocessing.Pool(
+                min(nproc, len(sections)),
+                initializer=_init_section_worker,
+                initargs=(self,),
+            ) as pool:
+                pending = {
+                    name: pool.apply_async(_compute_section, sections[name])
+                    for name in order
+                    if name not in dependencies
+                }
+                for name in order:
+                    method = sections[name][0]
+                    if name in dependencies:
+                        # the dependency has now been computed or skipped
+                        dependency_method = sections[dependencies[name]][0]
+                        dependency_attributes = {
+                            attribute: getattr(self, attribute)
+                            for attribute in _section_attributes[dependency_method]
+                        }
+                        pending[name] = pool.apply_async(
+                            _compute_section,
+                            sections[name],
+                            {"attributes": dependency_attributes},
+                        )
+                    timeout = None
+                    if method in optional_sections and deadline is not None:
+                        timeout = max(0, deadline - time.time())
+                    try:
+                        result, attributes, time_start, time_end = pending[name].get(
+                            timeout
+                        )
+                    except multiprocessing.TimeoutError:
+                        logger.info(
+                            "Skipping report section %s (time budget spent)" % name
+                        )
+                        continue
+                    except Exception as e:
+                        if method not in optional_sections:
+                            raise
+                        logger.debug("Exception computing report section %s:" % name)
+                        logger.debug(e, exc_info=True)
+                        continue
+                    self.__dict__.update(attributes)
+                    if method == "xtriage_report" and self.report_dir is not None:
+                        self._record_xtriage_log()
+                    results[name] = result
+                    self._record_section_time(name, time_start, time_end)
+                # leaving the pool terminates any sections which are unfinished
+        else:
+            for name in order:
+                method, kwargs = sections[name]
+                if (
+                    method in optional_sections
+                    and deadline is not None
+                    and time.time() > deadline
+                ):
+                    logger.info("Skipping report section %s (time budget spent)" % name)
+                    continue
+                try:
+                    result, _, time_start, time_end = _compute_section(
+                        method, kwargs, report=self
+                    )
+                except Exception as e:
+                    if method not in optional_sections:
+                        raise
+                    logger.debug("Exception computing report section %s:" % name)
+                    logger.debug(e, exc_info=True)
+                    continue
+                results[name] = result
+                self._record_section_time(name, time_start, time_end)
+        return results
+
+    @staticmethod
+    def _record_section_time(name, time_start, time_end):
+        xia2.Driver.timing.record(
+            {
+                "command": "xia2.report %s" % name,
+                "time_start": time_start,
+                "time_end": time_end,
+            }
+        )
+        logger.debug("Report section %s took %.1fs" % (name, time_end - time_start))
+
+    def __getstate__(self):
+        # the mtz object is not needed to compute the report sections
+        state = self.__dict__.copy()
+        state.pop("mtz_object", None)
+        return state
+
     @classmethod
     def from_unmerged_mtz(cls, unmerged_mtz, params, report_dir):
         reader = any_reflection_file(os.fspath(unmerged_mtz))
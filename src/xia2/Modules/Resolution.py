@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import concurrent.futures
+import copy
+import logging
+
+import iotbx.phil
+from dials.array_family import flex
+from dials.util.resolution_analysis import Resolutionizer, metrics, phil_str
+from dxtbx.model import ExperimentList
+
+logger = logging.getLogger("xia2.Modules.Resolution")
+
+# the resolution criteria, in the order in which they are reported
+criteria = (
+    ("completeness", metrics.COMPLETENESS, "completeness > %s"),
+    ("cc_half", metrics.CC_HALF, "cc_half > %s"),
+    ("rmerge", metrics.RMERGE, "rmerge > %s"),
+    ("isigma", metrics.ISIGMA, "unmerged <I/sigI> > %s"),
+    ("misigma", metrics.MISIGMA, "merged <I/sigI> > %s"),
+)
+
+
+def format_limits(limits):
+    """The resolution limit of each criterion, as a string for the log."""
+    return ", ".join(
+        "%s: %.2f" % (name, limits[name]) for name, _, _ in criteria if name in limits
+    )
+
+
+def limit_and_reasoning(params, limits):
+    """
+    Combine the resolution limits of each criterion into the overall limit,
+    and the reasoning for the limit.
+
+    limits is a dictionary of criterion name to the resolution limit for that
+    criterion (or None, if no limit could be determined).
+    """
+    resolution_limits = []
+    reasoning = []
+    for name, _, reason in criteria:
+        limit = getattr(params, name)
+        if limit is not None:
+            resolution_limits.append(limits.get(name))
+            reasoning.append(reason % limit)
+
+    if any(resolution_limits):
+        resolution = max(r for r in resolution_limits if r is not None)
+        reasoning = [
+            reason
+            for limit, reason in zip(resolution_limits, reasoning)
+            if limit is not None and limit >= resolution
+        ]
+        reasoning = ", ".join(reasoning)
+    else:
+        resolution = 0.0
+        reasoning = None
+
+    return resolution, reasoning
+
+
+class _ScaledData(Resolutionizer):
+    """The scaled intensities and batches, as read for a Resolutionizer."""
+
+    def __init__(self, i_obs, params, batches=None, reference=None):
+        self.i_obs = i_obs
+        self.batches = batches
+
+
+_worker_data = None
+
+
+def _init_worker(i_obs, batches, params):
+    global _worker_data
+    _worker_data = (i_obs, batches, params)
+
+
+def _estimate_batch_range(batch_range, i_obs=None, batches=None, params=None):
+    if i_obs is None:
+        i_obs, batches, params = _worker_data
+    start, end = batch_range
+    sel = (batches.data() >= start) & (batches.data() <= end)
+    resolutionizer = Resolutionizer(
+        i_obs.select(sel).set_info(i_obs.info()), params, batches=batches.select(sel)
+    )
+    limits = {}
+    for name, metric, _ in criteria:
+        limit = getattr(params, name)
+        if limit is None:
+            continue
+        try:
+            d_min = resolutionizer.resolution(metric, limit=limit).d_min
+        except RuntimeError as e:
+            logger.debug("Resolution fit against %s failed: %s", name, e)
+            continue
+        if d_min is not None:
+            # as reported to two decimal places by dials.estimate_resolution
+            limits[name] = float("%.2f" % d_min)
+    return limits
+
+
+class BatchedResolutionEstimator:
+    """
+    Estimate the resolution limits of several batch ranges of a scaled
+    dataset, such as the sweeps of a multi-sweep dataset.
+
+    The scaled data, either an unmerged MTZ file or scaled experiments and
+    reflections, are read once and divided by batch range in memory. The
+    limits for each batch range are then estimated concurrently.
+    """
+
+    def __init__(
+        self,
+        resolution_params,
+        hklin=None,
+        reflections=None,
+        experiments=None,
+        nbins=100,
+    ):
+        params = iotbx.phil.parse(phil_str).extract()
+        for name in ("completeness", "cc_half", "rmerge", "isigma", "misigma"):
+            setattr(params, name, getattr(resolution_params, name))
+        params.cc_half_fit = resolution_params.cc_half_fit
+        params.cc_half_significance_level = resolution_params.cc_half_significance_level
+        params.nbins = nbins
+        params.batch_range = None
+        self._params = params
+
+        if hklin:
+            data = _ScaledData.from_unmerged_mtz(hklin, params)
+        else:
+            assert reflections and experiments
+            data = _ScaledData.from_reflections_and_experiments(
+                [flex.reflection_table.from_file(reflections)],
+                ExperimentList.from_file(experiments, check_format=False),
+                params,
+            )
+        self._i_obs = data.i_obs
+        self._batches = data.batches
+
+    def estimate(self, batch_ranges, nproc=1):
+        """
+        The resolution limit of each criterion for each of a list of
+        (start, end) batch ranges, as a dictionary of criterion name to limit.
+        Criteria for which no limit could be determined are omitted.
+        """
+        if nproc > 1 and len(batch_ranges) > 1:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=min(nproc, len(batch_ranges)),
+                initializer=_init_worker,
+                initargs=(self._i_obs, self._batches, self._params),
+            ) as pool:
+                return list(pool.map(_estimate_batch_range, batch_ranges))
+        return [
+            _estimate_batch_range(
+                batch_range,
+                i_obs=self._i_obs,
+                batches=self._batches,
+                params=copy.deepcopy(self._params),
+            )
+            for batch_range in batch_ranges
+        ]
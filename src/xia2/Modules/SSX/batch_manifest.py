@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+import pathlib
+from typing import Any, Dict, List, Optional
+
+MANIFEST_FILENAME = "batch_manifest.json"
+
+# Parameters that do not affect the results of a processing step.
+_IGNORED_PARAMS = ("nproc", "output_nuggets_dir")
+
+
+def file_hash(path: pathlib.Path) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _jsonable(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, pathlib.Path):
+        # A change to the contents of e.g. a user phil file changes the results.
+        if value.is_file():
+            return {"path": os.fspath(value), "sha256": file_hash(value)}
+        return os.fspath(value)
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return str(value)
+
+
+def params_record(params: Any) -> dict:
+    """A json representation of the processing parameters of a step."""
+    return {
+        f.name: _jsonable(getattr(params, f.name))
+        for f in dataclasses.fields(params)
+        if f.name not in _IGNORED_PARAMS
+    }
+
+
+class BatchManifest(object):
+
+    """
+    A record of the processing steps completed in a batch directory.
+
+    For each completed step, the manifest records the parameters used, the
+    hashes of the input files and the sizes of the output files. This allows
+    a rerun to skip any batch for which all requested steps have already been
+    completed with the same parameters on the same input data.
+    """
+
+    def __init__(self, directory: pathlib.Path):
+        self.directory = directory
+        self.steps: Dict[str, dict] = {}
+        self.summary: dict = {}
+
+    @classmethod
+    def from_directory(cls, directory: pathlib.Path) -> Optional[BatchManifest]:
+        manifest_file = directory / MANIFEST_FILENAME
+        if not manifest_file.is_file():
+            return None
+        try:
+            with manifest_file.open(mode="r") as f:
+                data = json.load(f)
+        except ValueError:
+            return None
+        manifest = cls(directory)
+        manifest.steps = data["steps"]
+        manifest.summary = data["summary"]
+        return manifest
+
+    def write(self) -> None:
+        # Write to a temporary file first, so that an interrupted write does
+        # not leave a partial manifest.
+        manifest_file = self.directory / MANIFEST_FILENAME
+        tmp_file = self.directory / (MANIFEST_FILENAME + ".tmp")
+        with tmp_file.open(mode="w") as f:
+            json.dump({"steps": self.steps, "summary": self.summary}, f, indent=2)
+        tmp_file.replace(manifest_file)
+
+    def clear_steps(self, steps: List[str]) -> None:
+        for step in steps:
+            self.steps.pop(step, None)
+
+    def record_step(
+        self,
+        step: str,
+        params: Any,
+        inputs: List[str],
+        outputs: List[str],
+    ) -> None:
+        self.steps[step] = {
+            "params": params_record(params),
+            "inputs": {name: file_hash(self.directory / name) for name in inputs},
+            "outputs": {
+                name: (self.directory / name).stat().st_size for name in outputs
+            },
+        }
+
+    def record_summary(self, summary_data: dict) -> None:
+        # Keep any results from previous steps that were not rerun this time.
+        summary = dict(self.summary)
+        summary.update(
+            {
+                k: v
+                for k, v in summary_data.items()
+                if k != "directory" and v is not None
+            }
+        )
+        if "DataFiles" in summary:
+            summary["DataFiles"] = {
+                "tags": list(summary["DataFiles"]["tags"]),
+                "filenames": [os.fspath(f) for f in summary["DataFiles"]["filenames"]],
+            }
+        self.summary = json.loads(json.dumps(summary, default=int))
+
+    def summary_data(self) -> dict:
+        """The summary data of the batch, as returned from processing."""
+        summary_data = {"n_images_indexed": None, "n_cryst_integrated": None}
+        summary_data.update(self.summary)
+        summary_data["directory"] = self.directory
+        if "DataFiles" in summary_data:
+            summary_data["DataFiles"] = {
+                "tags": summary_data["DataFiles"]["tags"],
+                "filenames": [
+                    pathlib.Path(f) for f in summary_data["DataFiles"]["filenames"]
+                ],
+            }
+        return summary_data
+
+    def is_up_to_date(self, step_params: Dict[str, Any]) -> bool:
+        """
+        Check whether all the steps have been completed with the given
+        parameters on the current input data, and that the outputs still exist.
+        """
+        for step, params in step_params.items():
+            if step not in self.steps:
+                return False
+            record = self.steps[step]
+            if record["params"] != json.loads(json.dumps(params_record(params))):
+                return False
+            for name, sha256 in record["inputs"].items():
+                input_file = self.directory / name
+                if not input_file.is_file() or file_hash(input_file) != sha256:
+                    return False
+            for name, size in record["outputs"].items():
+                output_file = self.directory / name
+                if not output_file.is_file() or output_file.stat().st_size != size:
+                    return False
+        return True
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import concurrent.futures
+import dataclasses
 import functools
 import json
 import logging
@@ -7,8 +9,9 @@ import math
 import os
 import pathlib
 import subprocess
+import time
 from dataclasses import asdict, dataclass, field
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import numpy as np
 
@@ -26,6 +29,7 @@ from libtbx import phil
 from xia2.Driver.timing import record_step
 from xia2.Handlers.Files import FileHandler
 from xia2.Handlers.Streams import banner
+from xia2.Modules.SSX.batch_manifest import BatchManifest
 from xia2.Modules.SSX.data_integration_programs import (
     IndexingParams,
     IntegrationParams,
@@ -96,9 +100,20 @@ def process_batch(
         indexing_params.output_nuggets_dir = nuggets_dir
         integration_params.output_nuggets_dir = nuggets_dir
 
+    # Remove the records of the steps to be run, so that an interrupted batch
+    # is not mistaken as complete on a rerun.
+    manifest = BatchManifest.from_directory(working_directory) or BatchManifest(
+        working_directory
+    )
+    manifest.clear_steps(options.steps)
+    manifest.write()
+
     if "find_spots" in options.steps:
         strong = ssx_find_spots(working_directory, spotfinding_params)
         strong.as_file(working_directory / "strong.refl")
+        manifest.record_step(
+            "find_spots", spotfinding_params, ["imported.expt"], ["strong.refl"]
+        )
         n_hits = np.sum(
             np.bincount(flumpy.to_numpy(strong["id"])) >= indexing_params.min_spots
         )
@@ -117,6 +132,12 @@ def process_batch(
             data["n_hits"] = summary["n_hits"]
         expt.as_file(working_directory / "indexed.expt")
         refl.as_file(working_directory / "indexed.refl")
+        manifest.record_step(
+            "index",
+            indexing_params,
+            ["imported.expt", "strong.refl"],
+            ["indexed.expt", "indexed.refl"],
+        )
         if large_clusters:
             xia2_logger.info(f"{condensed_unit_cell_info(large_clusters)}")
         if progress_reporter:
@@ -129,6 +150,14 @@ def process_batch(
                 "integrate" in options.steps
             ):  # make sure integration rate is reported correctly
                 progress_reporter.add_integration_result(data)
+                manifest.record_step(
+                    "integrate",
+                    integration_params,
+                    ["indexed.expt", "indexed.refl"],
+                    [],
+                )
+            manifest.record_summary(data)
+            manifest.write()
             return data
     if "integrate" in options.steps:
         integration_summary = ssx_integrate(working_directory, integration_params)
@@ -137,62 +166,150 @@ def process_batch(
             xia2_logger.info(f"{condensed_unit_cell_info(large_clusters)}")
         data["n_cryst_integrated"] = integration_summary["n_cryst_integrated"]
         data["DataFiles"] = integration_summary["DataFiles"]
+        manifest.record_step(
+            "integrate",
+            integration_params,
+            ["indexed.expt", "indexed.refl"],
+            [f.name for f in integration_summary["DataFiles"]["filenames"]],
+        )
         if progress_reporter:
             progress_reporter.add_integration_result(data)
 
+    manifest.record_summary(data)
+    manifest.write()
     return data
 
 
+class BatchSlicer(object):
+
+    """
+    Writes the imported data for each batch into its directory on demand.
+
+    Iterating over the batch directories through the slicer saves each batch's
+    imported.expt just before the directory is yielded, so that processing of
+    the first batches can start without waiting for all batches to be written.
+    """
+
+    def __init__(
+        self,
+        experiments: ExperimentList,
+        slices: Dict[pathlib.Path, Tuple[int, int]],
+    ):
+        self.experiments = experiments
+        self.slices = slices
+
+    def iterate(self, batch_directories: List[pathlib.Path]) -> Iterator[pathlib.Path]:
+        for directory in batch_directories:
+            if directory in self.slices:
+                start, end = self.slices.pop(directory)
+                self.experiments[start:end].as_file(directory / "imported.expt")
+            yield directory
+
+
+def batch_slices(n_images: int, batch_size: int) -> Dict[str, Tuple[int, int]]:
+    """
+    The name of the subdirectory of each batch, and the slice of the imported
+    data processed in that batch, for the given batch size.
+    """
+    n_batches = math.floor(n_images / batch_size)
+    splits = [i * batch_size for i in range(max(1, n_batches))] + [n_images]
+    # make sure last batch has at least the batch size
+    template = functools.partial(
+        "batch_{index:0{fmt:d}d}".format, fmt=len(str(n_batches))
+    )
+    return {
+        template(index=i + 1): (splits[i], splits[i + 1])
+        for i in range(len(splits) - 1)
+    }
+
+
 def setup_main_process(
     main_directory: pathlib.Path,
     imported_expts: pathlib.Path,
     batch_size: int,
 ) -> Tuple[List[pathlib.Path], dict]:
     """
-    Slice data from the imported data according to the batch size,
-    saving each into its own subdirectory for batch processing.
+    Determine the slices of the imported data according to the batch size,
+    creating a subdirectory for each batch. The sliced data are saved into
+    the subdirectories lazily, by the BatchSlicer in setup_data["batch_slicer"].
     """
-    expts = load.experiment_list(imported_expts, check_format=True)
-    n_batches = math.floor(len(expts) / batch_size)
-    splits = [i * batch_size for i in range(max(1, n_batches))] + [len(expts)]
-    # make sure last batch has at least the batch size
-    template = functools.partial(
-        "batch_{index:0{fmt:d}d}".format, fmt=len(str(n_batches))
-    )
+    expts = load.experiment_list(imported_expts, check_format=False)
     batch_directories: List[pathlib.Path] = []
     setup_data: dict = {"images_per_batch": {}}
-    for i in range(len(splits) - 1):
-        subdir = main_directory / template(index=i + 1)
+    slices: Dict[pathlib.Path, Tuple[int, int]] = {}
+    for name, (start, end) in batch_slices(len(expts), batch_size).items():
+        subdir = main_directory / name
         if not subdir.is_dir():
             pathlib.Path.mkdir(subdir)
-            # now copy file and run
-        sub_expt = expts[splits[i] : splits[i + 1]]
-        sub_expt.as_file(subdir / "imported.expt")
+        # remove any previous imported data, so that an incompletely written set
+        # of batches is recognised as such on a rerun.
+        (subdir / "imported.expt").unlink(missing_ok=True)
+        slices[subdir] = (start, end)
         batch_directories.append(subdir)
-        setup_data["images_per_batch"][subdir] = splits[i + 1] - splits[i]
+        setup_data["images_per_batch"][subdir] = end - start
+    setup_data["batch_slicer"] = BatchSlicer(expts, slices)
     return batch_directories, setup_data
 
 
 def inspect_existing_batch_directories(
     main_directory: pathlib.Path,
+    imported_expts: Optional[pathlib.Path] = None,
+    batch_size: Optional[int] = None,
 ) -> Tuple[List[pathlib.Path], dict]:
+    """
+    Find the batch subdirectories of a previous run.
+
+    If the imported data and batch size are given, the existing batches must
+    be those given by the batch size. The imported data are only saved into a
+    batch subdirectory when the batch is processed, so an interrupted run
+    leaves later batches without them, and these are sliced again from the
+    imported data.
+    """
     batch_directories: List[pathlib.Path] = []
     setup_data: dict = {"images_per_batch": {}}
     # use glob to find batch_*
     dirs_list = []
     numbers = []
-    n_images = []
+    n_images: List[Optional[int]] = []
+    unsliced = []
     for dir_ in list(main_directory.glob("batch_*")):
         name = dir_.name
         dirs_list.append(dir_)
         numbers.append(int(name.split("_")[-1]))
-        if not (dir_ / "imported.expt").is_file():
-            raise ValueError("Unable to find imported.expt in existing batch directory")
-        n_images.append(
-            len(load.experiment_list(dir_ / "imported.expt", check_format=False))
-        )
+        if (dir_ / "imported.expt").is_file():
+            n_images.append(
+                len(load.experiment_list(dir_ / "imported.expt", check_format=False))
+            )
+        else:
+            n_images.append(None)
+            unsliced.append(dir_)
     if not dirs_list:
         raise ValueError("Unable to find any batch_* directories")
+    if imported_expts and batch_size:
+        expts = load.experiment_list(imported_expts, check_format=False)
+        expected = batch_slices(len(expts), batch_size)
+        if not set(expected).issubset(dir_.name for dir_ in dirs_list):
+            raise ValueError("Existing batch directories do not match the batch size")
+        # ignore any directories left from processing with another batch size
+        keep = [i for i, dir_ in enumerate(dirs_list) if dir_.name in expected]
+        dirs_list = [dirs_list[i] for i in keep]
+        numbers = [numbers[i] for i in keep]
+        n_images = [n_images[i] for i in keep]
+        unsliced = [dir_ for dir_ in unsliced if dir_.name in expected]
+        for i, dir_ in enumerate(dirs_list):
+            start, end = expected[dir_.name]
+            if n_images[i] is None:
+                n_images[i] = end - start
+            elif n_images[i] != end - start:
+                raise ValueError(
+                    "Existing batch directories do not match the batch size"
+                )
+        if unsliced:
+            setup_data["batch_slicer"] = BatchSlicer(
+                expts, {dir_: expected[dir_.name] for dir_ in unsliced}
+            )
+    elif unsliced:
+        raise ValueError("Unable to find imported.expt in existing batch directory")
     order = np.argsort(np.array(numbers))
     for idx in order:
         batch_directories.append(dirs_list[idx])
@@ -201,6 +318,62 @@ def inspect_existing_batch_directories(
     return batch_directories, setup_data
 
 
+def setup_batch_directories(
+    main_directory: pathlib.Path,
+    imported_expts: pathlib.Path,
+    batch_size: int,
+    step_params: dict,
+    steps: List[str],
+    import_was_run: bool = False,
+) -> Tuple[List[pathlib.Path], dict, Dict[pathlib.Path, dict]]:
+    """
+    Set up the batch subdirectories, resuming the batches of a previous run
+    unless the data have been imported again.
+
+    Returns:
+        The batch directories, the setup data, and the summary data of the
+        batches already processed with the same parameters.
+    """
+    completed_batches: Dict[pathlib.Path, dict] = {}
+    if import_was_run:  # need to setup the batch folders again with new imported.expt
+        batch_directories, setup_data = setup_main_process(
+            main_directory, imported_expts, batch_size
+        )
+        return batch_directories, setup_data, completed_batches
+    try:
+        batch_directories, setup_data = inspect_existing_batch_directories(
+            main_directory, imported_expts, batch_size
+        )
+    except ValueError:  # if existing batches weren't found
+        batch_directories, setup_data = setup_main_process(
+            main_directory, imported_expts, batch_size
+        )
+    else:
+        completed_batches = find_completed_batches(
+            batch_directories, step_params, steps
+        )
+    return batch_directories, setup_data, completed_batches
+
+
+def find_completed_batches(
+    batch_directories: List[pathlib.Path],
+    step_params: dict,
+    steps: List[str],
+) -> Dict[pathlib.Path, dict]:
+    """
+    Find the batches for which all the requested steps have already been run
+    with the current parameters, according to the batch manifests. Returns the
+    summary data of each completed batch.
+    """
+    requested = {step: step_params[step] for step in steps}
+    completed_batches = {}
+    for batch_dir in batch_directories:
+        manifest = BatchManifest.from_directory(batch_dir)
+        if manifest and manifest.is_up_to_date(requested):
+            completed_batches[batch_dir] = manifest.summary_data()
+    return completed_batches
+
+
 class NoMoreImages(Exception):
     pass
 
@@ -788,20 +961,104 @@ class ProcessBatch(object):
         self.options = options
         self.function = process_batch
 
-    def __call__(self, directory: pathlib.Path) -> dict:
+    def __call__(self, directory: pathlib.Path, nproc: Optional[int] = None) -> dict:
+        spotfinding_params = self.spotfinding_params
+        indexing_params = self.indexing_params
+        integration_params = self.integration_params
+        if nproc:
+            spotfinding_params = dataclasses.replace(spotfinding_params, nproc=nproc)
+            indexing_params = dataclasses.replace(indexing_params, nproc=nproc)
+            integration_params = dataclasses.replace(integration_params, nproc=nproc)
+        st = time.perf_counter()
         with redirect_xia2_logger() as iostream:
             summary_data = self.function(
                 directory,
-                self.spotfinding_params,
-                self.indexing_params,
-                self.integration_params,
+                spotfinding_params,
+                indexing_params,
+                integration_params,
                 self.options,
             )
             s = iostream.getvalue()
         xia2_logger.info(s)
+        summary_data["time"] = time.perf_counter() - st
+        summary_data["nproc"] = integration_params.nproc
         return summary_data
 
 
+def allocate_cores(n_cores: int, images_per_batch: List[int]) -> List[int]:
+    """
+    Share n_cores between batches that are started together, in proportion
+    to the number of images in each batch. Each batch gets at least one core.
+    """
+    if not images_per_batch:
+        return []
+    n_total = sum(images_per_batch) or len(images_per_batch)
+    weights = [(n or 1) / n_total for n in images_per_batch]
+    cores = [max(1, int(n_cores * w)) for w in weights]
+    # hand out any leftover cores to the batches with the largest shortfall.
+    spare = n_cores - sum(cores)
+    shortfall = sorted(range(len(cores)), key=lambda i: cores[i] - n_cores * weights[i])
+    for i in shortfall[: max(spare, 0)]:
+        cores[i] += 1
+    return cores
+
+
+class BatchScheduler(object):
+
+    """
+    Run batch processing on a local pool of njobs worker processes, sharing
+    n_cores (by default njobs x nproc) between the batches being processed.
+
+    Idle workers take the next batch from the shared queue as soon as they
+    finish, so that slow batches do not hold up the rest. Each batch is
+    started with nproc cores, apart from the batches started as the queue
+    drains, which share all of the cores free at that point in proportion to
+    their number of images. The number of cores of a batch is fixed when it
+    starts, so cores freed after the queue has drained stay idle until the
+    last batches finish.
+    """
+
+    def __init__(self, njobs: int, nproc: int, n_cores: Optional[int] = None):
+        self.njobs = njobs
+        self.nproc = nproc
+        self.n_cores = n_cores or njobs * nproc
+
+    def run(
+        self,
+        func: ProcessBatch,
+        batches: Iterable[pathlib.Path],
+        n_batches: int,
+        images_per_batch: Dict[pathlib.Path, int],
+        callback: Callable[[dict], None],
+    ) -> None:
+        batch_iter = iter(batches)
+        n_remaining = n_batches
+        free_cores = self.n_cores
+        running: Dict[concurrent.futures.Future, int] = {}
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.njobs) as pool:
+            while n_remaining or running:
+                n_to_start = min(self.njobs - len(running), n_remaining)
+                if n_to_start:
+                    directories = [next(batch_iter) for _ in range(n_to_start)]
+                    n_remaining -= n_to_start
+                    if n_remaining:
+                        cores = [self.nproc] * n_to_start
+                    else:
+                        cores = allocate_cores(
+                            max(free_cores, n_to_start),
+                            [images_per_batch.get(d, 0) for d in directories],
+                        )
+                    for directory, nproc in zip(directories, cores):
+                        running[pool.submit(func, directory, nproc)] = nproc
+                        free_cores -= nproc
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    free_cores += running.pop(future)
+                    callback(future.result())
+
+
 class ProgressReport(object):
 
     # class to store progress for reporting.
@@ -819,6 +1076,8 @@ class ProgressReport(object):
         self.cumulative_images_indexed: int = 0
         self.cumulative_crystals_integrated: int = 0
         self.cell_clustering: str = ""
+        self.cumulative_images_timed: int = 0
+        self.cumulative_core_seconds: float = 0.0
 
     def add_find_spots_result(self, summary_data):
         n_images_this_batch = self.setup_data["images_per_batch"][
@@ -872,6 +1131,33 @@ class ProgressReport(object):
             f"{self.cumulative_crystals_integrated} integrated crystals overall ({pc_integrated})"
         )
 
+    def add_timing(self, summary_data: dict) -> None:
+        # Record the wall time and cores used to process a batch.
+        n_images_this_batch = self.setup_data["images_per_batch"][
+            summary_data["directory"]
+        ]
+        self.cumulative_images_timed += n_images_this_batch
+        self.cumulative_core_seconds += summary_data["time"] * summary_data["nproc"]
+        name = summary_data["directory"].name.replace("_", " ")
+        xia2_logger.info(
+            f"{name} processed in {summary_data['time']:.1f}s with nproc={summary_data['nproc']} "
+            + f"({summary_data['time'] / max(n_images_this_batch, 1):.3f}s per image)"
+        )
+
+    def summarise_timing(self, wall_time: float, n_cores: int) -> None:
+        # Report how well the available cores were used over the whole processing.
+        if not (self.cumulative_images_timed and wall_time):
+            return
+        utilisation = 100 * self.cumulative_core_seconds / (wall_time * n_cores)
+        core_seconds_per_image = (
+            self.cumulative_core_seconds / self.cumulative_images_timed
+        )
+        xia2_logger.info(
+            f"Processed {self.cumulative_images_timed} images in {wall_time:.1f}s "
+            + f"({core_seconds_per_image:.3f} core-seconds per image), "
+            + f"core utilisation {utilisation:.1f}% of {n_cores} cores"
+        )
+
     def add_latest_clustering(self, condensed_cell_info):
         self.cell_clustering = condensed_cell_info
 
@@ -928,13 +1214,22 @@ def process_batches(
     integration_params: IntegrationParams,
     setup_data: dict,
     options: AlgorithmParams,
+    batch_callback: Optional[Callable[[pathlib.Path], None]] = None,
+    completed_batches: Optional[Dict[pathlib.Path, dict]] = None,
 ):
+    """
+    Process the batches, reporting on the progress as each batch finishes.
+    Batches in completed_batches, with their summary data from a previous
+    run, are reported on but not processed again.
+    """
 
     progress = ProgressReport(setup_data)
 
     def process_output(summary_data, add_all_to_progress=True):
         if add_all_to_progress:
             progress.add_all(summary_data)
+        if "time" in summary_data:
+            progress.add_timing(summary_data)
         progress.summarise()
         if "DataFiles" in summary_data:
             for tag, file in zip(
@@ -942,17 +1237,59 @@ def process_batches(
                 summary_data["DataFiles"]["filenames"],
             ):
                 FileHandler.record_more_data_file(tag, file)
+            if batch_callback:
+                batch_callback(summary_data["directory"])
 
-    if options.njobs > 1:
-        njobs = min(options.njobs, len(batch_directories))
+    if completed_batches:
         xia2_logger.info(
-            f"Submitting processing in {len(batch_directories)} batches across {njobs} cores, each with nproc={options.nproc}."
+            f"Skipping {len(completed_batches)} batches already processed with the same parameters"
+        )
+        for batch_dir, summary_data in completed_batches.items():
+            process_output(summary_data)
+        batch_directories = [d for d in batch_directories if d not in completed_batches]
+        if not batch_directories:
+            return
+
+    n_batches = len(batch_directories)
+    if "batch_slicer" in setup_data:
+        # write the imported data for each batch only as it is dispatched
+        batches: Iterable[pathlib.Path] = setup_data["batch_slicer"].iterate(
+            batch_directories
+        )
+    else:
+        batches = batch_directories
+
+    st = time.perf_counter()
+    if options.njobs > 1 and options.multiprocessing_method == "multiprocessing":
+        njobs = min(options.njobs, n_batches)
+        xia2_logger.info(
+            f"Submitting processing in {n_batches} batches across {njobs} cores, each with nproc={options.nproc}."
+        )
+        # fewer workers than njobs if there are few batches, but the same
+        # total number of cores to share between them
+        scheduler = BatchScheduler(
+            njobs, options.nproc, n_cores=options.njobs * options.nproc
+        )
+        scheduler.run(
+            ProcessBatch(
+                spotfinding_params, indexing_params, integration_params, options
+            ),
+            batches,
+            n_batches,
+            setup_data["images_per_batch"],
+            process_output,
+        )
+        progress.summarise_timing(time.perf_counter() - st, scheduler.n_cores)
+    elif options.njobs > 1:
+        njobs = min(options.njobs, n_batches)
+        xia2_logger.info(
+            f"Submitting processing in {n_batches} batches across {njobs} cores, each with nproc={options.nproc}."
         )
         libtbx.easy_mp.parallel_map(
             func=ProcessBatch(
                 spotfinding_params, indexing_params, integration_params, options
             ),
-            iterable=batch_directories,
+            iterable=batches,
             qsub_command=f"qsub -pe smp {options.nproc}",
             processes=njobs,
             method=options.multiprocessing_method,
@@ -960,7 +1297,8 @@ def process_batches(
             preserve_order=False,
         )
     else:
-        for batch_dir in batch_directories:
+        for batch_dir in batches:
+            batch_st = time.perf_counter()
             summary_data = process_batch(
                 batch_dir,
                 spotfinding_params,
@@ -969,7 +1307,10 @@ def process_batches(
                 options,
                 progress,
             )
+            summary_data["time"] = time.perf_counter() - batch_st
+            summary_data["nproc"] = options.nproc
             process_output(summary_data, add_all_to_progress=False)
+        progress.summarise_timing(time.perf_counter() - st, options.nproc)
 
 
 def check_for_gaps_in_steps(steps: List[str]) -> bool:
@@ -991,6 +1332,7 @@ def run_data_integration(
     indexing_params: IndexingParams,
     refinement_params: RefinementParams,
     integration_params: IntegrationParams,
+    batch_callback: Optional[Callable[[pathlib.Path], None]] = None,
 ) -> List[pathlib.Path]:
     """
     The main data integration processing function.
@@ -998,6 +1340,8 @@ def run_data_integration(
     space group were not given) and geometry refinement (if a reference geometry
     was not given). Then prepare and run data integration in batches with the
     given/determined reference geometry.
+    If given, batch_callback is called with the directory of each batch once
+    its data have been integrated.
     """
 
     # First do a bit of input validation
@@ -1096,23 +1440,18 @@ def run_data_integration(
         raise ValueError(
             "New data was imported, but there are gaps in the processing steps. Please adjust input."
         )
-    if import_was_run:  # need to setup the batch folders again with new imported.expt
-        batch_directories, setup_data = setup_main_process(
-            root_working_directory,
-            imported_expts,
-            options.batch_size,
-        )
-    else:
-        try:
-            batch_directories, setup_data = inspect_existing_batch_directories(
-                root_working_directory
-            )
-        except ValueError:  # if existing batches weren't found
-            batch_directories, setup_data = setup_main_process(
-                root_working_directory,
-                imported_expts,
-                options.batch_size,
-            )
+    batch_directories, setup_data, completed_batches = setup_batch_directories(
+        root_working_directory,
+        imported_expts,
+        options.batch_size,
+        {
+            "find_spots": spotfinding_params,
+            "index": indexing_params,
+            "integrate": integration_params,
+        },
+        options.steps,
+        import_was_run=import_was_run,
+    )
     if not batch_directories:
         raise ValueError("Unable to determine directories for processing.")
 
@@ -1123,6 +1462,8 @@ def run_data_integration(
         integration_params,
         setup_data,
         options,
+        batch_callback,
+        completed_batches,
     )
 
     return batch_directories
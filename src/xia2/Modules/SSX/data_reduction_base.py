@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import logging
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import numpy as np
 
@@ -31,12 +31,15 @@ from xia2.Modules.SSX.data_reduction_programs import (
     merge,
     parallel_cosym,
     prepare_scaled_array,
+    reduction_worker_pool,
     scale_parallel_batches,
+    scaled_array_from_tables,
     split_integrated_data,
 )
 from xia2.Modules.SSX.yml_handling import (
     apply_scaled_array_to_all_files,
     dose_series_repeat_to_groupings,
+    scaled_data_for_all_files,
     yml_to_merged_filesdict,
 )
 
@@ -140,6 +143,7 @@ class BaseDataReduction(object):
         # self._files_to_scale: List[FilePair] = []
         self._batches_to_scale: List[ProcessingBatch] = []
         self._files_to_merge: List[FilePair] = []
+        self._pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
 
         if not data:
             raise ValueError(self._no_input_error_msg)
@@ -214,7 +218,24 @@ class BaseDataReduction(object):
             raise ValueError(e)
         return cls(main_directory, new_data, reduction_params)
 
+    def _get_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        # The same worker processes are used for all the data reduction stages.
+        if not self._pool:
+            self._pool = reduction_worker_pool(self._reduction_params.nproc)
+        return self._pool
+
+    def _shutdown_pool(self) -> None:
+        if self._pool:
+            self._pool.shutdown()
+            self._pool = None
+
     def run(self) -> None:
+        try:
+            self._run()
+        finally:
+            self._shutdown_pool()
+
+    def _run(self) -> None:
 
         if not self._integrated_data:
             xia2_logger.notice(banner("Merging"))  # type: ignore
@@ -243,10 +264,20 @@ class BaseDataReduction(object):
         else:
             self._prepare_for_scaling(good_crystals_data)
 
-        xia2_logger.notice(banner("Scaling"))  # type: ignore
-        self._scale()
-        xia2_logger.notice(banner("Merging"))  # type: ignore
-        self._merge()
+        self.scale_and_merge()
+
+    def scale_and_merge(
+        self, batches_to_scale: Optional[List[ProcessingBatch]] = None
+    ) -> None:
+        if batches_to_scale is not None:
+            self._batches_to_scale = batches_to_scale
+        try:
+            xia2_logger.notice(banner("Scaling"))  # type: ignore
+            self._scale()
+            xia2_logger.notice(banner("Merging"))  # type: ignore
+            self._merge()
+        finally:
+            self._shutdown_pool()
 
     def _split_data_for_reindex(self, good_crystals_data):
 
@@ -257,7 +288,15 @@ class BaseDataReduction(object):
         )
 
     def _filter(self) -> Tuple[CrystalsDict, uctbx.unit_cell, sgtbx.space_group_info]:
-        return filter_(self._filter_wd, self._integrated_data, self._reduction_params)
+        good_crystals_data, best_unit_cell, space_group = filter_(
+            self._filter_wd, self._integrated_data, self._reduction_params
+        )
+        self.set_best_unit_cell(best_unit_cell)
+        return good_crystals_data, best_unit_cell, space_group
+
+    def set_best_unit_cell(self, best_unit_cell: uctbx.unit_cell) -> None:
+        """Record the best unit cell of the filtered data, if needed for scaling."""
+        pass
 
     def _reindex(self) -> None:
         reindexed_new_batches = parallel_cosym(
@@ -265,32 +304,44 @@ class BaseDataReduction(object):
             self._filtered_batches_to_process,
             self._reduction_params,
             nproc=self._reduction_params.nproc,
+            pool=self._get_pool(),
         )
         batches_to_scale = reindexed_new_batches
         if len(batches_to_scale) > 1:
             # first scale each batch
             batches_to_scale, dmins = scale_parallel_batches(
-                self._reindex_wd, batches_to_scale, self._reduction_params
-            )
-            user_dmin = self._reduction_params.d_min
-            if not user_dmin:
-                dmins = np.array([d for d in dmins if d])
-                if len(dmins):
-                    self._reduction_params.d_min = np.mean(dmins)
-            # Reindex all batches together.
-            batches_to_scale = cosym_reindex(
                 self._reindex_wd,
                 batches_to_scale,
-                self._reduction_params.d_min,
-                self._reduction_params.lattice_symmetry_max_delta,
-                self._reduction_params.partiality_threshold,
-                reference=self._reduction_params.reference,
+                self._reduction_params,
+                pool=self._get_pool(),
             )
-            if not user_dmin:
-                self._reduction_params.d_min = None
-            xia2_logger.info(f"Consistently reindexed {len( batches_to_scale)} batches")
+            batches_to_scale = self.reindex_scaled_batches(batches_to_scale, dmins)
         self._batches_to_scale = batches_to_scale
 
+    def reindex_scaled_batches(
+        self, scaled_batches: List[ProcessingBatch], dmins: List[Optional[float]]
+    ) -> List[ProcessingBatch]:
+        """Reindex all batches together, after each batch has been scaled."""
+        user_dmin = self._reduction_params.d_min
+        if not user_dmin:
+            dmins = np.array([d for d in dmins if d])
+            if len(dmins):
+                self._reduction_params.d_min = np.mean(dmins)
+        batches_to_scale = cosym_reindex(
+            self._reindex_wd,
+            scaled_batches,
+            self._reduction_params.d_min,
+            self._reduction_params.lattice_symmetry_max_delta,
+            self._reduction_params.partiality_threshold,
+            reference=self._reduction_params.reference,
+            reference_ksol=self._reduction_params.reference_ksol,
+            reference_bsol=self._reduction_params.reference_bsol,
+        )
+        if not user_dmin:
+            self._reduction_params.d_min = None
+        xia2_logger.info(f"Consistently reindexed {len( batches_to_scale)} batches")
+        return batches_to_scale
+
     def _prepare_for_scaling(self, good_crystals_data) -> None:
         self._batches_to_scale = split_integrated_data(
             good_crystals_data,
@@ -375,35 +426,44 @@ class BaseDataReduction(object):
                         f"Dose groups assigned using formula: image_no modulo {self._reduction_params.dose_series_repeat} = dose_point"
                     )
 
+        pool = self._get_pool()
+        name_to_expts_arr: dict[str, Tuple] = {}
         if not merge_input:  # i.e. no "merge_by" in parsed_grouping
             merge_wds = {"merged": self._data_reduction_wd / "merge" / "all"}
             if not Path(merge_wds["merged"]).is_dir():
                 Path.mkdir(merge_wds["merged"])
             # NB at this point, data could be already grouped and filtered or still scaled output
-            merge_input = apply_scaled_array_to_all_files(
-                merge_wds["merged"], scaled_results, self._reduction_params
-            )
-        name_to_expts_arr: dict[str, Tuple] = {name: () for name in merge_input.keys()}
+            if self._reduction_params.save_merge_input:
+                merge_input = apply_scaled_array_to_all_files(
+                    merge_wds["merged"], scaled_results, self._reduction_params, pool
+                )
+            else:
+                # Pass the filtered data straight to merging, without
+                # writing intermediate files.
+                merge_data = scaled_data_for_all_files(
+                    merge_wds["merged"], scaled_results, self._reduction_params, pool
+                )
+                for name, data in merge_data.items():
+                    name_to_expts_arr[name] = scaled_array_from_tables(
+                        data, best_unit_cell
+                    )
 
         futures = {}
-        with concurrent.futures.ProcessPoolExecutor(
-            max_workers=self._reduction_params.nproc
-        ) as pool:
-            for name, filelist in merge_input.items():
-                futures[
-                    pool.submit(prepare_scaled_array, filelist, best_unit_cell)
-                ] = name
+        for name, filelist in merge_input.items():
+            futures[pool.submit(prepare_scaled_array, filelist, best_unit_cell)] = name
         for future in concurrent.futures.as_completed(futures):
             name = futures[future]
             name_to_expts_arr[name] = future.result()
+        # keep the order of the merge groups
+        name_to_expts_arr = {
+            name: name_to_expts_arr[name]
+            for name in merge_wds.keys()
+            if name in name_to_expts_arr
+        }
 
         future_list = []
         summaries = {name: "" for name in name_to_expts_arr.keys()}
-        with record_step(
-            "dials.merge (parallel)"
-        ), concurrent.futures.ProcessPoolExecutor(
-            max_workers=self._reduction_params.nproc
-        ) as pool:
+        with record_step("dials.merge (parallel)"):
             for name, (scaled_array, elist) in name_to_expts_arr.items():
                 future_list.append(
                     pool.submit(
@@ -417,6 +477,7 @@ class BaseDataReduction(object):
                         name,
                     )
                 )
+            concurrent.futures.wait(future_list)
 
         for mergefuture in concurrent.futures.as_completed(future_list):
             mergeresult: MergeResult = mergefuture.result()
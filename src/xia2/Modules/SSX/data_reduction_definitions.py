@@ -64,6 +64,7 @@ class ReductionParams:
     reference_ksol: float = 0.35
     reference_bsol: float = 46.0
     partiality_threshold: float = 0.25
+    save_merge_input: bool = False
 
     @classmethod
     def from_phil(cls, params: iotbx.phil.scope_extract):
@@ -106,4 +107,5 @@ class ReductionParams:
             params.reference_model.k_sol,
             params.reference_model.b_sol,
             params.partiality_threshold,
+            params.save_merge_input,
         )
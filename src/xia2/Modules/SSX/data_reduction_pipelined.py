@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from cctbx import uctbx
+
+from xia2.Handlers.Files import FileHandler
+from xia2.Handlers.Streams import banner
+from xia2.Modules.SSX.data_reduction_base import inspect_directories
+from xia2.Modules.SSX.data_reduction_definitions import FilePair, ReductionParams
+from xia2.Modules.SSX.data_reduction_interface import get_reducer
+from xia2.Modules.SSX.data_reduction_programs import (
+    CrystalsDict,
+    ProcessingBatch,
+    ProgramResult,
+    assess_for_indexing_ambiguities,
+    determine_best_unit_cell_from_crystals,
+    individual_cosym,
+    load_crystal_data_from_new_expts,
+    reduction_worker_pool,
+    scale_on_batches,
+    select_crystals_close_to,
+    split_filtered_data,
+)
+
+xia2_logger = logging.getLogger(__name__)
+
+
+def reindex_and_scale_batch(
+    working_directory: Path,
+    batch: ProcessingBatch,
+    index: int,
+    reduction_params: ReductionParams,
+) -> Tuple[ProgramResult, ProgramResult]:
+    """Run cosym on a batch of data, then scale the reindexed batch."""
+    cosym_result = individual_cosym(working_directory, batch, index, reduction_params)
+    reindexed = ProcessingBatch()
+    reindexed.add_filepair(FilePair(cosym_result.exptfile, cosym_result.reflfile))
+    scale_result = scale_on_batches(
+        working_directory, [reindexed], reduction_params, f"batch{index+1}"
+    )
+    return cosym_result, scale_result
+
+
+class PipelinedDataReduction(object):
+
+    """
+    Data reduction that runs alongside data integration.
+
+    Integrated data are added a directory at a time, as each integration batch
+    finishes. The new crystals are filtered on the unit cell tolerances about
+    a known central cell and, once enough have accumulated to form a data
+    reduction batch, the batch is reindexed with cosym and scaled in a
+    background process pool. When all integration has finished, run() reindexes
+    the batches together, then scales and merges the data as for the standard
+    data reduction.
+    """
+
+    def __init__(
+        self,
+        main_directory: Path,
+        reduction_params: ReductionParams,
+        unit_cell: uctbx.unit_cell,
+    ):
+        self._main_directory = main_directory
+        self._reduction_params = reduction_params
+        self._reindex_wd = main_directory / "data_reduction" / "reindex"
+
+        if reduction_params.cluster_threshold:
+            xia2_logger.warning(
+                "Unit cell clustering is not possible when data reduction is run\n"
+                "alongside integration. Filtering will be performed using the\n"
+                "absolute angle and length tolerances instead."
+            )
+        self._central_unit_cell = reduction_params.central_unit_cell or unit_cell
+        self._requires_reindex = assess_for_indexing_ambiguities(
+            reduction_params.space_group,
+            self._central_unit_cell,
+            reduction_params.lattice_symmetry_max_delta,
+        )
+
+        self._integrated_data: List[FilePair] = []
+        self._good_crystals_data: CrystalsDict = {}
+        self._pending_data: List[FilePair] = []
+        self._n_pending_crystals = 0
+        self._n_batches_submitted = 0
+        self._batches: List[ProcessingBatch] = []
+        self._futures: Dict[concurrent.futures.Future, int] = {}
+        self._pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+    def add_directory(self, directory: Path) -> None:
+        """Add the integrated data from a batch directory to the reduction."""
+        try:
+            new_data = inspect_directories([directory])
+        except ValueError:
+            return  # nothing was integrated in this batch
+        crystals_data = load_crystal_data_from_new_expts(new_data)
+        if (
+            self._reduction_params.absolute_angle_tolerance
+            and self._reduction_params.absolute_length_tolerance
+        ):
+            crystals_data = select_crystals_close_to(
+                crystals_data,
+                self._central_unit_cell,
+                self._reduction_params.absolute_angle_tolerance,
+                self._reduction_params.absolute_length_tolerance,
+            )
+        self._integrated_data.extend(new_data)
+        self._good_crystals_data.update(crystals_data)
+        self._pending_data.extend(new_data)
+        self._n_pending_crystals += sum(
+            len(v.identifiers) for v in crystals_data.values()
+        )
+        if self._n_pending_crystals >= self._reduction_params.batch_size:
+            self._submit_pending_data(self._reduction_params.batch_size)
+
+    def _submit_pending_data(self, batch_size: int) -> None:
+        batches = split_filtered_data(
+            self._pending_data, self._good_crystals_data, batch_size
+        )
+        self._pending_data = []
+        self._n_pending_crystals = 0
+        if not self._requires_reindex:
+            self._batches.extend(batches)
+            return
+        if not self._pool:
+            if not self._reindex_wd.is_dir():
+                self._reindex_wd.mkdir(parents=True)
+            self._pool = reduction_worker_pool(self._reduction_params.nproc)
+        for batch in batches:
+            future = self._pool.submit(
+                reindex_and_scale_batch,
+                self._reindex_wd,
+                batch,
+                self._n_batches_submitted,
+                self._reduction_params,
+            )
+            self._futures[future] = self._n_batches_submitted
+            xia2_logger.info(
+                f"Submitted data reduction batch {self._n_batches_submitted+1} for reindexing"
+            )
+            self._n_batches_submitted += 1
+
+    def _collect_reindexed_batches(
+        self,
+    ) -> Tuple[List[ProcessingBatch], List[ProcessingBatch], List[Optional[float]]]:
+        reindexed: Dict[int, ProcessingBatch] = {}
+        scaled: Dict[int, ProcessingBatch] = {}
+        dmins: Dict[int, Optional[float]] = {}
+        for future in concurrent.futures.as_completed(self._futures):
+            index = self._futures[future]
+            try:
+                cosym_result, scale_result = future.result()
+            except Exception as e:
+                raise ValueError(
+                    f"Unsuccessful scaling and symmetry analysis of the new data. Error:\n{e}"
+                )
+            FileHandler.record_log_file(
+                cosym_result.logfile.name.rstrip(".log"), cosym_result.logfile
+            )
+            FileHandler.record_html_file(
+                cosym_result.htmlfile.name.rstrip(".html"), cosym_result.htmlfile
+            )
+            FileHandler.record_log_file(
+                scale_result.logfile.name.rstrip(".log"), scale_result.logfile
+            )
+            xia2_logger.info(
+                f"Completed reindexing and scaling of data reduction batch {index+1}"
+            )
+            reindexed[index] = ProcessingBatch()
+            reindexed[index].add_filepair(
+                FilePair(cosym_result.exptfile, cosym_result.reflfile)
+            )
+            scaled[index] = ProcessingBatch()
+            scaled[index].add_filepair(
+                FilePair(scale_result.exptfile, scale_result.reflfile)
+            )
+            dmins[index] = scale_result.resolutionlimit
+        order = sorted(reindexed)
+        return (
+            [reindexed[i] for i in order],
+            [scaled[i] for i in order],
+            [dmins[i] for i in order],
+        )
+
+    def run(self) -> None:
+        """Finish the data reduction once all data have been added."""
+        if not any(v.crystals for v in self._good_crystals_data.values()):
+            raise ValueError("No crystals remain after filtering, processing finished.")
+        if self._n_pending_crystals:
+            # The remaining crystals form the final (possibly smaller) batch.
+            self._submit_pending_data(self._n_pending_crystals)
+
+        reducer = get_reducer(self._reduction_params)(
+            self._main_directory, self._integrated_data, self._reduction_params
+        )
+        reducer.set_best_unit_cell(
+            determine_best_unit_cell_from_crystals(self._good_crystals_data)
+        )
+        if self._requires_reindex:
+            xia2_logger.notice(banner("Reindexing"))  # type: ignore
+            try:
+                reindexed, scaled, dmins = self._collect_reindexed_batches()
+            finally:
+                if self._pool:
+                    self._pool.shutdown()
+            if len(scaled) > 1:
+                self._batches = reducer.reindex_scaled_batches(scaled, dmins)
+            else:
+                self._batches = reindexed
+        reducer.scale_and_merge(self._batches)
@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import concurrent.futures
+import contextlib
 import copy
 import json
 import logging
@@ -12,7 +13,7 @@ import sys
 from dataclasses import dataclass, field
 from io import StringIO
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple
 
 import numpy as np
 
@@ -38,11 +39,39 @@ from iotbx.phil import parse
 from xia2.Driver.timing import record_step
 from xia2.Handlers.Files import FileHandler
 from xia2.Modules.SSX.data_reduction_definitions import FilePair, ReductionParams
+from xia2.Modules.SSX.reference_intensities import (
+    cached_reference,
+    reference_cache_directory,
+)
 from xia2.Modules.SSX.reporting import condensed_unit_cell_info
 from xia2.Modules.SSX.util import log_to_file, run_in_directory
 
 xia2_logger = logging.getLogger(__name__)
 
+# The number of threads used to load the files of a merge group. Each thread
+# reads its own files, so the threads share no state.
+_LOADER_THREADS = 4
+
+
+def reduction_worker_pool(nproc: int) -> concurrent.futures.ProcessPoolExecutor:
+    """A process pool for running the data reduction programs.
+
+    The workers keep no state between tasks: each task loads the reflection
+    tables it needs from file, even if the same worker loaded them before."""
+    return concurrent.futures.ProcessPoolExecutor(max_workers=nproc)
+
+
+@contextlib.contextmanager
+def worker_pool(
+    pool: Optional[concurrent.futures.ProcessPoolExecutor], nproc: int
+) -> Generator[concurrent.futures.ProcessPoolExecutor, None, None]:
+    """Use the given pool, or a new pool that is shut down afterwards."""
+    if pool:
+        yield pool
+    else:
+        with reduction_worker_pool(nproc) as new_pool:
+            yield new_pool
+
 
 @dataclass(eq=False)
 class CrystalsData:
@@ -554,6 +583,16 @@ def scale_against_reference(
         params, diff_phil = _extract_scaling_params_for_scale_against_reference(
             reduction_params, name
         )
+        params.scaling_options.reference = os.fspath(
+            cached_reference(
+                reduction_params.reference,
+                reference_cache_directory(working_directory),
+                reduction_params.d_min or flex.min(table["d"]),
+                wavelength=np.mean([e.beam.get_wavelength() for e in expts]),
+                k_sol=reduction_params.reference_ksol,
+                b_sol=reduction_params.reference_bsol,
+            )
+        )
         dials_logger.info(
             "The following parameters have been modified:\n"
             # + f"input.experiments = {files.expt}\n"
@@ -583,7 +622,10 @@ import functools
 
 
 def scale_parallel_batches(
-    working_directory, batches: List[ProcessingBatch], reduction_params
+    working_directory,
+    batches: List[ProcessingBatch],
+    reduction_params,
+    pool: Optional[concurrent.futures.ProcessPoolExecutor] = None,
 ) -> Tuple[List[ProcessingBatch], List[float]]:
     # scale multiple batches in parallel
     scaled_results = []
@@ -594,8 +636,8 @@ def scale_parallel_batches(
     )
     jobs = {f"{batch_template(index=i+1)}": fp for i, fp in enumerate(batches)}
     # xia2_logger.notice(banner("Scaling"))  # type: ignore
-    with record_step("dials.scale (parallel)"), concurrent.futures.ProcessPoolExecutor(
-        max_workers=min(reduction_params.nproc, len(batches))
+    with record_step("dials.scale (parallel)"), worker_pool(
+        pool, min(reduction_params.nproc, len(batches))
     ) as pool:
         scale_futures: Dict[Any, str] = {
             pool.submit(
@@ -801,6 +843,17 @@ def individual_cosym(
         # cosym_params.cc_star_threshold = 0.1
         # cosym_params.angular_separation_threshold = 5
         expts, table = combined_files_for_batch(batch)
+        if cosym_params.reference:
+            cosym_params.reference = os.fspath(
+                cached_reference(
+                    cosym_params.reference,
+                    reference_cache_directory(working_directory),
+                    reduction_params.d_min or flex.min(table["d"]),
+                    wavelength=np.mean([e.beam.get_wavelength() for e in expts]),
+                    k_sol=cosym_params.reference_model.k_sol,
+                    b_sol=cosym_params.reference_model.b_sol,
+                )
+            )
 
         tables = table.split_by_experiment_id()
         # now run cosym
@@ -810,7 +863,8 @@ def individual_cosym(
             random.seed(cosym_params.seed)
         cosym_instance = cosym(expts, tables, cosym_params)
         register_default_cosym_observers(cosym_instance)
-        cosym_instance.run()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            cosym_instance.run()  # block printing from cosym
         cosym_instance.experiments.as_file(cosym_params.output.experiments)
         joint_refls = flex.reflection_table.concat(cosym_instance.reflections)
         joint_refls.as_file(cosym_params.output.reflections)
@@ -834,6 +888,8 @@ def cosym_reindex(
     max_delta: float = 0.5,
     partiality_threshold: float = 0.2,
     reference=None,
+    reference_ksol: float = 0.35,
+    reference_bsol: float = 46.0,
 ) -> List[ProcessingBatch]:
     from dials.command_line.cosym import phil_scope as cosym_scope
 
@@ -853,7 +909,20 @@ def cosym_reindex(
     params.partiality_threshold = partiality_threshold
     params.min_i_mean_over_sigma_mean = 0.5
     if reference:
-        params.reference = os.fspath(reference)
+        params.reference = os.fspath(
+            cached_reference(
+                reference,
+                reference_cache_directory(working_directory),
+                d_min or min(flex.min(table["d"]) for table in refls),
+                wavelength=np.mean(
+                    [e.beam.get_wavelength() for elist in expts for e in elist]
+                ),
+                k_sol=reference_ksol,
+                b_sol=reference_bsol,
+            )
+        )
+        params.reference_model.k_sol = reference_ksol
+        params.reference_model.b_sol = reference_bsol
     if d_min:
         params.d_min = d_min
 
@@ -884,6 +953,7 @@ def parallel_cosym(
     data_to_reindex: List[ProcessingBatch],
     reduction_params,
     nproc: int = 1,
+    pool: Optional[concurrent.futures.ProcessPoolExecutor] = None,
 ) -> List[ProcessingBatch]:
     """Run dials.cosym on each batch to resolve indexing ambiguities."""
 
@@ -892,44 +962,36 @@ def parallel_cosym(
 
     reindexed_results = []
 
-    with open(os.devnull, "w") as devnull:
-        sys.stdout = devnull  # block printing from cosym
+    with record_step("dials.cosym (parallel)"), worker_pool(pool, nproc) as pool:
 
-        with record_step(
-            "dials.cosym (parallel)"
-        ), concurrent.futures.ProcessPoolExecutor(max_workers=nproc) as pool:
-
-            cosym_futures: List[Any] = [
-                pool.submit(
-                    individual_cosym,
-                    working_directory,
-                    batch,
-                    index,
-                    reduction_params,
+        cosym_futures: List[Any] = [
+            pool.submit(
+                individual_cosym,
+                working_directory,
+                batch,
+                index,
+                reduction_params,
+            )
+            for index, batch in enumerate(data_to_reindex)
+        ]
+        for future in concurrent.futures.as_completed(cosym_futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                raise ValueError(
+                    f"Unsuccessful scaling and symmetry analysis of the new data. Error:\n{e}"
+                )
+            else:
+                processed_batch = ProcessingBatch()
+                processed_batch.add_filepair(FilePair(result.exptfile, result.reflfile))
+                reindexed_results.append(processed_batch)
+                FileHandler.record_log_file(
+                    result.logfile.name.rstrip(".log"), result.logfile
+                )
+                FileHandler.record_html_file(
+                    result.htmlfile.name.rstrip(".html"), result.htmlfile
                 )
-                for index, batch in enumerate(data_to_reindex)
-            ]
-            for future in concurrent.futures.as_completed(cosym_futures):
-                try:
-                    result = future.result()
-                except Exception as e:
-                    raise ValueError(
-                        f"Unsuccessful scaling and symmetry analysis of the new data. Error:\n{e}"
-                    )
-                else:
-                    processed_batch = ProcessingBatch()
-                    processed_batch.add_filepair(
-                        FilePair(result.exptfile, result.reflfile)
-                    )
-                    reindexed_results.append(processed_batch)
-                    FileHandler.record_log_file(
-                        result.logfile.name.rstrip(".log"), result.logfile
-                    )
-                    FileHandler.record_html_file(
-                        result.htmlfile.name.rstrip(".html"), result.htmlfile
-                    )
 
-    sys.stdout = sys.__stdout__  # restore printing
     return reindexed_results
 
 
@@ -1060,42 +1122,92 @@ def split_filtered_data(
     return batches
 
 
-def prepare_scaled_array(
-    filelist: List[FilePair], best_unit_cell: uctbx.unit_cell
+def _scaled_columns(
+    expts: ExperimentList, table: flex.reflection_table
+) -> Tuple[ExperimentList, flex.miller_index, flex.double, flex.double]:
+    # only the columns needed for the scaled array, so that the rest of the
+    # table can be freed as soon as it is no longer used
+    return expts, table["miller_index"], table["intensity"], table["sigma"]
+
+
+def _combine_scaled_columns(
+    columns: List[Tuple[ExperimentList, flex.miller_index, flex.double, flex.double]],
+    best_unit_cell: uctbx.unit_cell,
 ) -> Tuple[miller.array, ExperimentList]:
-    """
-    Loads a list of reflection tables and experiment lists, creates a miller
-    array and concatenates into a combined miller array and experiment list.
-    """
-    scaled_array = None
+    if not columns:
+        raise RuntimeError("No data given to prepare a scaled array")
+    space_group = columns[0][0][0].crystal.get_space_group()
+    n_refl = sum(indices.size() for _, indices, __, ___ in columns)
+    indices = flex.miller_index()
+    intensities = flex.double()
+    sigmas = flex.double()
+    for array in (indices, intensities, sigmas):
+        array.reserve(n_refl)
     joint_expts: ExperimentList = ExperimentList()
-    for fp in filelist:
-        expts = load.experiment_list(fp.expt, check_format=False)
-        table = flex.reflection_table.from_file(fp.refl)
-        # now make the miller array
-        miller_set = miller.set(
-            crystal_symmetry=crystal.symmetry(
-                unit_cell=best_unit_cell,
-                space_group=expts[0].crystal.get_space_group(),
-                assert_is_compatible_unit_cell=False,
-            ),
-            indices=table["miller_index"],
-            anomalous_flag=False,
-        )
-        i_obs: miller.array = miller.array(
-            miller_set,
-            data=table["intensity"],
-        )
-        i_obs.set_observation_type_xray_intensity()
-        i_obs.set_sigmas(table["sigma"])
-        if scaled_array is None:
-            scaled_array = i_obs
+    for i, (expts, table_indices, table_intensities, table_sigmas) in enumerate(
+        columns
+    ):
+        assert expts[0].crystal.get_space_group() == space_group
+        indices.extend(table_indices)
+        intensities.extend(table_intensities)
+        sigmas.extend(table_sigmas)
+        if i == 0:
             joint_expts = expts
         else:
-            scaled_array = scaled_array.concatenate(i_obs)
             joint_expts.extend(expts)
-    if not scaled_array:
-        raise RuntimeError("No file list given to prepare_scaled_array")
+        columns[i] = None  # free each part once copied
+    miller_set = miller.set(
+        crystal_symmetry=crystal.symmetry(
+            unit_cell=best_unit_cell,
+            space_group=space_group,
+            assert_is_compatible_unit_cell=False,
+        ),
+        indices=indices,
+        anomalous_flag=False,
+    )
+    scaled_array: miller.array = miller.array(
+        miller_set, data=intensities, sigmas=sigmas
+    )
     scaled_array.set_observation_type_xray_intensity()
 
     return scaled_array, joint_expts
+
+
+def scaled_array_from_tables(
+    data: Iterable[Tuple[ExperimentList, flex.reflection_table]],
+    best_unit_cell: uctbx.unit_cell,
+) -> Tuple[miller.array, ExperimentList]:
+    """
+    Creates a combined miller array and experiment list from the reflection
+    tables and experiment lists. The combined array is allocated once for
+    all tables, rather than being extended by each table in turn.
+    """
+    return _combine_scaled_columns(
+        [_scaled_columns(expts, table) for expts, table in data], best_unit_cell
+    )
+
+
+def _load_scaled_columns(
+    fp: FilePair,
+) -> Tuple[ExperimentList, flex.miller_index, flex.double, flex.double]:
+    return _scaled_columns(
+        load.experiment_list(fp.expt, check_format=False),
+        flex.reflection_table.from_file(fp.refl),
+    )
+
+
+def prepare_scaled_array(
+    filelist: List[FilePair], best_unit_cell: uctbx.unit_cell
+) -> Tuple[miller.array, ExperimentList]:
+    """
+    Loads a list of reflection tables and experiment lists, creates a miller
+    array and concatenates into a combined miller array and experiment list.
+    The files are loaded concurrently in threads.
+    """
+    if not filelist:
+        raise RuntimeError("No file list given to prepare_scaled_array")
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(len(filelist), _LOADER_THREADS)
+    ) as pool:
+        columns = list(pool.map(_load_scaled_columns, filelist))
+    return _combine_scaled_columns(columns, best_unit_cell)
@@ -4,19 +4,14 @@ import concurrent.futures
 import functools
 import logging
 from pathlib import Path
-from typing import Any, Dict, Tuple
+from typing import Any, Dict
 
-from cctbx import sgtbx, uctbx
+from cctbx import uctbx
 
 from xia2.Driver.timing import record_step
 from xia2.Handlers.Files import FileHandler
 from xia2.Modules.SSX.data_reduction_base import BaseDataReduction
-from xia2.Modules.SSX.data_reduction_programs import (
-    CrystalsDict,
-    FilePair,
-    filter_,
-    scale_against_reference,
-)
+from xia2.Modules.SSX.data_reduction_programs import FilePair, scale_against_reference
 
 xia2_logger = logging.getLogger(__name__)
 
@@ -26,13 +21,9 @@ class DataReductionWithReference(BaseDataReduction):
     ### This implementation uses the reference model when reindexing and scaling,
     ### allowing parallel processing in batches.
 
-    def _filter(self) -> Tuple[CrystalsDict, uctbx.unit_cell, sgtbx.space_group_info]:
-        good_crystals_data, best_unit_cell, space_group = filter_(
-            self._filter_wd, self._integrated_data, self._reduction_params
-        )
+    def set_best_unit_cell(self, best_unit_cell: uctbx.unit_cell) -> None:
         self._reduction_params.central_unit_cell = best_unit_cell  # store the
         # updated value to use in scaling
-        return good_crystals_data, best_unit_cell, space_group
 
     def _scale(self) -> None:
         """Run scaling"""
@@ -51,11 +42,8 @@ class DataReductionWithReference(BaseDataReduction):
             for i, fp in enumerate(self._batches_to_scale)
         }
 
-        with record_step(
-            "dials.scale (parallel)"
-        ), concurrent.futures.ProcessPoolExecutor(
-            max_workers=self._reduction_params.nproc
-        ) as pool:
+        pool = self._get_pool()
+        with record_step("dials.scale (parallel)"):
             scale_futures: Dict[Any, str] = {
                 pool.submit(
                     scale_against_reference,
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import os
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from dials.array_family import flex
+from dials.util.reference import intensities_from_reference_file
+
+xia2_logger = logging.getLogger(__name__)
+
+# References with these suffixes are models, from which intensities must be
+# calculated, rather than reflection data.
+_MODEL_SUFFIXES = (".pdb", ".cif", ".mmcif")
+
+
+def reference_cache_directory(working_directory: Path) -> Path:
+    """The reference intensities cache shared by the data reduction stages."""
+    return working_directory.parent / "reference_intensities"
+
+
+def cached_reference(
+    reference: Path,
+    cache_directory: Path,
+    d_min: float,
+    wavelength: Optional[float] = None,
+    k_sol: float = 0.35,
+    b_sol: float = 46.0,
+) -> Path:
+    """
+    A reflection file of the intensities calculated from a reference model.
+
+    The intensities are calculated once for each model, resolution limit,
+    wavelength and bulk solvent parameters, and written to an MTZ file in the
+    cache directory, which is then used as the reference by every process.
+    The resolution limit is rounded down to 0.1 Å and the wavelength to
+    0.0001 Å, so that batches of data with similar limits share the same
+    intensities. A reference which is not a model is returned unchanged.
+    """
+    reference = Path(reference)
+    if reference.suffix.lower() not in _MODEL_SUFFIXES:
+        return reference
+    d_min = max(math.floor(d_min * 10) / 10, 0.1)
+    if wavelength:
+        wavelength = round(wavelength, 4)
+    key = hashlib.sha256(reference.read_bytes())
+    key.update(repr((d_min, wavelength, k_sol, b_sol)).encode())
+    path = cache_directory / f"reference_{key.hexdigest()[:16]}.mtz"
+    if path.is_file():
+        return path
+
+    cache_directory.mkdir(parents=True, exist_ok=True)
+    # Only one process calculates the intensities, while any others wait. The
+    # lock is released by the kernel if the process is killed.
+    with open(path.with_suffix(".lock"), "w") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        if path.is_file():
+            # calculated by another process
+            return path
+        xia2_logger.debug(
+            f"Calculating reference intensities from {reference} to {d_min} Å"
+        )
+        intensities = intensities_from_reference_file(
+            os.fspath(reference),
+            d_min=d_min,
+            wavelength=wavelength,
+            k_sol=k_sol,
+            b_sol=b_sol,
+        )
+        if intensities.sigmas() is None:
+            intensities = intensities.customized_copy(
+                sigmas=flex.double(intensities.size(), 1.0)
+            ).set_observation_type_xray_intensity()
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        intensities.as_mtz_dataset(column_root_label="I").mtz_object().write(
+            os.fspath(tmp)
+        )
+        os.replace(tmp, path)
+    return path
@@ -22,6 +22,7 @@ from xia2.Modules.SSX.data_integration_standard import (
 )
 from xia2.Modules.SSX.data_reduction_definitions import ReductionParams
 from xia2.Modules.SSX.data_reduction_interface import get_reducer
+from xia2.Modules.SSX.data_reduction_pipelined import PipelinedDataReduction
 from xia2.Modules.SSX.util import report_timing
 from xia2.Modules.SSX.xia2_ssx_reduce import data_reduction_phil_str
 
@@ -203,6 +204,14 @@ workflow {
             "steps=find_spots+index".
     .type=choice(multi=True)
     .expert_level=3
+  pipeline_reduction = False
+    .type = bool
+    .help = "If True, start data reduction on each batch of integrated data as"
+            "soon as it is available, so that reindexing and scaling of batches"
+            "runs concurrently with the remaining integration. In this mode,"
+            "the integrated data are filtered on the clustering tolerances"
+            "about the given unit cell, rather than by unit cell clustering."
+    .expert_level=3
 }
 enable_live_reporting = False
   .type = bool
@@ -213,6 +222,13 @@ enable_live_reporting = False
 full_phil_str = phil_str + data_reduction_phil_str + workflow_phil
 
 
+def _reduction_params_from_phil(params: iotbx.phil.scope_extract) -> ReductionParams:
+    if not params.symmetry.space_group:
+        params.symmetry.space_group = params.space_group
+    params.workflow.steps = ["scale", "merge"]
+    return ReductionParams.from_phil(params)
+
+
 @report_timing
 def run_xia2_ssx(
     root_working_directory: pathlib.Path, params: iotbx.phil.scope_extract
@@ -310,6 +326,21 @@ def run_xia2_ssx(
     refinement_params = RefinementParams.from_phil(params)
     integration_params = IntegrationParams.from_phil(params)
 
+    reduction_pipeline = None
+    if params.workflow.pipeline_reduction and not (
+        indexing_params.space_group and indexing_params.unit_cell
+    ):
+        xia2_logger.warning(
+            "workflow.pipeline_reduction=True requires both space_group and "
+            "unit_cell to be given; data reduction will run after integration."
+        )
+    elif params.workflow.pipeline_reduction and "reduce" in params.workflow.steps:
+        reduction_pipeline = PipelinedDataReduction(
+            root_working_directory,
+            _reduction_params_from_phil(params),
+            indexing_params.unit_cell,
+        )
+
     integrated_batch_directories = run_data_integration(
         root_working_directory,
         file_input,
@@ -318,15 +349,16 @@ def run_xia2_ssx(
         indexing_params,
         refinement_params,
         integration_params,
+        reduction_pipeline.add_directory if reduction_pipeline else None,
     )
-    if not integrated_batch_directories or not ("reduce" in params.workflow.steps):
+    if not integrated_batch_directories or not ("reduce" in options.steps):
         return
 
     # Now do the data reduction
-    if not params.symmetry.space_group:
-        params.symmetry.space_group = params.space_group
-    params.workflow.steps = ["scale", "merge"]
-    reduction_params = ReductionParams.from_phil(params)
+    if reduction_pipeline:
+        reduction_pipeline.run()
+        return
+    reduction_params = _reduction_params_from_phil(params)
     reducer_class = get_reducer(reduction_params)
     reducer = reducer_class.from_directories(
         root_working_directory,
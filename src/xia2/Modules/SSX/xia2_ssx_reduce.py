@@ -83,6 +83,12 @@ reference = None
 partiality_threshold = 0.25
   .type = float
   .help = "Filter out reflections below this partiality in data reduction."
+save_merge_input = False
+  .type = bool
+  .help = "Save the filtered scaled data that are input to merging as"
+          "intermediate files (group_*.expt/refl), in the merge directory."
+          "By default, the data are passed directly to merging."
+  .expert_level = 3
 %s
 clustering {
   threshold=None
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import concurrent.futures
 import logging
 import shutil
 from pathlib import Path
@@ -71,30 +72,20 @@ grouping:
     return parsed_yaml
 
 
-def save_scaled_array_for_merge(
-    input_: SplittingIterable,
-) -> Optional[Tuple[str, FilePair]]:
-    refls = flex.reflection_table.from_file(input_.fp.refl)
+# The columns of a pre-merge file, as output from a previous grouped processing job
+_PREMERGE_COLUMNS = {"intensity", "miller_index", "sigma", "flags", "d"}
+
+
+def _load_scaled_table(fp: FilePair) -> flex.reflection_table:
+    refls = flex.reflection_table.from_file(fp.refl)
     if not any(refls.get_flags(refls.flags.scaled)):
         raise ValueError("Unscaled data input for merging")
-    # check if the input file is a pre-merge file from a previous grouped processing job
-    if set(refls.keys()) == {"intensity", "miller_index", "sigma", "flags", "d"}:
-        # One use case is rerunning with a d_min cutoff.
-        if input_.params.d_min:
-            refls = refls.select(refls["d"] >= input_.params.d_min)
-            reflout = (
-                input_.working_directory
-                / f"group_{input_.groupindex}_{input_.fileindex}.refl"
-            )
-            exptout = (
-                input_.working_directory
-                / f"group_{input_.groupindex}_{input_.fileindex}.expt"
-            )
-            shutil.copyfile(input_.fp.expt, exptout)
-            refls.as_file(reflout)
-            return (input_.name, FilePair(exptout, reflout))
-        else:
-            return (input_.name, input_.fp)
+    return refls
+
+
+def _select_group_data_for_merge(
+    input_: SplittingIterable, refls: flex.reflection_table
+) -> Optional[Tuple[ExperimentList, flex.reflection_table]]:
     trim_table_for_merge(refls)
     groupdata = input_.groupdata
     expts = load.experiment_list(input_.fp.expt, check_format=False)
@@ -126,46 +117,98 @@ def save_scaled_array_for_merge(
         tmp["flags"] = refls["flags"]
         tmp["d"] = refls["d"]
         tmp = tmp.select(refls["inverse_scale_factor"] > 0)
-        exptout = (
-            input_.working_directory
-            / f"group_{input_.groupindex}_{input_.fileindex}.expt"
-        )
-        reflout = (
-            input_.working_directory
-            / f"group_{input_.groupindex}_{input_.fileindex}.refl"
-        )
+        return (expts, tmp)
+    return None
+
+
+def save_scaled_array_for_merge(
+    input_: SplittingIterable,
+) -> Optional[Tuple[str, FilePair]]:
+    refls = _load_scaled_table(input_.fp)
+    exptout = (
+        input_.working_directory / f"group_{input_.groupindex}_{input_.fileindex}.expt"
+    )
+    reflout = (
+        input_.working_directory / f"group_{input_.groupindex}_{input_.fileindex}.refl"
+    )
+    # check if the input file is a pre-merge file from a previous grouped processing job
+    if set(refls.keys()) == _PREMERGE_COLUMNS:
+        # One use case is rerunning with a d_min cutoff.
+        if input_.params.d_min:
+            refls = refls.select(refls["d"] >= input_.params.d_min)
+            shutil.copyfile(input_.fp.expt, exptout)
+            refls.as_file(reflout)
+            return (input_.name, FilePair(exptout, reflout))
+        else:
+            return (input_.name, input_.fp)
+    group_data = _select_group_data_for_merge(input_, refls)
+    if group_data:
+        expts, tmp = group_data
         expts.as_file(exptout)
         tmp.as_file(reflout)
         return (input_.name, FilePair(exptout, reflout))
     return None
 
 
+def scaled_data_for_merge(
+    input_: SplittingIterable,
+) -> Optional[Tuple[str, ExperimentList, flex.reflection_table]]:
+    """
+    As save_scaled_array_for_merge, but return the data for merging rather
+    than saving to intermediate files.
+    """
+    refls = _load_scaled_table(input_.fp)
+    if set(refls.keys()) == _PREMERGE_COLUMNS:
+        if input_.params.d_min:
+            refls = refls.select(refls["d"] >= input_.params.d_min)
+        expts = load.experiment_list(input_.fp.expt, check_format=False)
+        return (input_.name, expts, refls)
+    group_data = _select_group_data_for_merge(input_, refls)
+    if group_data:
+        return (input_.name, *group_data)
+    return None
+
+
+def _splitting_iterables_for_all_files(
+    working_directory: Path,
+    scaled_files: List[FilePair],
+    reduction_params: ReductionParams,
+    name: str,
+) -> List[SplittingIterable]:
+    groupindex = 0
+    groupdata = GroupsForExpt(0)
+    return [
+        SplittingIterable(
+            working_directory,
+            fp,
+            i,
+            groupindex,
+            groupdata,
+            name,
+            reduction_params,
+        )
+        for i, fp in enumerate(scaled_files)
+    ]
+
+
 def apply_scaled_array_to_all_files(
     working_directory: Path,
     scaled_files: List[FilePair],
     reduction_params: ReductionParams,
+    pool: Optional[concurrent.futures.ProcessPoolExecutor] = None,
 ) -> dict[str, List[FilePair]]:
 
-    groupindex = 0
     name = "merged"  # note this name becomes the filename of the output mtz
-    groupdata = GroupsForExpt(0)
-    input_iterable = []
     filesdict: dict[str, List[FilePair]] = {name: []}
-    for i, fp in enumerate(scaled_files):
-        input_iterable.append(
-            SplittingIterable(
-                working_directory,
-                fp,
-                i,
-                groupindex,
-                groupdata,
-                name,
-                reduction_params,
-            )
-        )
+    input_iterable = _splitting_iterables_for_all_files(
+        working_directory, scaled_files, reduction_params, name
+    )
     if input_iterable:
-        with Pool(min(reduction_params.nproc, len(input_iterable))) as pool:
-            results = pool.map(save_scaled_array_for_merge, input_iterable)
+        if pool:
+            results = list(pool.map(save_scaled_array_for_merge, input_iterable))
+        else:
+            with Pool(min(reduction_params.nproc, len(input_iterable))) as mp_pool:
+                results = mp_pool.map(save_scaled_array_for_merge, input_iterable)
         for result in results:
             if result:
                 name = result[0]
@@ -174,6 +217,27 @@ def apply_scaled_array_to_all_files(
     return filesdict
 
 
+def scaled_data_for_all_files(
+    working_directory: Path,
+    scaled_files: List[FilePair],
+    reduction_params: ReductionParams,
+    pool: concurrent.futures.ProcessPoolExecutor,
+) -> dict[str, List[Tuple[ExperimentList, flex.reflection_table]]]:
+    """
+    As apply_scaled_array_to_all_files, but return the data for merging
+    rather than the intermediate files.
+    """
+    name = "merged"  # note this name becomes the filename of the output mtz
+    datadict: dict[str, List[Tuple[ExperimentList, flex.reflection_table]]] = {name: []}
+    input_iterable = _splitting_iterables_for_all_files(
+        working_directory, scaled_files, reduction_params, name
+    )
+    for result in pool.map(scaled_data_for_merge, input_iterable):
+        if result:
+            datadict[result[0]].append((result[1], result[2]))
+    return datadict
+
+
 def yml_to_merged_filesdict(
     working_directory: Path,
     parsed: ParsedYAML,
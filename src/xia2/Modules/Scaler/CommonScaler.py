@@ -32,6 +32,12 @@ from xia2.Modules.AnalyseMyIntensities import AnalyseMyIntensities
 from xia2.Modules.CCP4InterRadiationDamageDetector import (
     CCP4InterRadiationDamageDetector,
 )
+from xia2.Modules.MergingStatistics import MergingStatistics
+from xia2.Modules.Resolution import (
+    BatchedResolutionEstimator,
+    format_limits,
+    limit_and_reasoning,
+)
 from xia2.Modules.Scaler.rebatch import rebatch
 from xia2.Schema.Interfaces.Scaler import Scaler
 
@@ -951,7 +957,9 @@ class CommonScaler(Scaler):
             mmblock["_diffrn_source.pdbx_wavelength_list"] = xwav
 
             umtz = mtz.object(file_name=unmerged_mtz)
-            result = self._iotbx_merging_statistics(unmerged_mtz, anomalous=False)
+            result = self._merging_statistics(unmerged_mtz).dataset_statistics(
+                n_bins=PhilIndex.params.xia2.settings.merging_statistics.n_bins
+            )
 
             merged_block = iotbx.cif.model.block()
             merged_block["_reflns.pdbx_ordinal"] = 1
@@ -1112,47 +1120,32 @@ class CommonScaler(Scaler):
             m.set_batch_range(start, end)
         m.run()
 
-        resolution_limits = []
-        reasoning = []
-
-        if params.completeness is not None:
-            r_comp = m.get_resolution_completeness()
-            resolution_limits.append(r_comp)
-            reasoning.append("completeness > %s" % params.completeness)
-
-        if params.cc_half is not None:
-            r_cc_half = m.get_resolution_cc_half()
-            resolution_limits.append(r_cc_half)
-            reasoning.append("cc_half > %s" % params.cc_half)
-
-        if params.rmerge is not None:
-            r_rm = m.get_resolution_rmerge()
-            resolution_limits.append(r_rm)
-            reasoning.append("rmerge > %s" % params.rmerge)
-
-        if params.isigma is not None:
-            r_uis = m.get_resolution_isigma()
-            resolution_limits.append(r_uis)
-            reasoning.append("unmerged <I/sigI> > %s" % params.isigma)
-
-        if params.misigma is not None:
-            r_mis = m.get_resolution_misigma()
-            resolution_limits.append(r_mis)
-            reasoning.append("merged <I/sigI> > %s" % params.misigma)
-
-        if any(resolution_limits):
-            resolution = max(r for r in resolution_limits if r is not None)
-            reasoning = [
-                reason
-                for limit, reason in zip(resolution_limits, reasoning)
-                if limit is not None and limit >= resolution
-            ]
-            reasoning = ", ".join(reasoning)
-        else:
-            resolution = 0.0
-            reasoning = None
+        limits = {
+            "completeness": m.get_resolution_completeness(),
+            "cc_half": m.get_resolution_cc_half(),
+            "rmerge": m.get_resolution_rmerge(),
+            "isigma": m.get_resolution_isigma(),
+            "misigma": m.get_resolution_misigma(),
+        }
+        return limit_and_reasoning(params, limits)
 
-        return resolution, reasoning
+    def _estimate_resolution_limits(
+        self, hklin, batch_ranges, reflections=None, experiments=None
+    ):
+        """Estimate the resolution limit of each criterion for each batch
+        range, reading the scaled data once and fitting the batch ranges in
+        parallel."""
+        nbins = 20 if PhilIndex.params.xia2.settings.small_molecule else 100
+        estimator = BatchedResolutionEstimator(
+            PhilIndex.params.xia2.settings.resolution,
+            hklin=hklin,
+            reflections=reflections,
+            experiments=experiments,
+            nbins=nbins,
+        )
+        return estimator.estimate(
+            batch_ranges, nproc=PhilIndex.params.xia2.settings.multiprocessing.nproc
+        )
 
     def _compute_scaler_statistics(
         self, scaled_unmerged_mtz, selected_band=None, wave=None
@@ -1210,62 +1203,41 @@ class CommonScaler(Scaler):
             )
         )
 
-        result, select_result, anom_result, select_anom_result = None, None, None, None
         n_bins = PhilIndex.params.xia2.settings.merging_statistics.n_bins
+        four_column_output = selected_band and any(selected_band)
+        bands = [(False, None, None)]
+        if four_column_output:
+            bands.append((False, selected_band[0], selected_band[1]))
+        if not sg.is_centric():
+            bands.append((True, None, None))
+            if four_column_output:
+                bands.append((True, selected_band[0], selected_band[1]))
+
+        # read the data once for the statistics of every band
+        results = self._merging_statistics(scaled_unmerged_mtz).band_statistics(
+            bands, n_bins=n_bins
+        )
+        result = results.pop(0)
+        select_result = results.pop(0) if four_column_output else None
+        anom_result, select_anom_result = None, None
+        if sg.is_centric():
+            anom_key_to_var = {}
+        else:
+            anom_result = results.pop(0)
+            select_anom_result = results.pop(0) if four_column_output else None
 
-        while result is None:
-            try:
-
-                result = self._iotbx_merging_statistics(
-                    scaled_unmerged_mtz, anomalous=False, n_bins=n_bins
-                )
-                result.as_json(file_name=str(merging_stats_json))
-                with open(str(merging_stats_file), "w") as fh:
-                    result.show(out=fh)
-
-                four_column_output = selected_band and any(selected_band)
-                if four_column_output:
-                    select_result = self._iotbx_merging_statistics(
-                        scaled_unmerged_mtz,
-                        anomalous=False,
-                        d_min=selected_band[0],
-                        d_max=selected_band[1],
-                        n_bins=n_bins,
-                    )
+        result.as_json(file_name=str(merging_stats_json))
+        with open(str(merging_stats_file), "w") as fh:
+            result.show(out=fh)
 
-                if sg.is_centric():
-                    anom_result = None
-                    anom_key_to_var = {}
-                else:
-                    anom_result = self._iotbx_merging_statistics(
-                        scaled_unmerged_mtz, anomalous=True, n_bins=n_bins
-                    )
-                    anom_probability_plot = (
-                        anom_result.overall.anom_probability_plot_expected_delta
-                    )
-                    if anom_probability_plot is not None:
-                        stats["Anomalous slope"] = [anom_probability_plot.slope]
-                    stats["dF/F"] = [anom_result.overall.anom_signal]
-                    stats["dI/s(dI)"] = [
-                        anom_result.overall.delta_i_mean_over_sig_delta_i_mean
-                    ]
-                    if four_column_output:
-                        select_anom_result = self._iotbx_merging_statistics(
-                            scaled_unmerged_mtz,
-                            anomalous=True,
-                            d_min=selected_band[0],
-                            d_max=selected_band[1],
-                            n_bins=n_bins,
-                        )
-
-            except iotbx.merging_statistics.StatisticsError:
-                # Too few reflections for too many bins. Reduce number of bins and try again.
-                result = None
-                n_bins = n_bins - 3
-                if n_bins > 5:
-                    continue
-                else:
-                    raise
+        if anom_result is not None:
+            anom_probability_plot = (
+                anom_result.overall.anom_probability_plot_expected_delta
+            )
+            if anom_probability_plot is not None:
+                stats["Anomalous slope"] = [anom_probability_plot.slope]
+            stats["dF/F"] = [anom_result.overall.anom_signal]
+            stats["dI/s(dI)"] = [anom_result.overall.delta_i_mean_over_sig_delta_i_mean]
 
         for d, r, s in (
             (key_to_var, result, select_result),
@@ -1292,20 +1264,12 @@ class CommonScaler(Scaler):
 
         return stats
 
-    def _iotbx_merging_statistics(
-        self, scaled_unmerged_mtz, anomalous=False, d_min=None, d_max=None, n_bins=None
-    ):
+    @staticmethod
+    def _merging_statistics(scaled_unmerged_mtz):
         params = PhilIndex.params.xia2.settings.merging_statistics
-        i_obs = iotbx.merging_statistics.select_data(
-            scaled_unmerged_mtz, data_labels=None
-        )
-        i_obs = i_obs.customized_copy(anomalous_flag=True, info=i_obs.info())
-        return iotbx.merging_statistics.dataset_statistics(
-            i_obs=i_obs,
-            d_min=d_min,
-            d_max=d_max,
-            n_bins=n_bins or params.n_bins,
-            anomalous=anomalous,
+        return MergingStatistics.from_file(
+            scaled_unmerged_mtz,
+            anomalous_flag=True,
             use_internal_variance=params.use_internal_variance,
             eliminate_sys_absent=params.eliminate_sys_absent,
             assert_is_not_unique_set_under_symmetry=False,
@@ -1565,12 +1529,36 @@ class CommonScaler(Scaler):
         highest_resolution = 100.0
         highest_suggested_resolution = None
 
+        # estimate the limits of all remaining sweeps together
+        to_estimate = {}
+        for epoch in self._sweep_handler.get_epochs():
+            si = self._sweep_handler.get_sweep_information(epoch)
+            _, __, dname = si.get_project_info()
+            sname = si.get_sweep_name()
+            if (dname, sname) not in self._scalr_resolution_limits and (
+                dname,
+                sname,
+            ) not in user_resolution_limits:
+                to_estimate[epoch] = si.get_batch_range()
+        estimates = {}
+        if to_estimate:
+            estimates = dict(
+                zip(
+                    to_estimate,
+                    self._estimate_resolution_limits(
+                        hklin,
+                        list(to_estimate.values()),
+                        reflections=reflections,
+                        experiments=experiments,
+                    ),
+                )
+            )
+
         for epoch in self._sweep_handler.get_epochs():
             si = self._sweep_handler.get_sweep_information(epoch)
             _, __, dname = si.get_project_info()
             sname = si.get_sweep_name()
             intgr = si.get_integrater()
-            start, end = si.get_batch_range()
 
             if (dname, sname) in self._scalr_resolution_limits:
                 continue
@@ -1585,17 +1573,16 @@ class CommonScaler(Scaler):
                 )
                 continue
 
-            if hklin:
-                limit, reasoning = self._estimate_resolution_limit(
-                    hklin, batch_range=(start, end)
-                )
-            else:
-                limit, reasoning = self._estimate_resolution_limit(
-                    hklin=None,
-                    batch_range=(start, end),
-                    reflections=reflections,
-                    experiments=experiments,
-                )
+            limits = estimates[epoch]
+            logger.info(
+                "Resolution limits for sweep %s/%s: %s",
+                dname,
+                sname,
+                format_limits(limits) or "none",
+            )
+            limit, reasoning = limit_and_reasoning(
+                PhilIndex.params.xia2.settings.resolution, limits
+            )
 
             if PhilIndex.params.xia2.settings.resolution.keep_all_reflections:
                 suggested = limit
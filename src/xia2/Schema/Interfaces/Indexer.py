@@ -47,6 +47,7 @@ from functools import reduce
 
 from cctbx.sgtbx import bravais_types
 
+import xia2.Driver.timing
 from xia2.Experts.LatticeExpert import SortLattices
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Handlers.Streams import banner
@@ -420,127 +421,129 @@ class Indexer:
 
     def index(self):
 
-        if not self.get_indexer_finish_done():
-            f = inspect.currentframe().f_back.f_back
-            m = f.f_code.co_filename
-            l = f.f_lineno
-
-            logger.debug(
-                "Index in %s called from %s %d" % (self.__class__.__name__, m, l)
-            )
-
-        while not self.get_indexer_finish_done():
-            while not self.get_indexer_done():
-                while not self.get_indexer_prepare_done():
-
-                    # --------------
-                    # call prepare()
-                    # --------------
-
-                    self.set_indexer_prepare_done(True)
-                    self._index_prepare()
-
-                # --------------------------------------------
-                # then do the proper indexing - using the best
-                # solution already stored if available (c/f
-                # eliminate above)
-                # --------------------------------------------
-
-                self.set_indexer_done(True)
-
-                if self.get_indexer_sweeps():
-                    xsweeps = [s.get_name() for s in self.get_indexer_sweeps()]
-                    if len(xsweeps) > 1:
-                        # find "SWEEPn, SWEEP(n+1), (..), SWEEPm" and aggregate to "SWEEPS n-m"
-                        xsweeps = [
-                            (int(x[5:]), int(x[5:])) if x.startswith("SWEEP") else x
-                            for x in xsweeps
-                        ]
-                        xsweeps[0] = [xsweeps[0]]
-
-                        def compress(seen, nxt):
-                            if (
-                                isinstance(seen[-1], tuple)
-                                and isinstance(nxt, tuple)
-                                and (seen[-1][1] + 1 == nxt[0])
-                            ):
-                                seen[-1] = (seen[-1][0], nxt[1])
-                            else:
-                                seen.append(nxt)
-                            return seen
-
-                        xsweeps = reduce(compress, xsweeps)
-                        xsweeps = [
-                            (
-                                "SWEEP%d" % x[0]
-                                if x[0] == x[1]
-                                else "SWEEPS %d to %d" % (x[0], x[1])
+        if self.get_indexer_finish_done():
+            return
+
+        f = inspect.currentframe().f_back.f_back
+        m = f.f_code.co_filename
+        l = f.f_lineno
+
+        logger.debug("Index in %s called from %s %d" % (self.__class__.__name__, m, l))
+
+        with xia2.Driver.timing.record_step("xia2.index %s" % self._indxr_sweep_name):
+            while not self.get_indexer_finish_done():
+                while not self.get_indexer_done():
+                    while not self.get_indexer_prepare_done():
+
+                        # --------------
+                        # call prepare()
+                        # --------------
+
+                        self.set_indexer_prepare_done(True)
+                        self._index_prepare()
+
+                    # --------------------------------------------
+                    # then do the proper indexing - using the best
+                    # solution already stored if available (c/f
+                    # eliminate above)
+                    # --------------------------------------------
+
+                    self.set_indexer_done(True)
+
+                    if self.get_indexer_sweeps():
+                        xsweeps = [s.get_name() for s in self.get_indexer_sweeps()]
+                        if len(xsweeps) > 1:
+                            # find "SWEEPn, SWEEP(n+1), (..), SWEEPm" and aggregate to "SWEEPS n-m"
+                            xsweeps = [
+                                (int(x[5:]), int(x[5:])) if x.startswith("SWEEP") else x
+                                for x in xsweeps
+                            ]
+                            xsweeps[0] = [xsweeps[0]]
+
+                            def compress(seen, nxt):
+                                if (
+                                    isinstance(seen[-1], tuple)
+                                    and isinstance(nxt, tuple)
+                                    and (seen[-1][1] + 1 == nxt[0])
+                                ):
+                                    seen[-1] = (seen[-1][0], nxt[1])
+                                else:
+                                    seen.append(nxt)
+                                return seen
+
+                            xsweeps = reduce(compress, xsweeps)
+                            xsweeps = [
+                                (
+                                    "SWEEP%d" % x[0]
+                                    if x[0] == x[1]
+                                    else "SWEEPS %d to %d" % (x[0], x[1])
+                                )
+                                if isinstance(x, tuple)
+                                else x
+                                for x in xsweeps
+                            ]
+                        if len(xsweeps) > 1:
+                            sweep_names = ", ".join(xsweeps[:-1])
+                            sweep_names += " & " + xsweeps[-1]
+                        else:
+                            sweep_names = xsweeps[0]
+
+                        if PhilIndex.params.xia2.settings.show_template:
+                            template = self.get_indexer_sweep().get_template()
+                            logger.notice(
+                                banner("Autoindexing %s (%s)", sweep_names, template)
                             )
-                            if isinstance(x, tuple)
-                            else x
-                            for x in xsweeps
-                        ]
-                    if len(xsweeps) > 1:
-                        sweep_names = ", ".join(xsweeps[:-1])
-                        sweep_names += " & " + xsweeps[-1]
-                    else:
-                        sweep_names = xsweeps[0]
+                        else:
+                            logger.notice(banner("Autoindexing %s" % sweep_names))
+
+                    if not self._indxr_helper:
+                        self._index()
+
+                        if not self._indxr_done:
+                            logger.debug("Looks like indexing failed - try again!")
+                            continue
+
+                        solutions = {
+                            k: c["cell"]
+                            for k, c in self._indxr_other_lattice_cell.items()
+                        }
+
+                        # create a helper for the indexer to manage solutions
+                        self._indxr_helper = _IndexerHelper(solutions)
+
+                        solution = self._indxr_helper.get()
+
+                        # compare these against the final solution, if different
+                        # reject solution and return - correct solution will
+                        # be used next cycle
+
+                        if (
+                            self._indxr_lattice != solution[0]
+                            and not self._indxr_input_cell
+                            and not PhilIndex.params.xia2.settings.integrate_p1
+                        ):
+                            logger.info(
+                                "Rerunning indexing lattice %s to %s",
+                                self._indxr_lattice,
+                                solution[0],
+                            )
+                            self.set_indexer_done(False)
 
-                    if PhilIndex.params.xia2.settings.show_template:
-                        template = self.get_indexer_sweep().get_template()
-                        logger.notice(
-                            banner("Autoindexing %s (%s)", sweep_names, template)
-                        )
                     else:
-                        logger.notice(banner("Autoindexing %s" % sweep_names))
-
-                if not self._indxr_helper:
-                    self._index()
-
-                    if not self._indxr_done:
-                        logger.debug("Looks like indexing failed - try again!")
-                        continue
-
-                    solutions = {
-                        k: c["cell"] for k, c in self._indxr_other_lattice_cell.items()
-                    }
-
-                    # create a helper for the indexer to manage solutions
-                    self._indxr_helper = _IndexerHelper(solutions)
-
-                    solution = self._indxr_helper.get()
-
-                    # compare these against the final solution, if different
-                    # reject solution and return - correct solution will
-                    # be used next cycle
-
-                    if (
-                        self._indxr_lattice != solution[0]
-                        and not self._indxr_input_cell
-                        and not PhilIndex.params.xia2.settings.integrate_p1
-                    ):
-                        logger.info(
-                            "Rerunning indexing lattice %s to %s",
-                            self._indxr_lattice,
-                            solution[0],
-                        )
-                        self.set_indexer_done(False)
-
-                else:
-                    # rerun autoindexing with the best known current solution
+                        # rerun autoindexing with the best known current solution
 
-                    solution = self._indxr_helper.get()
-                    self._indxr_input_lattice = solution[0]
-                    self._indxr_input_cell = solution[1]
-                    self._index()
+                        solution = self._indxr_helper.get()
+                        self._indxr_input_lattice = solution[0]
+                        self._indxr_input_cell = solution[1]
+                        self._index()
 
-            # next finish up...
+                # next finish up...
 
-            self.set_indexer_finish_done(True)
-            self._index_finish()
+                self.set_indexer_finish_done(True)
+                self._index_finish()
 
-            if self._indxr_print:
-                logger.info(self.show_indexer_solutions())
+                if self._indxr_print:
+                    logger.info(self.show_indexer_solutions())
 
     def show_indexer_solutions(self):
         lines = ["All possible indexing solutions:"]
@@ -37,6 +37,7 @@ import logging
 import math
 import os
 
+import xia2.Driver.timing
 import xia2.Schema.Interfaces.Indexer
 import xia2.Schema.Interfaces.Refiner
 
@@ -508,66 +509,74 @@ class Integrater(FrameProcessor):
     def integrate(self):
         """Actually perform integration until we think we are done..."""
 
-        while not self.get_integrater_finish_done():
-            while not self.get_integrater_done():
-                while not self.get_integrater_prepare_done():
+        if self.get_integrater_finish_done():
+            return self._intgr_hklout
 
-                    logger.debug("Preparing to do some integration...")
-                    self.set_integrater_prepare_done(True)
+        with xia2.Driver.timing.record_step(
+            "xia2.integrate %s" % self._intgr_sweep_name
+        ):
+            while not self.get_integrater_finish_done():
+                while not self.get_integrater_done():
+                    while not self.get_integrater_prepare_done():
 
-                    # if this raises an exception, perhaps the autoindexing
-                    # solution has too high symmetry. if this the case, then
-                    # perform a self._intgr_indexer.eliminate() - this should
-                    # reset the indexing system
+                        logger.debug("Preparing to do some integration...")
+                        self.set_integrater_prepare_done(True)
 
-                    try:
-                        self._integrate_prepare()
+                        # if this raises an exception, perhaps the autoindexing
+                        # solution has too high symmetry. if this the case, then
+                        # perform a self._intgr_indexer.eliminate() - this should
+                        # reset the indexing system
 
-                    except BadLatticeError as e:
-                        logger.info("Rejecting bad lattice %s", str(e))
-                        self._intgr_refiner.eliminate()
-                        self._integrater_reset()
+                        try:
+                            self._integrate_prepare()
 
-                # FIXME x1698 - may be the case that _integrate() returns the
-                # raw intensities, _integrate_finish() returns intensities
-                # which may have been adjusted or corrected. See #1698 below.
+                        except BadLatticeError as e:
+                            logger.info("Rejecting bad lattice %s", str(e))
+                            self._intgr_refiner.eliminate()
+                            self._integrater_reset()
 
-                logger.debug("Doing some integration...")
+                    # FIXME x1698 - may be the case that _integrate() returns the
+                    # raw intensities, _integrate_finish() returns intensities
+                    # which may have been adjusted or corrected. See #1698 below.
 
-                self.set_integrater_done(True)
+                    logger.debug("Doing some integration...")
 
-                template = self.get_integrater_sweep().get_template()
+                    self.set_integrater_done(True)
 
-                if self._intgr_sweep_name:
-                    if PhilIndex.params.xia2.settings.show_template:
-                        logger.notice(
-                            banner(
-                                "Integrating %s (%s)"
-                                % (self._intgr_sweep_name, template)
+                    template = self.get_integrater_sweep().get_template()
+
+                    if self._intgr_sweep_name:
+                        if PhilIndex.params.xia2.settings.show_template:
+                            logger.notice(
+                                banner(
+                                    "Integrating %s (%s)"
+                                    % (self._intgr_sweep_name, template)
+                                )
                             )
-                        )
-                    else:
-                        logger.notice(banner("Integrating %s" % self._intgr_sweep_name))
-                try:
+                        else:
+                            logger.notice(
+                                banner("Integrating %s" % self._intgr_sweep_name)
+                            )
+                    try:
 
-                    # 1698
-                    self._intgr_hklout_raw = self._integrate()
+                        # 1698
+                        self._intgr_hklout_raw = self._integrate()
+
+                    except BadLatticeError as e:
+                        logger.info("Rejecting bad lattice %s", str(e))
+                        self._intgr_refiner.eliminate()
+                        self._integrater_reset()
+
+                self.set_integrater_finish_done(True)
+                try:
+                    # allow for the fact that postrefinement may be used
+                    # to reject the lattice...
+                    self._intgr_hklout = self._integrate_finish()
 
                 except BadLatticeError as e:
-                    logger.info("Rejecting bad lattice %s", str(e))
+                    logger.info("Bad Lattice Error: %s", str(e))
                     self._intgr_refiner.eliminate()
                     self._integrater_reset()
-
-            self.set_integrater_finish_done(True)
-            try:
-                # allow for the fact that postrefinement may be used
-                # to reject the lattice...
-                self._intgr_hklout = self._integrate_finish()
-
-            except BadLatticeError as e:
-                logger.info("Bad Lattice Error: %s", str(e))
-                self._intgr_refiner.eliminate()
-                self._integrater_reset()
         return self._intgr_hklout
 
     def set_output_format(self, output_format="hkl"):
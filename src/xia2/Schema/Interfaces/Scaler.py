@@ -6,6 +6,7 @@ import logging
 import os
 import pathlib
 
+import xia2.Driver.timing
 from xia2.Handlers.Streams import banner
 
 logger = logging.getLogger("xia2.Schema.Interfaces.Scaler")
@@ -358,22 +359,26 @@ class Scaler:
 
         xname = self._scalr_xcrystal.get_name()
 
-        while not self.get_scaler_finish_done():
-            while not self.get_scaler_done():
-                while not self.get_scaler_prepare_done():
+        if self.get_scaler_finish_done():
+            return self._scalr_result
 
-                    logger.notice(banner("Preparing %s" % xname))
+        with xia2.Driver.timing.record_step("xia2.scale %s" % xname):
+            while not self.get_scaler_finish_done():
+                while not self.get_scaler_done():
+                    while not self.get_scaler_prepare_done():
 
-                    self._scalr_prepare_done = True
-                    self._scale_prepare()
+                        logger.notice(banner("Preparing %s" % xname))
 
-                logger.notice(banner("Scaling %s" % xname))
+                        self._scalr_prepare_done = True
+                        self._scale_prepare()
 
-                self._scalr_done = True
-                self._scalr_result = self._scale()
+                    logger.notice(banner("Scaling %s" % xname))
 
-            self._scalr_finish_done = True
-            self._scale_finish()
+                    self._scalr_done = True
+                    self._scalr_result = self._scale()
+
+                self._scalr_finish_done = True
+                self._scale_finish()
 
         return self._scalr_result
 
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
 import math
+from dataclasses import dataclass
+
+import numpy as np
 
 from scitbx.array_family import flex
 from scitbx.math import distributions
@@ -28,3 +31,104 @@ def npp_ify(values, input_mean_variance=None):
     expected = distribution.quantiles(values.size())
 
     return expected, scaled
+
+
+@dataclass
+class NPPAnalysis:
+    """The normal probability plot gradients of each unique reflection, for
+    all observations and for those within +/- 2 sigma."""
+
+    indices: flex.miller_index
+    i_mean: flex.double
+    variance: flex.double
+    multiplicity: flex.int
+    slope_all: flex.double
+    slope_central: flex.double
+
+    def mean_gradients(self):
+        return flex.mean(self.slope_all), flex.mean(self.slope_central)
+
+
+def _grouped_slopes(group, x, y, n_groups, weights):
+    """The gradient of the linear regression of y on x within each group,
+    or zero where this is not defined."""
+    n = np.bincount(group, weights, minlength=n_groups)
+    sx = np.bincount(group, weights * x, minlength=n_groups)
+    sy = np.bincount(group, weights * y, minlength=n_groups)
+    sxx = np.bincount(group, weights * x * x, minlength=n_groups)
+    sxy = np.bincount(group, weights * x * y, minlength=n_groups)
+    numerator = n * sxy - sx * sy
+    denominator = n * sxx - sx * sx
+    slopes = np.zeros(n_groups)
+    ok = (n > 1) & (denominator != 0)
+    slopes[ok] = numerator[ok] / denominator[ok]
+    return slopes
+
+
+def npp_analysis(intensities, min_multiplicity=3):
+    """Fit the normal probability plot of each unique reflection with at least
+    min_multiplicity observations, where each observation is compared with
+    the weighted mean of its symmetry equivalents.
+
+    The observations are sorted once, by index and then by intensity, so that
+    the fits for all reflections are computed together as grouped sums.
+    """
+
+    # merging: use external variance i.e. variances derived from SIGI column
+    merger = intensities.merge_equivalents(use_internal_variance=False)
+    mult = merger.redundancies().data()
+    imean = merger.array()
+    # scale up variance to account for sqrt(multiplicity) effective scaling
+    variobs = (imean.sigmas() ** 2) * mult.as_double()
+
+    # order the unique reflections and the observations in the same way
+    unique = imean.indices().as_vec3_double().as_numpy_array()
+    unique_order = np.lexsort(unique.T[::-1])
+    hkl = intensities.indices().as_vec3_double().as_numpy_array()
+    data = intensities.data().as_numpy_array()
+    order = np.lexsort((data, *hkl.T[::-1]))
+    hkl = hkl[order]
+    data = data[order]
+
+    new_group = np.any(hkl[1:] != hkl[:-1], axis=1)
+    group = np.concatenate(([0], np.cumsum(new_group)))
+    starts = np.concatenate(([0], np.flatnonzero(new_group) + 1))
+    counts = mult.as_numpy_array()[unique_order]
+    assert len(starts) == len(counts)
+    assert (np.diff(np.append(starts, len(data))) == counts).all()
+
+    mean = imean.data().as_numpy_array()[unique_order]
+    variance = variobs.as_numpy_array()[unique_order]
+    y = (data - mean[group]) / np.sqrt(variance[group])
+
+    # the expected normal quantiles, for each multiplicity
+    distribution = distributions.normal_distribution()
+    m_obs = counts[group]
+    rank = np.arange(len(data)) - starts[group]
+    multiplicities = np.unique(counts[counts >= min_multiplicity])
+    offsets = np.zeros(counts.max() + 1, dtype=np.int64)
+    offsets[multiplicities] = np.concatenate(([0], np.cumsum(multiplicities)[:-1]))
+    quantiles = np.concatenate(
+        [[]] + [distribution.quantiles(int(m)).as_numpy_array() for m in multiplicities]
+    )
+    use = m_obs >= min_multiplicity
+    x = np.zeros(len(data))
+    x[use] = quantiles[offsets[m_obs[use]] + rank[use]]
+
+    # perform linreg on (i) all data and (ii) subset between +/- 2 sigma
+    weights = use.astype(float)
+    slope_all = _grouped_slopes(group, x, y, len(counts), weights)
+    slope_central = _grouped_slopes(group, x, y, len(counts), weights * (np.abs(x) < 2))
+
+    # back into the order of the merged reflections
+    slopes = np.empty((2, len(counts)))
+    slopes[:, unique_order] = (slope_all, slope_central)
+    sel = mult >= min_multiplicity
+    return NPPAnalysis(
+        indices=imean.indices().select(sel),
+        i_mean=imean.data().select(sel),
+        variance=variobs.select(sel),
+        multiplicity=mult.select(sel),
+        slope_all=flex.double(slopes[0]).select(sel),
+        slope_central=flex.double(slopes[1]).select(sel),
+    )
@@ -15,6 +15,8 @@ from cctbx import uctbx
 from dials.util.options import ArgumentParser
 from dials.util.system import CPU_COUNT
 
+from xia2.Modules.MergingStatistics import MergingStatistics
+
 help_message = """
 """
 
@@ -121,24 +123,13 @@ def get_merging_stats(
     d_min=None,
     d_max=None,
 ):
-    i_obs = iotbx.merging_statistics.select_data(
-        scaled_unmerged_mtz, data_labels=data_labels
-    )
-    i_obs = i_obs.customized_copy(anomalous_flag=False, info=i_obs.info())
-    if space_group_info is not None:
-        i_obs = i_obs.customized_copy(
-            space_group_info=space_group_info, info=i_obs.info()
-        )
-    result = iotbx.merging_statistics.dataset_statistics(
-        i_obs=i_obs,
-        n_bins=n_bins,
-        anomalous=anomalous,
+    return MergingStatistics.from_file(
+        scaled_unmerged_mtz,
+        data_labels=data_labels,
+        space_group_info=space_group_info,
         use_internal_variance=use_internal_variance,
         eliminate_sys_absent=eliminate_sys_absent,
-        d_min=d_min,
-        d_max=d_max,
-    )
-    return result
+    ).dataset_statistics(anomalous=anomalous, d_min=d_min, d_max=d_max, n_bins=n_bins)
 
 
 def plot_merging_stats(
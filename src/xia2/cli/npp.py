@@ -4,10 +4,9 @@ import math
 import sys
 
 from iotbx.reflection_file_reader import any_reflection_file
-from scitbx.array_family import flex
 
 import xia2.Handlers.Streams
-from xia2.Toolkit.NPP import npp_ify
+from xia2.Toolkit.NPP import npp_analysis
 
 
 def npp(hklin):
@@ -17,56 +16,25 @@ def npp(hklin):
         for ma in reader.as_miller_arrays(merge_equivalents=False)
         if ma.info().labels == ["I", "SIGI"]
     ][0]
-    indices = intensities.indices()
 
-    # merging: use external variance i.e. variances derived from SIGI column
-    merger = intensities.merge_equivalents(use_internal_variance=False)
-    mult = merger.redundancies().data()
-    imean = merger.array()
-    unique = imean.indices()
-    iobs = imean.data()
-    # scale up variance to account for sqrt(multiplicity) effective scaling
-    variobs = (imean.sigmas() ** 2) * mult.as_double()
-
-    all = flex.double()
-    cen = flex.double()
-
-    for hkl, i, v, m in zip(unique, iobs, variobs, mult):
-
-        # only consider if meaningful number of observations
-        if m < 3:
-            continue
-
-        sel = indices == hkl
-        data = intensities.select(sel).data()
-
-        assert m == len(data)
-
-        _x, _y = npp_ify(data, input_mean_variance=(i, v))
-
-        # perform linreg on (i) all data and (ii) subset between +/- 2 sigma
-
-        sel = flex.abs(_x) < 2
-        _x_ = _x.select(sel)
-        _y_ = _y.select(sel)
-
-        fit_all = flex.linear_regression(_x, _y)
-        fit_cen = flex.linear_regression(_x_, _y_)
-
-        all.append(fit_all.slope())
-        cen.append(fit_cen.slope())
+    result = npp_analysis(intensities)
 
+    for hkl, i, v, m, slope_all, slope_cen in zip(
+        result.indices,
+        result.i_mean,
+        result.variance,
+        result.multiplicity,
+        result.slope_all,
+        result.slope_central,
+    ):
         print(
             "%3d %3d %3d" % hkl,
             f"{i:.2f} {v:.2f} {i / math.sqrt(v):.2f}",
-            f"{fit_all.slope():.2f} {fit_cen.slope():.2f}",
+            f"{slope_all:.2f} {slope_cen:.2f}",
             "%d" % m,
         )
 
-    sys.stderr.write(
-        "Mean gradients: %.2f %.2f\n"
-        % (flex.sum(all) / all.size(), flex.sum(cen) / cen.size())
-    )
+    sys.stderr.write("Mean gradients: %.2f %.2f\n" % result.mean_gradients())
 
 
 def run():
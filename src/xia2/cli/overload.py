@@ -5,10 +5,11 @@ import sys
 import timeit
 from collections import Counter
 
+import numpy as np
+
 import iotbx.phil
 from dials.util.options import ArgumentParser, flatten_experiments
 from libtbx import easy_mp
-from scitbx.array_family import flex
 
 help_message = """
 
@@ -55,12 +56,67 @@ def run(args=None):
     build_hist(experiments, params)
 
 
+class PixelHistogram:
+    """A histogram of integer pixel values.
+
+    The counts of values in [0, dense_size) are held in an array, and those of
+    any other values in a Counter, so that the rare large or negative values
+    do not need a slot for every value in between. If histmax is set, only
+    values in [0, histmax] are counted."""
+
+    def __init__(self, histmax=None, dense_size=65536):
+        self.histmax = histmax
+        self.dense = np.zeros(dense_size, dtype=np.int64)
+        self.sparse = Counter()
+
+    def add(self, data):
+        data = data.ravel()
+        if self.histmax is not None:
+            data = data[(data >= 0) & (data <= self.histmax)]
+        if data.dtype.kind not in "iu":
+            # non-integer pixel values, as in flex.histogram
+            if self.histmax is not None:
+                n_slots = int(self.histmax) + 1
+                data = np.minimum(
+                    np.floor(data * (n_slots / self.histmax)), n_slots - 1
+                ).astype(np.int64)
+            else:
+                self._add_sparse(data)
+                return
+        in_dense = (data >= 0) & (data < self.dense.size)
+        self.dense += np.bincount(data[in_dense], minlength=self.dense.size)
+        if not in_dense.all():
+            self._add_sparse(data[~in_dense])
+
+    def _add_sparse(self, data):
+        values, counts = np.unique(data, return_counts=True)
+        self.sparse.update(dict(zip(values.tolist(), counts.tolist())))
+
+    def update(self, other):
+        self.dense += other.dense
+        self.sparse.update(other.sparse)
+
+    def counts(self):
+        """The non-zero counts, as a dictionary of value: count."""
+        (values,) = np.nonzero(self.dense)
+        counts = dict(zip(values.tolist(), self.dense[values].tolist()))
+        counts.update(self.sparse)
+        return counts
+
+
+def merge_histograms(histograms):
+    """Merge a list of histograms pairwise, in a balanced tree."""
+    while len(histograms) > 1:
+        for a, b in zip(histograms[::2], histograms[1::2]):
+            a.update(b)
+        histograms = histograms[::2]
+    return histograms[0]
+
+
 def build_hist(experiment_list, params):
     """Iterate through the images in experiment_list and generate a pixel
     histogram, which is written to params.output.filename."""
 
-    nproc = params.nproc
-
     for experiment in experiment_list:
         imageset = experiment.imageset
         limit = experiment.detector[0].get_trusted_range()[1]
@@ -70,75 +126,44 @@ def build_hist(experiment_list, params):
         binfactor = 5  # register up to 500% counts
         histmax = (limit * binfactor) + 0.0
         histbins = int(limit * binfactor) + 1
-        use_python_counter = histbins > 90000000  # empirically determined
-
-        print(
-            "Processing %d images in %d processes using %s\n"
-            % (
-                image_count,
-                nproc,
-                "python Counter" if use_python_counter else "flex arrays",
-            )
-        )
+        # beyond this, count every pixel value rather than only [0, histmax]
+        count_all_values = histbins > 90000000
+
+        n_processes = max(1, min(params.nproc, image_count))
+        print("Processing %d images in %d processes\n" % (image_count, n_processes))
 
         def process_image(process):
+            # each process reads a contiguous block of images, so that
+            # consecutive reads share the same file chunks
+            first = process * image_count // n_processes
+            last = (process + 1) * image_count // n_processes
             last_update = start = timeit.default_timer()
 
-            i = process
-            if use_python_counter:
-                local_hist = Counter()
-            else:
-                local_hist = flex.histogram(
-                    flex.double(), data_min=0.0, data_max=histmax, n_slots=histbins
-                )
-
-            max_images = image_count // nproc
-            if process >= image_count % nproc:
-                max_images += 1
-            while i < image_count:
-                data = imageset.get_raw_data(i)[0]
-                if not use_python_counter:
-                    data = flex.histogram(
-                        data.as_double().as_1d(),
-                        data_min=0.0,
-                        data_max=histmax,
-                        n_slots=histbins,
-                    )
-                local_hist.update(data)
-                i = i + nproc
-            if process == 0:
+            local_hist = PixelHistogram(None if count_all_values else histmax)
+            for i in range(first, last):
+                local_hist.add(imageset.get_raw_data(i)[0].as_numpy_array())
                 if timeit.default_timer() > (last_update + 3):
                     last_update = timeit.default_timer()
-                    if sys.stdout.isatty():
-                        sys.stdout.write("\033[A")
+                    done = i - first + 1
                     print(
-                        "Processed %d%% (%d seconds remain)    "
+                        "Process %d: processed %d%% (%d seconds remain)"
                         % (
-                            100 * i // image_count,
-                            round((image_count - i) * (last_update - start) / (i + 1)),
+                            process,
+                            100 * done // (last - first),
+                            round((last - first - done) * (last_update - start) / done),
                         )
                     )
             return local_hist
 
         results = easy_mp.parallel_map(
             func=process_image,
-            iterable=range(nproc),
-            processes=nproc,
+            iterable=range(n_processes),
+            processes=n_processes,
             preserve_exception_message=True,
         )
 
         print("Merging results")
-        result_hist = None
-        for hist in results:
-            if result_hist is None:
-                result_hist = hist
-            else:
-                result_hist.update(hist)
-
-        if not use_python_counter:
-            # reformat histogram into dictionary
-            result = list(result_hist.slots())
-            result_hist = {b: count for b, count in enumerate(result) if count > 0}
+        result_hist = merge_histograms(list(results)).counts()
 
         results = {
             "scale_factor": 1 / limit,
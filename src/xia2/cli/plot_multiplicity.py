@@ -11,6 +11,39 @@ from iotbx.reflection_file_reader import any_reflection_file
 from scitbx.array_family import flex
 
 
+class MultiplicityScene(scene):
+    """
+    A scene of the merged multiplicities of an unmerged miller array.
+
+    The merged and expanded array of an existing scene of the same data may
+    be reused, so that slicing the data along each axis in turn need only
+    merge and expand the data once.
+    """
+
+    _input_attributes = (
+        "missing_set",
+        "filtered_array",
+        "r_free_mode",
+        "data",
+        "work_array",
+        "multiplicities",
+    )
+
+    def __init__(self, miller_array, settings, input_scene=None):
+        self._input = input_scene._input if input_scene is not None else None
+        super().__init__(miller_array, settings, merge=True)
+
+    def process_input_array(self):
+        if self._input is None:
+            super().process_input_array()
+            self._input = {name: getattr(self, name) for name in self._input_attributes}
+            self._input["data"] = self.data.deep_copy()
+        else:
+            for name, value in self._input.items():
+                setattr(self, name, value)
+            self.data = self.data.deep_copy()
+
+
 class MultiplicityViewPng(render_2d):
     def __init__(self, scene, settings=None):
         import matplotlib
@@ -355,19 +388,26 @@ def run(args=sys.argv[1:]):
     plot_multiplicity(miller_array, settings)
 
 
-def plot_multiplicity(miller_array, settings):
+def plot_multiplicity(miller_array, settings, input_scene=None):
+    """
+    Plot the multiplicities of a slice of the data, returning the scene that
+    was plotted. This may be passed as the input_scene to plot another slice
+    of the same data without merging the data again.
+    """
     settings.scale_colors_multiplicity = True
     settings.scale_radii_multiplicity = True
     settings.expand_to_p1 = True
     settings.expand_anomalous = True
     settings.slice_mode = True
 
+    multiplicity_scene = MultiplicityScene(
+        miller_array, settings, input_scene=input_scene
+    )
+
     if settings.plot.filename is not None:
-        MultiplicityViewPng(
-            scene(miller_array, settings, merge=True), settings=settings
-        )
+        MultiplicityViewPng(multiplicity_scene, settings=settings)
 
     if settings.json.filename is not None:
-        MultiplicityViewJson(
-            scene(miller_array, settings, merge=True), settings=settings
-        )
+        MultiplicityViewJson(multiplicity_scene, settings=settings)
+
+    return multiplicity_scene
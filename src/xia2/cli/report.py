@@ -53,15 +53,28 @@ def run(args):
 
     report = Report.from_unmerged_mtz(unmerged_mtz, params, report_dir=".")
 
+    sections = {}
+    if params.xtriage_analysis:
+        sections["xtriage"] = ("xtriage_report", {})
+    sections.update(
+        {
+            "resolution": ("resolution_plots_and_stats", {}),
+            "batch": ("batch_dependent_plots", {}),
+            "intensity": ("intensity_stats_plots", {"run_xtriage": False}),
+            "pychef": ("pychef_plots", {}),
+            "multiplicity": ("multiplicity_plots", {}),
+        }
+    )
+    results = report.compute_sections(
+        sections, nproc=params.nproc, time_budget=params.time_budget
+    )
+
     # xtriage
     xtriage_success, xtriage_warnings, xtriage_danger = None, None, None
-    if params.xtriage_analysis:
-        try:
-            xtriage_success, xtriage_warnings, xtriage_danger = report.xtriage_report()
-        except Exception as e:
-            params.xtriage_analysis = False
-            print("Exception runnning xtriage:")
-            print(e)
+    if "xtriage" in results:
+        xtriage_success, xtriage_warnings, xtriage_danger = results["xtriage"]
+    else:
+        params.xtriage_analysis = False
 
     json_data = {}
 
@@ -72,12 +85,12 @@ def run(args):
         overall_stats_table,
         merging_stats_table,
         stats_plots,
-    ) = report.resolution_plots_and_stats()
+    ) = results["resolution"]
 
     json_data.update(stats_plots)
-    json_data.update(report.batch_dependent_plots())
-    json_data.update(report.intensity_stats_plots(run_xtriage=False))
-    json_data.update(report.pychef_plots())
+    json_data.update(results["batch"])
+    json_data.update(results["intensity"])
+    json_data.update(results["pychef"])
 
     resolution_graphs = OrderedDict(
         (k, json_data[k])
@@ -116,7 +129,7 @@ def run(args):
         if k in json_data
     )
 
-    for k, v in report.multiplicity_plots().items():
+    for k, v in results.get("multiplicity", {}).items():
         misc_graphs[k] = {"img": v}
 
     styles = {}
@@ -66,6 +66,7 @@ def run(args=sys.argv[1:]):
     try:
         with cleanup(cwd):
             run_xia2_ssx(cwd, params)
+        xia2.Driver.timing.write_chrome_trace(cwd / "xia2.ssx-timing.json")
     except ValueError as e:
         xia2_logger.info(f"Error: {e}")
         sys.exit(0)
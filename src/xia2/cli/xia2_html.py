@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import concurrent.futures
+import copy
 import glob
 import html
 import json
@@ -17,11 +19,54 @@ from libtbx import phil
 import xia2
 import xia2.Handlers.Streams
 from xia2.Handlers.Citations import Citations
+from xia2.Handlers.Files import FileHandler
 from xia2.Handlers.Phil import PhilIndex
-from xia2.Modules.Report import Report
+from xia2.Modules.Report import Report, report_nproc
 
 logger = logging.getLogger("xia2.cli.html")
 
+# the maximum number of points of the batch and dose dependent plots
+max_points = 500
+
+
+def _wavelength_report(unmerged_mtz, params, report_dir, nproc):
+    """
+    Compute the report of a wavelength from its scaled, unmerged MTZ file.
+    This is independent of the other wavelengths, so that the reports of
+    several wavelengths may be computed in parallel processes.
+
+    Returns:
+        The results of the report sections, the merging statistics, the
+        anomalous merging statistics and the unit cell of the wavelength.
+    """
+    report = Report.from_unmerged_mtz(unmerged_mtz, params, report_dir=report_dir)
+
+    sections = {}
+    if params.xtriage_analysis:
+        sections["xtriage"] = ("xtriage_report", {})
+    sections.update(
+        {
+            "resolution": ("resolution_plots_and_stats", {}),
+            "batch": ("batch_dependent_plots", {"max_points": max_points}),
+            "intensity": ("intensity_stats_plots", {"run_xtriage": False}),
+            # the statistics in a single resolution bin, which are those
+            # plotted against dose
+            "pychef": ("pychef_plots", {"n_bins": 1, "max_points": max_points}),
+            "multiplicity": ("multiplicity_plots", {}),
+        }
+    )
+    results = report.compute_sections(
+        sections, nproc=nproc, time_budget=params.time_budget
+    )
+    # a log file recorded in a worker process is lost, so the caller records
+    # the xtriage log
+    return (
+        results,
+        report.merging_stats,
+        report.merging_stats_anom,
+        str(report.intensities.unit_cell()),
+    )
+
 
 def generate_xia2_html(xinfo, filename="xia2.html", params=None, args=[]):
     assert params is None or len(args) == 0
@@ -61,11 +106,20 @@ def generate_xia2_html(xinfo, filename="xia2.html", params=None, args=[]):
 
     individual_dataset_reports = {}
 
+    # the reports of the wavelengths are computed in parallel, each with the
+    # batches of the sweeps recorded up to and including its own crystal
+    nproc = report_nproc(params.nproc)
+    n_workers = min(
+        nproc,
+        sum(
+            len(xcryst.get_scaled_merged_reflections()["mtz_unmerged"])
+            for xcryst in xinfo.get_crystals().values()
+        ),
+    )
+    tasks = []
     for cname, xcryst in xinfo.get_crystals().items():
         reflection_files = xcryst.get_scaled_merged_reflections()
         for wname, unmerged_mtz in reflection_files["mtz_unmerged"].items():
-            xwav = xcryst.get_xwavelength(wname)
-
             from xia2.Modules.MultiCrystalAnalysis import batch_phil_scope
 
             scope = phil.parse(batch_phil_scope)
@@ -83,30 +137,45 @@ def generate_xia2_html(xinfo, filename="xia2.html", params=None, args=[]):
                     batch_params.range = si.get_batch_range()
                     params.batch.append(batch_params)
 
+            # concurrent wavelengths of a crystal write their files (the
+            # xtriage log and multiplicity plots) to separate directories
             report_path = xinfo.path.joinpath(cname, "report")
+            if n_workers > 1 and len(reflection_files["mtz_unmerged"]) > 1:
+                report_path = report_path.joinpath(wname)
             report_path.mkdir(parents=True, exist_ok=True)
-            report = Report.from_unmerged_mtz(
-                unmerged_mtz, params, report_dir=str(report_path)
-            )
+            tasks.append((unmerged_mtz, copy.deepcopy(params), str(report_path)))
+
+    if n_workers > 1:
+        nproc_per_wavelength = max(1, nproc // n_workers)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [
+                pool.submit(_wavelength_report, *task, nproc_per_wavelength)
+                for task in tasks
+            ]
+            reports = [future.result() for future in futures]
+    else:
+        reports = [_wavelength_report(*task, nproc=nproc) for task in tasks]
+    reports = iter(zip(tasks, reports))
+
+    for cname, xcryst in xinfo.get_crystals().items():
+        reflection_files = xcryst.get_scaled_merged_reflections()
+        for wname, unmerged_mtz in reflection_files["mtz_unmerged"].items():
+            xwav = xcryst.get_xwavelength(wname)
+            (_, _, report_dir), wavelength_report = next(reports)
+            results, merging_stats, merging_stats_anom, unit_cell = wavelength_report
 
             xtriage_success, xtriage_warnings, xtriage_danger = None, None, None
-            if params.xtriage_analysis:
-                try:
-                    (
-                        xtriage_success,
-                        xtriage_warnings,
-                        xtriage_danger,
-                    ) = report.xtriage_report()
-                except Exception as e:
-                    params.xtriage_analysis = False
-                    logger.debug("Exception running xtriage:")
-                    logger.debug(e, exc_info=True)
+            if "xtriage" in results:
+                xtriage_success, xtriage_warnings, xtriage_danger = results["xtriage"]
+                FileHandler.record_log_file(
+                    "Xtriage", os.path.join(report_dir, "xtriage.log")
+                )
 
             (
                 overall_stats_table,
                 merging_stats_table,
                 stats_plots,
-            ) = report.resolution_plots_and_stats()
+            ) = results["resolution"]
 
             d = {}
             d["merging_statistics_table"] = merging_stats_table
@@ -116,35 +185,15 @@ def generate_xia2_html(xinfo, filename="xia2.html", params=None, args=[]):
 
             json_data = {}
 
-            if params.xtriage_analysis:
+            if "xtriage" in results:
                 json_data["xtriage"] = (
                     xtriage_success + xtriage_warnings + xtriage_danger
                 )
 
             json_data.update(stats_plots)
-            json_data.update(report.batch_dependent_plots())
-            json_data.update(report.intensity_stats_plots(run_xtriage=False))
-            json_data.update(report.pychef_plots())
-            json_data.update(report.pychef_plots(n_bins=1))
-
-            from scitbx.array_family import flex
-
-            max_points = 500
-            for g in (
-                "scale_rmerge_vs_batch",
-                "completeness_vs_dose",
-                "rcp_vs_dose",
-                "scp_vs_dose",
-                "rd_vs_batch_difference",
-            ):
-                for i, data in enumerate(json_data[g]["data"]):
-                    x = data["x"]
-                    n = len(x)
-                    if n > max_points:
-                        step = n // max_points
-                        sel = (flex.int_range(n) % step) == 0
-                        data["x"] = list(flex.int(data["x"]).select(sel))
-                        data["y"] = list(flex.double(data["y"]).select(sel))
+            json_data.update(results["batch"])
+            json_data.update(results["intensity"])
+            json_data.update(results["pychef"])
 
             resolution_graphs = OrderedDict(
                 (k + "_" + wname, json_data[k])
@@ -187,7 +236,7 @@ def generate_xia2_html(xinfo, filename="xia2.html", params=None, args=[]):
                 if k in json_data
             )
 
-            for k, v in report.multiplicity_plots().items():
+            for k, v in results.get("multiplicity", {}).items():
                 misc_graphs[k + "_" + wname] = {"img": v}
 
             d["resolution_graphs"] = resolution_graphs
@@ -218,9 +267,6 @@ def generate_xia2_html(xinfo, filename="xia2.html", params=None, args=[]):
                 data = make_dano_plots(anom_data)
                 d["resolution_graphs"]["dano_" + wname] = data["dF"]["dano"]
 
-            merging_stats = report.merging_stats
-            merging_stats_anom = report.merging_stats_anom
-
             overall = merging_stats.overall
             overall_anom = merging_stats_anom.overall
             outer_shell = merging_stats.bins[-1]
@@ -259,7 +305,6 @@ def generate_xia2_html(xinfo, filename="xia2.html", params=None, args=[]):
     ]
     space_group = space_groups[0].symbol_and_number()
     alternative_space_groups = [sg.symbol_and_number() for sg in space_groups[1:]]
-    unit_cell = str(report.intensities.unit_cell())
 
     # reflection files
 
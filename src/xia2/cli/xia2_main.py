@@ -331,6 +331,7 @@ def run():
         xia2_main()
         logger.debug("\nTiming report:")
         logger.debug("\n".join(xia2.Driver.timing.report()))
+        xia2.Driver.timing.write_chrome_trace(os.path.join(wd, "xia2-timing.json"))
         logger.info("Status: normal termination")
         return
     except Sorry as s:
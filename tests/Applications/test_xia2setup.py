@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import os
 import subprocess
+import time
 
 import pytest
 
@@ -98,3 +99,39 @@ def test_write_xinfo_unroll(dials_data, tmp_path):
     assert x.get_crystals()["DEFAULT"]["sweeps"]["SWEEP1"]["start_end"] == [1, 15]
     assert x.get_crystals()["DEFAULT"]["sweeps"]["SWEEP2"]["start_end"] == [16, 30]
     assert x.get_crystals()["DEFAULT"]["sweeps"]["SWEEP3"]["start_end"] == [31, 45]
+
+
+def test_rummage_caches_directory_contents(tmp_path, monkeypatch):
+    from xia2.Applications import xia2setup
+
+    data = tmp_path / "data"
+    (data / "sub").mkdir(parents=True)
+    for j in range(1, 6):
+        (data / f"lyso_1_{j:04d}.cbf").touch()
+        (data / "sub" / f"thau_2_{j:03d}.img").touch()
+    (data / "notes.log.1").touch()
+    old = time.time() - 60
+    os.utime(data, (old, old))
+    os.utime(data / "sub", (old, old))
+
+    monkeypatch.setattr(xia2setup, "_get_sweeps", lambda templates: templates)
+    cache_file = tmp_path / "directory_scan.json"
+    expected = {
+        str(data / "lyso_1_####.cbf"),
+        str(data / "sub" / "thau_2_###.img"),
+    }
+    assert xia2setup._rummage([str(data)], cache_file=str(cache_file)) == expected
+    assert cache_file.is_file()
+
+    # a rerun uses the cached contents, unless a directory has changed
+    def fail(directory):
+        raise AssertionError(f"{directory} scanned again")
+
+    with monkeypatch.context() as m:
+        m.setattr(xia2setup, "_scan_directory", fail)
+        assert xia2setup._rummage([str(data)], cache_file=str(cache_file)) == expected
+
+    (data / "sub" / "thau_2_006.img").touch()
+    os.utime(data / "sub", (old + 1, old + 1))
+    (data / "lyso_1_0001.cbf").unlink()
+    assert xia2setup._rummage([str(data)], cache_file=str(cache_file)) == expected
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import os
+import sys
+
+import pytest
+
+from xia2.Driver.AsyncDriver import AsyncDriver
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="uses a POSIX shell")
+
+
+def test_async_driver_input_and_output(tmp_path):
+    driver = AsyncDriver()
+    driver.set_executable("cat")
+    driver.set_working_directory(os.fspath(tmp_path))
+    driver.write_log_file(tmp_path / "cat.log")
+    driver.start()
+    for i in range(5):
+        driver.input(f"line {i}")
+    driver.close_wait()
+    assert driver.get_all_output() == [f"line {i}\n" for i in range(5)]
+    assert (tmp_path / "cat.log").read_text().startswith("line 0\nline 1\n")
+    assert driver.status() == 0
+
+
+def test_async_driver_concurrent_programs(tmp_path):
+    # start several programs which produce more output than a pipe can buffer
+    # before waiting for any of them to finish.
+    drivers = []
+    for i in range(4):
+        driver = AsyncDriver()
+        driver.set_executable(sys.executable)
+        driver.set_working_directory(os.fspath(tmp_path))
+        driver.add_command_line(["-c", f"for j in range(20000): print({i}, j)"])
+        driver.start()
+        drivers.append(driver)
+    for i, driver in enumerate(drivers):
+        driver.close_wait()
+        output = driver.get_all_output()
+        assert len(output) == 20000
+        assert output[0] == f"{i} 0\n"
+        assert output[-1] == f"{i} 19999\n"
+
+
+def test_async_driver_return_code(tmp_path):
+    driver = AsyncDriver()
+    driver.set_executable(sys.executable)
+    driver.set_working_directory(os.fspath(tmp_path))
+    driver.add_command_line(["-c", 'import sys; print("partial", end=""); sys.exit(3)'])
+    driver.start()
+    driver.close_wait()
+    assert driver.get_all_output() == ["partial"]
+    with pytest.raises(RuntimeError, match="exitcode 3"):
+        driver.check_for_errors()
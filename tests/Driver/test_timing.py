@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 import re
 
 import xia2.Driver.timing
@@ -265,3 +266,41 @@ def test_timing_visualisation():
 
     # thinking time should appear in the tree
     assert re.search("^13.* T[0-9] .*xia2 thinking time.*$", tree, re.MULTILINE)
+
+
+def test_nested_steps_as_chrome_trace(tmp_path):
+    xia2.Driver.timing.reset()
+    with xia2.Driver.timing.record_step("xia2.scale DEFAULT"):
+        with xia2.Driver.timing.record_step("xia2.integrate SWEEP1"):
+            sum(range(100000))
+            xia2.Driver.timing.record(
+                {"command": "dials.integrate 'x.expt'", "time_start": 1, "time_end": 1}
+            )
+    program, sweep, stage = xia2.Driver.timing._timing_db
+    assert stage["parent"] is None
+    assert sweep["parent"] == stage["id"]
+    assert program["parent"] == sweep["id"]
+    assert sweep["resources"]["cpu_time"] >= 0
+
+    # programs running at the same time are shown on separate tracks
+    concurrent = [
+        {"command": "a", "time_start": 0, "time_end": 2},
+        {"command": "b", "time_start": 1, "time_end": 3},
+        {"command": "c", "time_start": 1.5, "time_end": 1.8},
+    ]
+    trace = xia2.Driver.timing.chrome_trace(concurrent)
+    events = {e["name"]: e for e in trace["traceEvents"]}
+    assert events["a"]["tid"] != events["b"]["tid"]
+    assert events["c"]["tid"] == events["a"]["tid"]
+    assert events["b"]["ts"] == 1000000
+    assert events["b"]["dur"] == 2000000
+
+    trace_file = tmp_path / "xia2-timing.json"
+    xia2.Driver.timing.write_chrome_trace(trace_file)
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    assert {e["name"] for e in events} == {
+        "xia2.scale",
+        "xia2.integrate",
+        "dials.integrate",
+    }
+    xia2.Driver.timing.reset()
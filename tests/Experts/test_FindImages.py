@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import pytest
+
+from xia2.Experts.FindImages import group_by_template, template_regex
+
+
+def test_group_by_template_matches_template_regex():
+    filenames = [
+        "foo_bar_001.img",
+        "foo_bar_002.img",
+        "foo_bar001.img",
+        "foo_bar_1.8A_001.img",
+        "foo_bar.001",
+        "foo_bar_001.img1000",
+        "foo_bar_00001.img",
+        "image_000123.cbf.gz",
+        "README",
+        "x.y",
+    ]
+    groups, unrecognised = group_by_template(filenames)
+    assert groups["foo_bar_###.img"] == ["foo_bar_001.img", "foo_bar_002.img"]
+    assert unrecognised == ["README", "x.y"]
+    for template, names in groups.items():
+        for name in names:
+            assert template_regex(name)[0] == template
+    for name in unrecognised:
+        with pytest.raises(RuntimeError):
+            template_regex(name)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import pytest
+
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+
+from xia2.Modules.MultiCrystal import ClusterStatistics, multi_crystal_analysis
+
+
+def test_cluster_statistics():
+    flex.set_random_seed(0)
+    intensities = []
+    for i in range(6):
+        cs = crystal.symmetry(
+            unit_cell=(40 + i, 50, 60, 90, 90, 90), space_group_symbol="P 21 21 21"
+        )
+        ms = miller.build_set(cs, anomalous_flag=True, d_min=3 + 0.1 * i)
+        indices = ms.indices().select(flex.random_double(ms.size()) < 0.3)
+        indices.extend(indices.select(flex.random_double(indices.size()) < 0.5))
+        # symmetry equivalents outside the asu
+        indices.extend(flex.miller_index([(-h, k, l) for h, k, l in indices[:20]]))
+        data = flex.random_double(indices.size()) * 100 + 1
+        intensities.append(
+            miller.array(
+                miller.set(cs, indices, anomalous_flag=True),
+                data=data,
+                sigmas=flex.sqrt(data),
+            )
+        )
+    intensities_all = intensities[0]
+    labels_all = flex.size_t(intensities[0].size(), 0)
+    for i, array in enumerate(intensities[1:], start=1):
+        intensities_all = intensities_all.concatenate(
+            array, assert_is_similar_symmetry=False
+        )
+        labels_all.extend(flex.size_t(array.size(), i))
+
+    linkage_matrix = [
+        [0, 1, 0.1, 2],
+        [2, 3, 0.2, 2],
+        [4, 6, 0.3, 3],
+        [7, 8, 0.4, 5],
+        [5, 9, 0.5, 6],
+    ]
+    cluster_dict = multi_crystal_analysis.linkage_matrix_to_dict(linkage_matrix)
+    statistics = ClusterStatistics(
+        intensities_all, labels_all, [i.unit_cell() for i in intensities]
+    ).for_clusters(cluster_dict)
+
+    # compare with merging the intensities of each cluster
+    for cluster_id, cluster in cluster_dict.items():
+        sel = flex.bool(labels_all.size(), False)
+        for j in cluster["datasets"]:
+            sel |= labels_all == j - 1
+        merging = intensities_all.select(sel).merge_equivalents()
+        multiplicity, completeness, unit_cell = statistics[cluster_id]
+        assert multiplicity == pytest.approx(
+            flex.mean(merging.redundancies().data().as_double())
+        )
+        assert completeness == pytest.approx(merging.array().completeness())
+        assert unit_cell[0] == pytest.approx(
+            flex.mean(flex.double([39 + j for j in cluster["datasets"]]))
+        )
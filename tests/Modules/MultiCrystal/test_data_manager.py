@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from dials.array_family import flex
+from dials.command_line.slice_sequence import slice_reflections
+
+from xia2.Modules.MultiCrystal.data_manager import (
+    ReflectionsById,
+    reflection_counts_by_identifier,
+)
+
+
+@pytest.fixture
+def reflections():
+    flex.set_random_seed(0)
+    n = 1000
+    refl = flex.reflection_table()
+    refl["id"] = flex.int(list((flex.random_double(n) * 6).iround() - 1))
+    refl["xyzobs.px.value"] = flex.vec3_double(
+        flex.random_double(n), flex.random_double(n), flex.random_double(n) * 20
+    )
+    for i in range(6):
+        refl.experiment_identifiers()[i] = str(i)
+    return refl
+
+
+def test_reflections_by_id(reflections):
+    by_id = ReflectionsById(reflections, n_ids=7)
+    tables = by_id.tables()
+    assert len(tables) == 7
+    for i, table in enumerate(tables):
+        expected = reflections.select(reflections["id"] == i)
+        assert list(table["id"]) == list(expected["id"])
+        assert list(table["xyzobs.px.value"]) == list(expected["xyzobs.px.value"])
+
+    selected = by_id.select_on_experiment_identifiers(["1", "4"])
+    expected = reflections.select_on_experiment_identifiers(["1", "4"])
+    assert list(selected["xyzobs.px.value"]) == list(expected["xyzobs.px.value"])
+    assert dict(selected.experiment_identifiers()) == {1: "1", 4: "4"}
+    with pytest.raises(KeyError):
+        by_id.select_on_experiment_identifiers(["1", "7"])
+
+    image_ranges = [(1, 10), None, (5, 20), (2, 3), (1, 20), (1, 20)]
+    sliced = by_id.slice_images(image_ranges)
+    expected = slice_reflections(reflections, image_ranges)
+    assert sorted(sliced["xyzobs.px.value"]) == sorted(expected["xyzobs.px.value"])
+
+
+def test_reflection_counts_by_identifier(reflections):
+    reflections.experiment_identifiers()[6] = "6"
+    selection = flex.random_double(reflections.size()) < 0.5
+    counts = reflection_counts_by_identifier(reflections, selection)
+    assert list(counts) == [str(i) for i in range(7)]
+    for i in range(7):
+        assert counts[str(i)] == (selection & (reflections["id"] == i)).count(True)
+    counts = reflection_counts_by_identifier(reflections)
+    assert counts["1"] == (reflections["id"] == 1).count(True)
+    assert counts["6"] == 0
+
+
+def synthetic_table(n_experiments, n_per_experiment=200):
+    flex.set_random_seed(0)
+    n = n_experiments * n_per_experiment
+    refl = flex.reflection_table()
+    refl["id"] = (flex.random_double(n) * (n_experiments - 1)).iround()
+    refl.set_flags(flex.random_double(n) < 0.01, refl.flags.used_in_refinement)
+    for i in range(n_experiments):
+        refl.experiment_identifiers()[i] = str(i)
+    return refl
+
+
+def test_reflection_counts_by_identifier_benchmark(run_benchmarks):
+    # Counting the flagged reflections of each experiment should cost time
+    # proportional to the size of the table, not the number of experiments
+    # times the size of the table.
+    for n_experiments in (500, 5000):
+        refl = synthetic_table(n_experiments)
+        flags = refl.get_flags(refl.flags.used_in_refinement)
+        t0 = time.perf_counter()
+        counts = reflection_counts_by_identifier(refl, flags)
+        print(f"{n_experiments} experiments: {time.perf_counter() - t0:.3f} s")
+        assert sum(counts.values()) == flags.count(True)
+
+
+def test_data_manager_view(reflections):
+    from cctbx import sgtbx
+    from dxtbx.model import Crystal, Experiment, ExperimentList, Scan
+
+    from xia2.Modules.MultiCrystal.data_manager import DataManager
+
+    reflections = reflections.select(reflections["id"] >= 0)
+    reflections["miller_index"] = flex.miller_index(reflections.size(), (1, 2, 3))
+    reflections["d"] = flex.random_double(reflections.size()) * 3
+    experiments = ExperimentList()
+    for i in range(6):
+        experiments.append(
+            Experiment(
+                crystal=Crystal((10, 0, 0), (0, 11, 0), (0, 0, 12), "P 1"),
+                scan=Scan((1, 20), (0, 1)),
+                identifier=str(i),
+            )
+        )
+    data_manager = DataManager(experiments, reflections)
+
+    view = data_manager.view(["4", "1", "2"], d_min=1.0)
+    assert view.batch_offset_list == [
+        data_manager.batch_offset_list[i] for i in (1, 2, 4)
+    ]
+    view.select(["1", "4"])
+    cb_op = sgtbx.change_of_basis_op("-h,-k,l")
+    view.reindex(cb_op)
+    # nothing has been copied from the parent yet, other than the experiments
+    assert view._view_reflections is None
+    assert list(view.experiments.identifiers()) == ["1", "4"]
+    assert data_manager.experiments[1].crystal.get_A() != (
+        view.experiments[0].crystal.get_A()
+    )
+
+    expected = DataManager(experiments, reflections)
+    expected.select(["1", "4"])
+    expected.reindex(cb_op)
+    expected.reflections = expected.reflections.select(expected.reflections["d"] >= 1.0)
+    assert list(view.reflections["miller_index"]) == list(
+        expected.reflections["miller_index"]
+    )
+    assert set(view.reflections["miller_index"]) == {(-1, -2, 3)}
+    assert dict(view.reflections.experiment_identifiers()) == {0: "1", 1: "4"}
+    # the parent is unchanged
+    assert set(data_manager.reflections["miller_index"]) == {(1, 2, 3)}
+    assert data_manager.reflections.size() == reflections.size()
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import pathlib
+from dataclasses import dataclass
+from typing import Optional
+
+from xia2.Modules.SSX.batch_manifest import BatchManifest
+
+
+@dataclass
+class StepParams:
+    d_min: Optional[float] = None
+    nproc: int = 1
+    phil: Optional[pathlib.Path] = None
+
+
+def test_batch_manifest_up_to_date(tmp_path):
+    (tmp_path / "imported.expt").write_text("imported")
+    (tmp_path / "strong.refl").write_text("strong")
+    phil = tmp_path / "user.phil"
+    phil.write_text("min_spot_size=3")
+    params = StepParams(d_min=2.0, phil=phil)
+
+    manifest = BatchManifest(tmp_path)
+    manifest.record_step("find_spots", params, ["imported.expt"], ["strong.refl"])
+    manifest.record_summary(
+        {"directory": tmp_path, "n_hits": 5, "n_images_indexed": None}
+    )
+    manifest.write()
+
+    manifest = BatchManifest.from_directory(tmp_path)
+    assert manifest.is_up_to_date({"find_spots": params})
+    # nproc does not affect the results
+    assert manifest.is_up_to_date({"find_spots": StepParams(2.0, 4, phil)})
+    assert not manifest.is_up_to_date({"find_spots": StepParams(d_min=2.5)})
+    assert not manifest.is_up_to_date({"index": params})
+    summary = manifest.summary_data()
+    assert summary["directory"] == tmp_path
+    assert summary["n_hits"] == 5
+    assert summary["n_cryst_integrated"] is None
+
+    # changes to the user phil, inputs or outputs invalidate the step.
+    phil.write_text("min_spot_size=4")
+    assert not manifest.is_up_to_date({"find_spots": params})
+    phil.write_text("min_spot_size=3")
+    (tmp_path / "imported.expt").write_text("reimported")
+    assert not manifest.is_up_to_date({"find_spots": params})
+    (tmp_path / "imported.expt").write_text("imported")
+    (tmp_path / "strong.refl").unlink()
+    assert not manifest.is_up_to_date({"find_spots": params})
+
+    manifest.clear_steps(["find_spots"])
+    manifest.write()
+    assert BatchManifest.from_directory(tmp_path).steps == {}
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass
+from typing import Optional
+
+from dxtbx.model import Experiment, ExperimentList
+from dxtbx.serialize import load
+
+from xia2.Modules.SSX.batch_manifest import BatchManifest
+from xia2.Modules.SSX.data_integration_standard import setup_batch_directories
+
+
+@dataclass
+class StepParams:
+    d_min: Optional[float] = None
+    nproc: int = 1
+
+
+def test_resume_interrupted_run(tmp_path):
+    imported = tmp_path / "imported.expt"
+    ExperimentList([Experiment() for _ in range(10)]).as_file(imported)
+    step_params = {"find_spots": StepParams(d_min=2.0)}
+
+    batch_directories, setup_data, completed = setup_batch_directories(
+        tmp_path, imported, 3, step_params, ["find_spots"]
+    )
+    assert [d.name for d in batch_directories] == ["batch_1", "batch_2", "batch_3"]
+    assert completed == {}
+
+    # the run is killed after processing the first two batches, before the
+    # imported data of the last batch are written
+    for batch_dir in itertools.islice(
+        setup_data["batch_slicer"].iterate(batch_directories), 2
+    ):
+        (batch_dir / "strong.refl").write_text("strong")
+        manifest = BatchManifest(batch_dir)
+        manifest.record_step(
+            "find_spots", step_params["find_spots"], ["imported.expt"], ["strong.refl"]
+        )
+        manifest.record_summary({"directory": batch_dir, "n_hits": 1})
+        manifest.write()
+    assert not (batch_directories[2] / "imported.expt").exists()
+
+    # only the last batch is processed on a rerun
+    resumed, setup_data, completed = setup_batch_directories(
+        tmp_path, imported, 3, step_params, ["find_spots"]
+    )
+    assert resumed == batch_directories
+    assert list(completed) == batch_directories[:2]
+    assert setup_data["images_per_batch"] == dict(zip(batch_directories, (3, 3, 4)))
+    remaining = [d for d in resumed if d not in completed]
+    assert list(setup_data["batch_slicer"].iterate(remaining)) == remaining
+    assert (
+        len(
+            load.experiment_list(
+                batch_directories[2] / "imported.expt", check_format=False
+            )
+        )
+        == 4
+    )
+
+    # with a different batch size, every batch is processed again
+    resumed, setup_data, completed = setup_batch_directories(
+        tmp_path, imported, 5, step_params, ["find_spots"]
+    )
+    assert [d.name for d in resumed] == ["batch_1", "batch_2"]
+    assert completed == {}
+    # and the batches of the new size are then resumed, ignoring batch_3
+    for batch_dir in setup_data["batch_slicer"].iterate(resumed):
+        assert (
+            len(load.experiment_list(batch_dir / "imported.expt", check_format=False))
+            == 5
+        )
+    resumed, setup_data, completed = setup_batch_directories(
+        tmp_path, imported, 5, step_params, ["find_spots"]
+    )
+    assert [d.name for d in resumed] == ["batch_1", "batch_2"]
+    assert "batch_slicer" not in setup_data
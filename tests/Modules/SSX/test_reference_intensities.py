@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from cctbx import crystal, miller
+from iotbx.reflection_file_reader import any_reflection_file
+
+from xia2.Modules.SSX import reference_intensities
+from xia2.Modules.SSX.reference_intensities import cached_reference
+
+
+def test_cached_reference(tmp_path, monkeypatch):
+    calls = []
+
+    def calculate(filename, d_min, wavelength, k_sol, b_sol):
+        calls.append((filename, d_min, wavelength, k_sol, b_sol))
+        ms = miller.build_set(
+            crystal.symmetry((40, 50, 60, 90, 90, 90), "P 21 21 21"),
+            anomalous_flag=False,
+            d_min=d_min,
+        )
+        return ms.array(
+            data=ms.d_spacings().data() * 100
+        ).set_observation_type_xray_intensity()
+
+    monkeypatch.setattr(
+        reference_intensities, "intensities_from_reference_file", calculate
+    )
+    model = tmp_path / "model.pdb"
+    model.write_text(
+        "CRYST1   40.000   50.000   60.000  90.00  90.00  90.00 P 21 21 21\n"
+    )
+    cache = tmp_path / "cache"
+
+    path = cached_reference(model, cache, 2.04, wavelength=0.97623)
+    assert path.parent == cache and path.suffix == ".mtz"
+    assert calls == [(str(model), 2.0, 0.9762, 0.35, 46.0)]
+    # calculated once for similar resolution limits
+    assert cached_reference(model, cache, 2.09, wavelength=0.97621) == path
+    assert len(calls) == 1
+    assert cached_reference(model, cache, 1.95, wavelength=0.97621) != path
+    assert cached_reference(model, cache, 2.0, 0.9762, k_sol=0.3) != path
+    assert len(calls) == 3
+
+    intensities = any_reflection_file(str(path)).as_miller_arrays()[0]
+    assert intensities.is_xray_intensity_array()
+    assert intensities.size() == calculate(str(model), 2.0, None, 0, 0).size()
+
+    # data references are used directly
+    data = tmp_path / "reference.mtz"
+    assert cached_reference(data, cache, 2.0) == data
+
+    # a lock left by a process which was killed while calculating the
+    # intensities does not block the calculation
+    path.unlink()
+    assert path.with_suffix(".lock").is_file()
+    del calls[:]
+    assert cached_reference(model, cache, 2.0, wavelength=0.9762) == path
+    assert path.is_file()
+    assert len(calls) == 1
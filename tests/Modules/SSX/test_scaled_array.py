@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from cctbx import uctbx
+from dials.array_family import flex
+from dxtbx.model import Crystal, Experiment, ExperimentList
+
+from xia2.Modules.SSX.data_reduction_programs import scaled_array_from_tables
+
+
+def test_scaled_array_from_tables():
+    flex.set_random_seed(0)
+    data = []
+    for i in range(5):
+        table = flex.reflection_table()
+        n = 10 * (i + 1)
+        table["miller_index"] = flex.miller_index(list(zip(range(n), [i] * n, [1] * n)))
+        table["intensity"] = flex.random_double(n)
+        table["sigma"] = flex.random_double(n)
+        expts = ExperimentList(
+            [
+                Experiment(
+                    crystal=Crystal((10, 0, 0), (0, 11, 0), (0, 0, 12), "P 2"),
+                    identifier=str(i),
+                )
+            ]
+        )
+        data.append((expts, table))
+
+    best_unit_cell = uctbx.unit_cell((10, 11, 12, 90, 90, 90))
+    scaled_array, expts = scaled_array_from_tables(iter(data), best_unit_cell)
+    assert list(expts.identifiers()) == ["0", "1", "2", "3", "4"]
+    assert scaled_array.size() == 150
+    assert scaled_array.is_xray_intensity_array()
+    assert scaled_array.unit_cell().parameters() == best_unit_cell.parameters()
+    assert scaled_array.space_group_info().type().lookup_symbol() == "P 1 2 1"
+    offset = 0
+    for _, table in data:
+        n = table.size()
+        assert list(scaled_array.indices()[offset : offset + n]) == list(
+            table["miller_index"]
+        )
+        assert list(scaled_array.data()[offset : offset + n]) == list(
+            table["intensity"]
+        )
+        assert list(scaled_array.sigmas()[offset : offset + n]) == list(table["sigma"])
+        offset += n
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+
+from xia2.Modules.DeltaCcHalf import DeltaCcHalf
+
+
+def generate_datasets(n_datasets, n_batches=20, d_min=3.0, seed=0):
+    flex.set_random_seed(seed)
+    cs = crystal.symmetry(
+        unit_cell=(40, 50, 60, 90, 90, 90), space_group_symbol="P 21 21 21"
+    )
+    ms = miller.build_set(cs, anomalous_flag=False, d_min=d_min)
+    true_intensities = flex.random_double(ms.size()) * 1000
+    intensities = []
+    batches = []
+    for k in range(n_datasets):
+        # each dataset samples a random, partially overlapping subset of
+        # reflections with noise that varies from dataset to dataset
+        sel = flex.random_double(ms.size()) < 0.5
+        indices = ms.indices().select(sel)
+        sigmas = flex.double(indices.size(), 10 + 10 * k)
+        data = true_intensities.select(sel) + sigmas * (
+            flex.random_double(indices.size()) - 0.5
+        )
+        ma = miller.array(
+            miller.set(cs, indices, anomalous_flag=False), data=data, sigmas=sigmas
+        ).set_observation_type_xray_intensity()
+        intensities.append(ma)
+        batch_data = flex.int(
+            list(
+                (flex.random_double(indices.size()) * n_batches).iround() + 1 + k * 1000
+            )
+        )
+        batches.append(ma.customized_copy(data=batch_data, sigmas=None))
+    return intensities, batches
+
+
+@pytest.mark.parametrize("group_size", [None, 5])
+def test_omit_stats_match_explicit_calculation(group_size):
+    intensities, batches = generate_datasets(4)
+    result = DeltaCcHalf(intensities, batches, group_size=group_size)
+
+    expected_cc = []
+    expected_completeness = []
+    for unmerged_i in result._omit_one_group_arrays():
+        expected_cc.append(result._compute_mean_weighted_cc_half(unmerged_i))
+        expected_completeness.append(
+            unmerged_i.merge_equivalents().array().completeness(multiplier=100)
+        )
+    assert list(result.cc_half) == pytest.approx(expected_cc, abs=1e-10)
+    assert list(result.completeness) == pytest.approx(expected_completeness, abs=1e-10)
+
+
+def test_omit_stats_benchmark(run_benchmarks):
+    # The omit-one-group statistics should cost time proportional to the
+    # number of observations, i.e. linear (not quadratic) in the number of
+    # groups for a fixed number of observations per group.
+    for n_datasets in (10, 80):
+        intensities, batches = generate_datasets(n_datasets, d_min=4.0)
+        result = DeltaCcHalf(intensities, batches, group_size=5)
+        t0 = time.perf_counter()
+        result._compute_omit_stats()
+        print(f"{n_datasets} datasets: {time.perf_counter() - t0:.3f} s")
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import pytest
+
+import iotbx.merging_statistics
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+
+from xia2.Modules.MergingStatistics import MergingStatistics
+
+
+@pytest.fixture
+def i_obs():
+    flex.set_random_seed(0)
+    cs = crystal.symmetry(
+        unit_cell=(40, 50, 60, 90, 90, 90), space_group_symbol="P 21 21 21"
+    )
+    ms = miller.build_set(cs, anomalous_flag=True, d_min=2.5)
+    # random multiplicity, including some systematic absences
+    indices = flex.miller_index()
+    for i in range(4):
+        indices.extend(ms.indices().select(flex.random_double(ms.size()) < 0.8))
+    indices.extend(flex.miller_index([(0, 0, 1), (0, 0, 3), (1, 0, 0)] * 3))
+    data = flex.random_double(indices.size()) * 1000
+    return miller.array(
+        miller.set(cs, indices, anomalous_flag=True),
+        data=data,
+        sigmas=flex.sqrt(data) + 1,
+    ).set_observation_type_xray_intensity()
+
+
+def expected_statistics(i_obs, **kwargs):
+    return iotbx.merging_statistics.dataset_statistics(
+        i_obs=i_obs,
+        eliminate_sys_absent=True,
+        assert_is_not_unique_set_under_symmetry=False,
+        **kwargs,
+    )
+
+
+def test_band_statistics(i_obs):
+    stats = MergingStatistics(
+        i_obs,
+        eliminate_sys_absent=True,
+        assert_is_not_unique_set_under_symmetry=False,
+    )
+    bands = [(False, None, None), (False, 3.0, 20), (True, None, None)]
+    results = stats.band_statistics(bands, n_bins=10)
+    for (anomalous, d_min, d_max), result in zip(bands, results):
+        expected = expected_statistics(
+            i_obs, anomalous=anomalous, d_min=d_min, d_max=d_max, n_bins=10
+        )
+        for attr in ("n_obs", "n_uniq", "completeness", "i_mean", "r_merge"):
+            assert getattr(result.overall, attr) == pytest.approx(
+                getattr(expected.overall, attr)
+            )
+            assert [getattr(b, attr) for b in result.bins] == pytest.approx(
+                [getattr(b, attr) for b in expected.bins]
+            )
+        assert result.overall.anom_signal == expected.overall.anom_signal
+    assert stats.dataset_statistics(anomalous=True, n_bins=10) is results[2]
+
+    # too many bins for the selected band, so all bands use fewer bins
+    results = stats.band_statistics([(False, None, None), (False, 2.5, 2.6)], 79)
+    assert len(results[0].bins) == len(results[1].bins) == 76
+    with pytest.raises(iotbx.merging_statistics.StatisticsError):
+        stats.band_statistics([(False, 3.0, 3.01)], n_bins=60, min_n_bins=60)
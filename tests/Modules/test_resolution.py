@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import iotbx.mtz
+import iotbx.phil
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+from dials.util.resolution_analysis import Resolutionizer, phil_str
+
+from xia2.Modules.Resolution import (
+    BatchedResolutionEstimator,
+    criteria,
+    format_limits,
+    limit_and_reasoning,
+)
+
+
+def test_limit_and_reasoning():
+    params = SimpleNamespace(
+        completeness=None, cc_half=0.3, rmerge=None, isigma=0.25, misigma=1.0
+    )
+    assert limit_and_reasoning(
+        params, {"cc_half": 1.52, "isigma": 1.31, "misigma": 1.52}
+    ) == (1.52, "cc_half > 0.3, merged <I/sigI> > 1.0")
+    # limits for criteria which are not set are ignored
+    assert limit_and_reasoning(params, {"cc_half": 1.52, "rmerge": 2.0}) == (
+        1.52,
+        "cc_half > 0.3",
+    )
+    assert limit_and_reasoning(params, {}) == (0.0, None)
+
+
+def test_format_limits():
+    # in the order of the criteria, omitting those without a limit
+    assert format_limits({"isigma": 1.31, "cc_half": 1.5}) == (
+        "cc_half: 1.50, isigma: 1.31"
+    )
+    assert format_limits({}) == ""
+
+
+def write_unmerged_mtz(path):
+    """Two sweeps of batches 1-100 and 101-200, the second one noisier."""
+    flex.set_random_seed(0)
+    cs = crystal.symmetry(
+        unit_cell=(40, 50, 60, 90, 90, 90), space_group_symbol="P 21 21 21"
+    )
+    ms = miller.build_set(cs, anomalous_flag=False, d_min=1.5)
+    mean = 1000 * flex.exp(-10 * ms.d_star_sq().data())
+    indices = flex.miller_index()
+    intensities = flex.double()
+    sigmas = flex.double()
+    batches = flex.int()
+    for first_batch, noise in ((1, 1.0), (101, 3.0)):
+        for _ in range(2):
+            sigma = noise * (flex.sqrt(mean) + 2)
+            indices.extend(ms.indices())
+            intensities.extend(mean + sigma * (flex.random_double(ms.size()) - 0.5))
+            sigmas.extend(sigma)
+            batches.extend(
+                (flex.random_double(ms.size()) * 99.9).iround() + first_batch
+            )
+
+    mtz = iotbx.mtz.object()
+    mtz.set_space_group_info(cs.space_group_info())
+    mtz.adjust_column_array_sizes(indices.size())
+    mtz.set_n_reflections(indices.size())
+    dataset = mtz.add_crystal("XTAL", "PROJ", cs.unit_cell().parameters()).add_dataset(
+        "DATA", 1.0
+    )
+    h, k, l = indices.as_vec3_double().parts()
+    for label, column_type, values in (
+        ("H", "H", h),
+        ("K", "H", k),
+        ("L", "H", l),
+        ("BATCH", "B", batches.as_double()),
+        ("I", "J", intensities),
+        ("SIGI", "Q", sigmas),
+    ):
+        dataset.add_column(label, column_type).set_values(values.as_float())
+    mtz.write(str(path))
+    return indices.size()
+
+
+def test_batched_resolution_estimator(tmp_path):
+    hklin = tmp_path / "scaled_unmerged.mtz"
+    n_obs = write_unmerged_mtz(hklin)
+    resolution_params = iotbx.phil.parse(phil_str).extract()
+    resolution_params.completeness = None
+    resolution_params.cc_half = 0.3
+    resolution_params.rmerge = None
+    resolution_params.isigma = 0.25
+    resolution_params.misigma = 1.0
+
+    estimator = BatchedResolutionEstimator(resolution_params, hklin=str(hklin))
+    assert estimator._i_obs.size() == estimator._batches.size() == n_obs
+
+    batch_ranges = [(1, 100), (101, 200)]
+    estimates = estimator.estimate(batch_ranges)
+    assert estimator.estimate(batch_ranges, nproc=2) == estimates
+
+    # the same limits as reading each batch range separately
+    for batch_range, limits in zip(batch_ranges, estimates):
+        params = iotbx.phil.parse(phil_str).extract()
+        for name in ("completeness", "cc_half", "rmerge", "isigma", "misigma"):
+            setattr(params, name, getattr(resolution_params, name))
+        params.nbins = 100
+        params.batch_range = batch_range
+        resolutionizer = Resolutionizer.from_unmerged_mtz(str(hklin), params)
+        expected = {}
+        for name, metric, _ in criteria:
+            limit = getattr(params, name)
+            if limit is None:
+                continue
+            try:
+                d_min = resolutionizer.resolution(metric, limit=limit).d_min
+            except RuntimeError:
+                continue
+            if d_min is not None:
+                expected[name] = float("%.2f" % d_min)
+        assert limits == expected
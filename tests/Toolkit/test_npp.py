@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import pytest
+
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+
+from xia2.Toolkit.NPP import npp_analysis, npp_ify
+
+
+def test_npp_analysis():
+    flex.set_random_seed(0)
+    cs = crystal.symmetry(
+        unit_cell=(40, 50, 60, 90, 90, 90), space_group_symbol="P 21 21 21"
+    )
+    ms = miller.build_set(cs, anomalous_flag=False, d_min=6)
+    indices = flex.miller_index()
+    for i in range(40):
+        indices.extend(ms.indices().select(flex.random_double(ms.size()) < 0.5))
+    # a reflection with too few observations to analyse
+    indices.extend(flex.miller_index([(9, 9, 9)] * 2))
+    data = flex.random_double(indices.size()) * 1000
+    intensities = miller.array(
+        miller.set(cs, indices), data=data, sigmas=flex.sqrt(data) + 1
+    )
+
+    result = npp_analysis(intensities)
+    assert (9, 9, 9) not in result.indices
+    assert flex.min(result.multiplicity) >= 3
+
+    # compare with a fit of each unique reflection in turn
+    for hkl, i, v, slope_all, slope_central in zip(
+        result.indices,
+        result.i_mean,
+        result.variance,
+        result.slope_all,
+        result.slope_central,
+    ):
+        x, y = npp_ify(
+            intensities.select(indices == hkl).data(), input_mean_variance=(i, v)
+        )
+        sel = flex.abs(x) < 2
+        assert slope_all == pytest.approx(flex.linear_regression(x, y).slope())
+        assert slope_central == pytest.approx(
+            flex.linear_regression(x.select(sel), y.select(sel)).slope()
+        )
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from collections import Counter
+
+import numpy as np
+
+from scitbx.array_family import flex
+
+from xia2.cli.overload import PixelHistogram, merge_histograms
+
+
+def test_pixel_histogram():
+    rng = np.random.default_rng(0)
+    histmax = 5000.0
+    frames = [rng.poisson(3, 100000).astype(np.int32) for _ in range(5)]
+    for frame in frames:
+        frame[rng.integers(0, frame.size, 100)] = rng.integers(-2, 2 * histmax, 100)
+
+    # counts of values in [0, histmax], as from flex.histogram
+    expected = flex.histogram(
+        flex.int(np.concatenate(frames)).as_double(),
+        data_min=0.0,
+        data_max=histmax,
+        n_slots=int(histmax) + 1,
+    )
+    histograms = []
+    for frame in frames:
+        histograms.append(PixelHistogram(histmax, dense_size=1024))
+        histograms[-1].add(frame)
+    assert merge_histograms(histograms).counts() == {
+        b: c for b, c in enumerate(expected.slots()) if c > 0
+    }
+
+    # counts of all values
+    histograms = []
+    for frame in frames:
+        histograms.append(PixelHistogram(dense_size=1024))
+        histograms[-1].add(frame)
+    assert merge_histograms(histograms).counts() == Counter(
+        np.concatenate(frames).tolist()
+    )
@@ -4,6 +4,7 @@ import warnings
 
 import pytest
 
+from xia2.cli.plot_multiplicity import master_phil, plot_multiplicity
 from xia2.Modules.Analysis import phil_scope
 from xia2.Modules.Report import Report
 from xia2.XIA2Version import VersionNumber
@@ -28,6 +29,18 @@ def test_multiplicity_plots(report, tmp_path):
         "multiplicity_k",
         "multiplicity_l",
     }
+    # the multiplicities of each slice are unchanged by reusing the merged data
+    settings = master_phil.extract()
+    settings.size_inches = (5, 5)
+    settings.show_missing = True
+    settings.slice_axis = "k"
+    settings.slice_index = 0
+    settings.plot.filename = None
+    settings.json.filename = str(tmp_path / "expected.json")
+    plot_multiplicity(report.intensities, settings)
+    assert (tmp_path / "multiplicities_k_0.json").read_text() == (
+        tmp_path / "expected.json"
+    ).read_text()
 
 
 def test_symmetry_table_html(report):
@@ -188,3 +201,33 @@ def test_pychef(report):
         "completeness_vs_dose",
         "rd_vs_batch_difference",
     }
+
+
+def test_compute_sections(report):
+    sections = {
+        "xtriage": ("xtriage_report", {}),
+        "resolution": ("resolution_plots_and_stats", {}),
+        "intensity": ("intensity_stats_plots", {"run_xtriage": False}),
+        "pychef": ("pychef_plots", {"n_bins": 1}),
+        "multiplicity": ("multiplicity_plots", {}),
+    }
+    report._xanalysis = None
+    serial = report.compute_sections(sections)
+    assert set(serial) == set(sections)
+    assert "l_test" in serial["intensity"]
+    del report.merging_stats
+    report._xanalysis = None
+    concurrent = report.compute_sections(sections, nproc=3)
+    assert concurrent["resolution"][1] == serial["resolution"][1]
+    assert concurrent["pychef"] == serial["pychef"]
+    # the intensity plots use the xtriage analysis from another worker process
+    assert concurrent["intensity"] == serial["intensity"]
+    # the merging statistics are returned from the worker process
+    assert report.merging_stats.overall.n_obs > 0
+
+    # optional sections are skipped once the time budget is spent
+    assert set(report.compute_sections(sections, time_budget=0)) == {
+        "resolution",
+        "intensity",
+        "pychef",
+    }